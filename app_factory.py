@@ -0,0 +1,33 @@
+import click
+from flask import Flask
+from flask.cli import with_appcontext
+from dotenv import load_dotenv
+from db.models import db
+from db.engine import engine_options
+from utils.get_env_variables import load_secrets
+
+def create_base_app(import_name):
+    """Build a Flask app with the config and database that both the API and the Celery worker need."""
+    load_dotenv()
+    secrets = load_secrets()
+
+    app = Flask(import_name)
+    app.config.update(
+        CELERY_broker_url=secrets['CELERY_BROKER_URL'],
+        result_backend=secrets['CELERY_RESULT_BACKEND'],
+        SQLALCHEMY_DATABASE_URI=secrets['SQLALCHEMY_DATABASE_URI'],
+        SQLALCHEMY_TRACK_MODIFICATIONS=secrets['SQLALCHEMY_TRACK_MODIFICATIONS'],
+        SQLALCHEMY_ENGINE_OPTIONS=engine_options(secrets['SQLALCHEMY_DATABASE_URI']),
+        JWT_SECRET_KEY=secrets['JWT_SECRET_KEY'],
+    )
+
+    db.init_app(app)
+    app.cli.add_command(init_db_command)
+    return app
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create missing tables. Run once per deploy, before the API and workers start."""
+    db.create_all()
+    click.echo('Database tables are up to date')
@@ -0,0 +1,65 @@
+"""End-to-end analysis latency for 5, 15 and 30 minute transcripts: one call versus map-reduce.
+
+Runs against FakeOpenAIServer, whose latency grows with prompt and answer length and which
+rejects prompts over --context-tokens like the real model.
+
+Usage: python -m benchmarks.bench_analysis --minutes 5 15 30
+"""
+import os
+import time
+import argparse
+from unittest.mock import patch
+
+os.environ.setdefault('OPENAI_API_KEY', 'bench-key')
+
+from openai import OpenAI, BadRequestError
+from services import analyze_text_service
+from services.analyze_text_service import analyze_text, count_tokens
+from tests.fakes import FakeOpenAIServer
+
+WORDS_PER_MINUTE = 150
+LINE_SECONDS = 15
+
+def make_transcript(minutes):
+    words_per_line = WORDS_PER_MINUTE * LINE_SECONDS // 60
+    lines = minutes * 60 // LINE_SECONDS
+    return ''.join(' '.join(f'word{(n * words_per_line + i) % 997}' for i in range(words_per_line)) + '.\n' for n in range(lines))
+
+def run(transcript, single_call, server):
+    limit = float('inf') if single_call else analyze_text_service.ANALYSIS_SINGLE_CALL_TOKENS
+    calls_before = len(server.prompts)
+    with patch.object(analyze_text_service, 'ANALYSIS_SINGLE_CALL_TOKENS', limit):
+        start = time.perf_counter()
+        try:
+            analyze_text(transcript, 'summarize')
+            outcome = f'{time.perf_counter() - start:.2f}'
+        except BadRequestError:
+            outcome = 'context exceeded'
+    return outcome, len(server.prompts) - calls_before
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=int, nargs='+', default=[5, 15, 30])
+    parser.add_argument('--base-latency', type=float, default=0.4)
+    parser.add_argument('--per-prompt-token', type=float, default=0.0001)
+    parser.add_argument('--per-output-token', type=float, default=0.015)
+    parser.add_argument('--output-ratio', type=float, default=0.15, help='answer tokens per prompt token')
+    parser.add_argument('--context-tokens', type=int, default=16385)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.base_latency, args.per_prompt_token, args.per_output_token,
+                              output_tokens=50, output_ratio=args.output_ratio, context_tokens=args.context_tokens)
+    with server:
+        fake_client = OpenAI(api_key='bench-key', base_url=server.base_url, max_retries=0)
+        with patch.object(analyze_text_service, 'get_client', return_value=fake_client):
+            print(f"section: {analyze_text_service.ANALYSIS_SECTION_TOKENS} tokens, "
+                  f"parallel: {analyze_text_service.ANALYSIS_MAX_PARALLEL}, context: {args.context_tokens} tokens")
+            print(f"{'minutes':<9}{'tokens':>8}{'one call (s)':>18}{'map-reduce (s)':>16}{'calls':>7}")
+            for minutes in args.minutes:
+                transcript = make_transcript(minutes)
+                single, _ = run(transcript, True, server)
+                mapped, calls = run(transcript, False, server)
+                print(f"{minutes:<9}{count_tokens(transcript):>8}{single:>18}{mapped:>16}{calls:>7}")
+
+if __name__ == '__main__':
+    main()
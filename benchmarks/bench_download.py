@@ -0,0 +1,99 @@
+"""Benchmark: audio download in the old MP3 mode versus fast mode, against a local HLS server.
+
+A fixture track of --minutes is cut into fragmented MP4 HLS segments and served over HTTP with --latency added
+to every request and each connection throttled to --bandwidth, like a remote CDN. 'mp3' is the
+previous download: one fragment at a time, then a 192 kbps MP3 re-encode. 'fast' fetches
+DOWNLOAD_CONCURRENT_FRAGMENTS at a time and keeps the native stream. Both are also timed through
+the PCM decode that transcription runs next.
+
+Usage: python -m benchmarks.bench_download --minutes 20 --latency 0.05 --bandwidth 2000000
+"""
+import io
+import os
+import time
+import contextlib
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from functools import partial
+from unittest.mock import patch
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from services.youtube_service import download_audio
+from services.audio_service import read_pcm_chunks
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+    bandwidth = 0
+
+    def copyfile(self, source, outputfile):
+        time.sleep(self.latency)
+        block = max(1, self.bandwidth // 20)
+        while True:
+            data = source.read(block)
+            if not data:
+                break
+            outputfile.write(data)
+            time.sleep(len(data) / self.bandwidth)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_fixture(directory, minutes, segment_seconds):
+    """Encode a tone of the given length as AAC in fragmented MP4 HLS segments and return the playlist name."""
+    subprocess.run([
+        'ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', f'sine=frequency=440:duration={minutes * 60}',
+        '-ac', '2', '-ar', '44100', '-c:a', 'aac', '-b:a', '128k',
+        '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod', '-hls_segment_type', 'fmp4',
+        '-hls_segment_filename', os.path.join(directory, 'segment%d.m4s'), os.path.join(directory, 'audio.m3u8'),
+    ], check=True)
+    return 'audio.m3u8'
+
+def run(mode, url, concurrency):
+    output_dir = tempfile.mkdtemp()
+    try:
+        with patch('services.youtube_service.DOWNLOAD_CONCURRENT_FRAGMENTS', concurrency):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                audio_file = download_audio(url, output_dir=output_dir, mode=mode)
+            downloaded = time.perf_counter() - started
+            chunks = sum(1 for _ in read_pcm_chunks(audio_file))
+            total = time.perf_counter() - started
+        print(f"{mode:>5}: download {downloaded:6.2f}s, with PCM decode {total:6.2f}s "
+              f"({os.path.getsize(audio_file) / 1e6:.1f} MB {os.path.splitext(audio_file)[1]}, {chunks} chunks)")
+        return total
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--minutes', type=float, default=20)
+    parser.add_argument('--segment-seconds', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every request')
+    parser.add_argument('--bandwidth', type=int, default=2_000_000, help='bytes per second per connection')
+    parser.add_argument('--concurrency', type=int, default=8, help='fragments fetched at once in fast mode')
+    args = parser.parse_args()
+
+    fixture_dir = tempfile.mkdtemp()
+    server = None
+    try:
+        playlist = make_fixture(fixture_dir, args.minutes, args.segment_seconds)
+        ThrottledHandler.latency = args.latency
+        ThrottledHandler.bandwidth = args.bandwidth
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(ThrottledHandler, directory=fixture_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}/{playlist}'
+
+        print(f"{args.minutes:.0f} min AAC in {args.segment_seconds}s HLS segments, "
+              f"{args.latency * 1000:.0f} ms per request, {args.bandwidth / 1e6:.1f} MB/s per connection")
+        baseline = run('mp3', url, 1)
+        fast = run('fast', url, args.concurrency)
+        print(f"speedup: {baseline / fast:.1f}x")
+    finally:
+        if server:
+            server.shutdown()
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
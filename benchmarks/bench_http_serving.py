@@ -0,0 +1,162 @@
+"""Load test: the API under the development server (`python main.py`) versus gunicorn with gevent workers.
+
+Each mode serves the real Flask app in a subprocess, with the slow dependencies replaced by
+sleeps of realistic length: yt-dlp probes in /process take --probe-seconds and result backend
+reads in /status take --redis-seconds. Clients mix /status polls with a share of /process
+requests and the script reports p50/p99 latency per endpoint and overall requests per second.
+
+Usage: python -m benchmarks.bench_http_serving --clients 200 --duration 10 --process-share 0.1
+"""
+import os
+import sys
+import time
+import uuid
+import json
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from unittest.mock import patch
+
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('OPENAI_API_KEY', 'bench-key')
+
+TASK_ID = 'bench-task'
+PORT = 18080
+
+def serve_app():
+    """Gunicorn app factory: the API with yt-dlp, the broker and the result backend replaced by sleeps."""
+    import fakeredis
+    from main import app
+    from tasks import download_and_process
+
+    probe_seconds = float(os.environ['BENCH_PROBE_SECONDS'])
+    redis_seconds = float(os.environ['BENCH_REDIS_SECONDS'])
+
+    def extract_video_metadata(url):
+        time.sleep(probe_seconds)
+        return {'id': url.rsplit('=', 1)[-1], 'duration': 600, 'formats': []}
+
+    def redis_call(result):
+        def call(*args, **kwargs):
+            time.sleep(redis_seconds)
+            return result
+        return call
+
+    patch('services.video_metadata_service.extract_video_metadata', extract_video_metadata).start()
+    patch('services.video_metadata_service.get_redis', return_value=fakeredis.FakeRedis()).start()
+    patch.object(download_and_process, 'apply_async', redis_call(type('Result', (), {'id': TASK_ID})())).start()
+    patch.object(download_and_process, 'AsyncResult', redis_call(type('Result', (), {'state': 'PENDING', 'info': None})())).start()
+    return app
+
+def create_user(database_uri):
+    """Create the bench user and return a token for it, before any server starts."""
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    from main import app
+    from db.models import db, User
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='bench', password='unused', free_minutes=1000))
+        db.session.commit()
+        return create_access_token(identity={'username': 'bench'})
+
+def start_server(mode, env):
+    if mode == 'dev':
+        code = f"from benchmarks.bench_http_serving import serve_app; serve_app().run(host='127.0.0.1', port={PORT})"
+        command = [sys.executable, '-c', code]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{PORT}',
+                   '--log-level', 'warning', 'benchmarks.bench_http_serving:serve_app()']
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=1)
+            connection.request('GET', '/status/warmup')
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+def client(token, deadline, process_share, latencies, errors):
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+    connection = None
+    while time.monotonic() < deadline:
+        if random.random() < process_share:
+            endpoint = '/process'
+            body = json.dumps({'url': f'https://www.youtube.com/watch?v={uuid.uuid4().hex[:11]}', 'prompt': 'summarize'})
+            args = ('POST', endpoint, body, headers)
+        else:
+            endpoint = '/status'
+            args = ('GET', f'/status/{TASK_ID}', None, headers)
+
+        started = time.perf_counter()
+        try:
+            connection = connection or http.client.HTTPConnection('127.0.0.1', PORT, timeout=60)
+            connection.request(*args)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                raise RuntimeError(response.status)
+            latencies[endpoint].append(time.perf_counter() - started)
+        except Exception:
+            errors.append(endpoint)
+            connection = None
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+def run_mode(mode, token, env, args):
+    server = start_server(mode, env)
+    try:
+        latencies = {'/process': [], '/status': []}
+        errors = []
+        deadline = time.monotonic() + args.duration
+        threads = [threading.Thread(target=client, args=(token, deadline, args.process_share, latencies, errors))
+                   for _ in range(args.clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{mode:>7}: {total / elapsed:7.1f} req/s, {len(errors)} errors")
+    for endpoint, values in latencies.items():
+        print(f"         {endpoint:<9} n={len(values):<6} p50={percentile(values, 0.5) * 1000:8.1f} ms"
+              f"  p99={percentile(values, 0.99) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--process-share', type=float, default=0.1)
+    parser.add_argument('--probe-seconds', type=float, default=1.0)
+    parser.add_argument('--redis-seconds', type=float, default=0.002)
+    parser.add_argument('--modes', nargs='+', default=['dev', 'gevent'], choices=['dev', 'gevent'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        token = create_user(database_uri)
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database_uri, WEB_CONCURRENCY='1',
+                   BENCH_PROBE_SECONDS=str(args.probe_seconds), BENCH_REDIS_SECONDS=str(args.redis_seconds))
+
+        print(f"{args.clients} clients for {args.duration:.0f}s, {args.process_share:.0%} /process "
+              f"(probe {args.probe_seconds:.1f}s), /status backend read {args.redis_seconds * 1000:.0f} ms")
+        for mode in args.modes:
+            run_mode(mode, token, env, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Startup benchmark: how long a fresh process takes to import each entry point.
+
+Runs `python -X importtime -c "import <module>"` --runs times per module, each in a new
+interpreter, and reports the median total and the heaviest imports of the median run. `worker`
+is what a Celery worker process loads, `main` is the API.
+
+Usage: python -m benchmarks.bench_import_time --modules worker main tasks --runs 5 --top 8
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+def import_times(module):
+    """Import module in a fresh interpreter; returns [(cumulative_us, depth, name)] from -X importtime."""
+    env = dict(os.environ)
+    env.setdefault('JWT_SECRET_KEY', 'bench-secret')
+    env.setdefault('OPENAI_API_KEY', 'bench-key')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            env=env, capture_output=True, text=True, check=True)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative), depth, name.strip()))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', nargs='+', default=['worker', 'main', 'tasks'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='heaviest imports to list per module')
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [import_times(module) for _ in range(args.runs)]
+        totals = [next(row[0] for row in rows if row[1:] == (0, module)) for rows in runs]
+        median = statistics.median(totals)
+        rows = runs[min(range(args.runs), key=lambda index: abs(totals[index] - median))]
+
+        print(f"{module:>8}: {median / 1000:7.1f} ms median over {args.runs} runs "
+              f"(min {min(totals) / 1000:.1f}, max {max(totals) / 1000:.1f})")
+        # Modules the entry point imports directly, with everything they pull in
+        heaviest = sorted((row for row in rows if row[1] == 1), reverse=True)[:args.top]
+        for cumulative, depth, name in heaviest:
+            print(f"          {cumulative / 1000:7.1f} ms  {name}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: question prompts answered from the whole transcript versus from retrieved spans.
+
+For 5, 15 and 30 minute transcripts, times a question with ANALYSIS_RETRIEVAL off (whole
+transcript, map-reduce once it is long), the first retrieval for that transcript (spans embedded
+and cached) and a repeat question (only the question embedded), and reports the prompt tokens
+sent to the model. Runs against FakeOpenAIServer, whose latency grows with prompt and answer length.
+
+Usage: python -m benchmarks.bench_retrieval --minutes 5 15 30
+"""
+import os
+import time
+import argparse
+from unittest.mock import patch
+
+os.environ.setdefault('OPENAI_API_KEY', 'bench-key')
+
+import fakeredis
+from openai import OpenAI
+from services import analyze_text_service
+from services.analyze_text_service import analyze_text, count_tokens
+from services.analysis_cache import AnalysisCache
+from services.embedding_cache import EmbeddingCache
+from tests.fakes import FakeOpenAIServer
+from benchmarks.bench_analysis import make_transcript
+
+def run(transcript, question, retrieval, server):
+    prompts_before, embedded_before = len(server.prompts), len(server.embedded_inputs)
+    with patch.object(analyze_text_service, 'ANALYSIS_RETRIEVAL', retrieval):
+        started = time.perf_counter()
+        analyze_text(transcript, question)
+        elapsed = time.perf_counter() - started
+    prompt_tokens = sum(count_tokens(prompt) for prompt in server.prompts[prompts_before:])
+    return elapsed, prompt_tokens, len(server.embedded_inputs) - embedded_before
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=int, nargs='+', default=[5, 15, 30])
+    parser.add_argument('--base-latency', type=float, default=0.4)
+    parser.add_argument('--per-prompt-token', type=float, default=0.0001)
+    parser.add_argument('--per-output-token', type=float, default=0.015)
+    parser.add_argument('--output-ratio', type=float, default=0.15, help='answer tokens per prompt token')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.base_latency, args.per_prompt_token, args.per_output_token,
+                              output_tokens=50, output_ratio=args.output_ratio, embedding_dimensions=256)
+    fake_redis = fakeredis.FakeRedis()
+    with server:
+        fake_client = OpenAI(api_key='bench-key', base_url=server.base_url, max_retries=0)
+        with patch.object(analyze_text_service, 'get_client', return_value=fake_client), \
+                patch.object(analyze_text_service, 'analysis_cache', AnalysisCache(redis_factory=lambda: fake_redis)), \
+                patch.object(analyze_text_service, 'embedding_cache', EmbeddingCache(redis_factory=lambda: fake_redis)):
+            print(f"top {analyze_text_service.RETRIEVAL_TOP_K} spans of {analyze_text_service.RETRIEVAL_SPAN_TOKENS} tokens")
+            print(f"{'minutes':<9}{'mode':<16}{'seconds':>9}{'prompt tokens':>15}{'embedded':>10}")
+            for minutes in args.minutes:
+                transcript = make_transcript(minutes)
+                for mode, question, retrieval in (
+                    # Different questions, so none is served from the analysis cache
+                    ('whole', 'What is said about word42?', 'off'),
+                    ('first retrieval', 'What is said about word7?', 'questions'),
+                    ('repeat question', 'What is said about word500?', 'questions'),
+                ):
+                    elapsed, prompt_tokens, embedded = run(transcript, question, retrieval, server)
+                    print(f"{minutes:<9}{mode:<16}{elapsed:>9.2f}{prompt_tokens:>15}{embedded:>10}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark: /search query latency over a large transcript index.
+
+Fills the search index with --transcripts synthetic transcripts of --segments segments each, words
+drawn from a Zipf-like vocabulary so some terms match most transcripts and others a handful, then
+times search_transcripts for common, rare and multi-word queries. SQLite FTS5 by default; pass
+--database-uri to run against Postgres tsvector.
+
+Usage: python -m benchmarks.bench_search --transcripts 100000 --segments 4
+"""
+import os
+import time
+import random
+import itertools
+import argparse
+import tempfile
+import statistics
+from flask import Flask
+from db.models import db, SearchDocument
+from services.transcript_search import search_transcripts
+
+VOCABULARY_SIZE = 20_000
+WORDS_PER_SEGMENT = 75  # about 30 seconds of speech
+BATCH_SIZE = 10_000
+
+def vocabulary(size):
+    rng = random.Random(0)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    return sorted(words, key=lambda word: (len(word), word))
+
+def documents(words, transcripts, segments):
+    rng = random.Random(1)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    for video in range(transcripts):
+        for index in range(segments):
+            yield {
+                'video_id': f'video{video:07d}', 'chunk_index': index,
+                'start_seconds': index * 30.0, 'end_seconds': index * 30.0 + 30,
+                'text': ' '.join(rng.choices(words, cum_weights=cum_weights, k=WORDS_PER_SEGMENT)) + '\n',
+            }
+
+def fill(words, args):
+    started = time.perf_counter()
+    batch = []
+    for document in documents(words, args.transcripts, args.segments):
+        batch.append(document)
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(SearchDocument.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(SearchDocument.__table__.insert(), batch)
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    rows = args.transcripts * args.segments
+    print(f"indexed {args.transcripts} transcripts ({rows} segments) in {elapsed:.1f}s, {rows / elapsed:,.0f} segments/s")
+
+def time_query(query, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        results = search_transcripts(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{query!r:>32}: p50 {statistics.median(timings):7.2f} ms, p95 {p95:7.2f} ms, {len(results)} videos")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--transcripts', type=int, default=100_000)
+    parser.add_argument('--segments', type=int, default=4, help='30 second segments per transcript')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri or f"sqlite:///{os.path.join(directory, 'search.db')}"
+        db.init_app(app)
+        with app.app_context():
+            SearchDocument.__table__.drop(db.engine, checkfirst=True)
+            SearchDocument.__table__.create(db.engine)
+            words = vocabulary(VOCABULARY_SIZE)
+            fill(words, args)
+
+            # The most common word, one in the middle of the distribution, a rare one and combinations
+            for query in (words[0], words[200], words[-1], f'{words[0]} {words[50]}', f'{words[100]} {words[5000]}'):
+                time_query(query, args.repeats)
+            SearchDocument.__table__.drop(db.engine)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Compare the legacy convert-then-seek chunking with the single-pass segmenter.
+
+Usage: python -m benchmarks.bench_segmenter --minutes 30
+"""
+import os
+import math
+import time
+import wave
+import shutil
+import argparse
+import tempfile
+import subprocess
+from unittest.mock import patch
+import ffmpeg
+from services.audio_service import split_audio_into_chunks, CHUNK_LENGTH
+from services.google_transcription_service import convert_mp3_to_wav
+
+def legacy_split_audio_into_chunks(input_audio_file, chunk_length=CHUNK_LENGTH):
+    """The previous implementation: one ffmpeg process per chunk, each seeking into the full WAV."""
+    probe = ffmpeg.probe(input_audio_file)
+    duration = float(probe['format']['duration'])
+    num_chunks = math.ceil(duration / chunk_length)
+
+    chunk_files = []
+    for i in range(num_chunks):
+        output_chunk = f"{input_audio_file.replace('.wav', '')}_chunk{i}.wav"
+        ffmpeg.input(input_audio_file, ss=i * chunk_length, t=chunk_length).output(output_chunk).run(overwrite_output=True, quiet=True)
+        chunk_files.append(output_chunk)
+    return chunk_files
+
+def legacy_pipeline(mp3_file):
+    wav_file = convert_mp3_to_wav(mp3_file)
+    return legacy_split_audio_into_chunks(wav_file)
+
+def make_test_audio(directory, minutes):
+    mp3_file = os.path.join(directory, 'bench.mp3')
+    (
+        ffmpeg
+        .input(f'sine=frequency=440:sample_rate=44100:duration={minutes * 60}', f='lavfi')
+        .output(mp3_file, ac=2, audio_bitrate='192k')
+        .run(overwrite_output=True, quiet=True)
+    )
+    return mp3_file
+
+def run_counted(func, *args):
+    """Run func and return (result, wall seconds, number of processes spawned)."""
+    spawned = []
+    real_popen = subprocess.Popen
+
+    def counting_popen(*popen_args, **popen_kwargs):
+        spawned.append(popen_args[0])
+        return real_popen(*popen_args, **popen_kwargs)
+
+    with patch('subprocess.Popen', side_effect=counting_popen):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, len(spawned)
+
+def read_frames(chunk_files):
+    frames = []
+    for chunk in chunk_files:
+        with wave.open(chunk) as w:
+            frames.append(w.readframes(w.getnframes()))
+    return frames
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=30)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        legacy_dir = os.path.join(work_dir, 'legacy')
+        single_dir = os.path.join(work_dir, 'single')
+        os.makedirs(legacy_dir)
+        os.makedirs(single_dir)
+        source = make_test_audio(work_dir, args.minutes)
+        shutil.copy(source, legacy_dir)
+        shutil.copy(source, single_dir)
+
+        legacy_chunks, legacy_time, legacy_procs = run_counted(legacy_pipeline, os.path.join(legacy_dir, 'bench.mp3'))
+        single_chunks, single_time, single_procs = run_counted(split_audio_into_chunks, os.path.join(single_dir, 'bench.mp3'))
+
+        identical = read_frames(legacy_chunks) == read_frames(single_chunks)
+        print(f"audio: {args.minutes} min, chunks: {len(single_chunks)} (legacy {len(legacy_chunks)}), identical output: {identical}")
+        print(f"{'pipeline':<12}{'wall (s)':>10}{'processes':>11}")
+        print(f"{'legacy':<12}{legacy_time:>10.2f}{legacy_procs:>11}")
+        print(f"{'single-pass':<12}{single_time:>10.2f}{single_procs:>11}")
+        print(f"speedup: {legacy_time / single_time:.1f}x")
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == '__main__':
+    main()
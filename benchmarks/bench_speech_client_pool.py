@@ -0,0 +1,53 @@
+"""Compare one SpeechClient per chunk with the pooled client, using an offline fake backend.
+
+Usage: python -m benchmarks.bench_speech_client_pool --chunks 60 --setup-latency 0.2
+"""
+import time
+import asyncio
+import argparse
+from unittest.mock import patch
+from services.audio_service import BYTES_PER_SAMPLE, SAMPLE_RATE_HERTZ
+from services.google_transcription_service import recognize_audio_content
+from services.speech_client_pool import SpeechClientPool
+from tests.fakes import FakeSpeechClient
+
+async def timed_recognize(audio_content, latencies):
+    start = time.perf_counter()
+    await recognize_audio_content(audio_content)
+    latencies.append(time.perf_counter() - start)
+
+def run(num_chunks, get_client):
+    audio_content = bytes(SAMPLE_RATE_HERTZ * BYTES_PER_SAMPLE)
+    latencies = []
+    FakeSpeechClient.instances = 0
+
+    async def transcribe_all():
+        await asyncio.gather(*(timed_recognize(audio_content, latencies) for _ in range(num_chunks)))
+
+    with patch('services.google_transcription_service.get_speech_client', side_effect=get_client):
+        start = time.perf_counter()
+        asyncio.run(transcribe_all())
+        elapsed = time.perf_counter() - start
+    return elapsed, sum(latencies) / len(latencies), FakeSpeechClient.instances
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=60)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--setup-latency', type=float, default=0.2)
+    parser.add_argument('--recognize-latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    def new_client():
+        return FakeSpeechClient(args.setup_latency, args.recognize_latency)
+
+    pool = SpeechClientPool(size=args.pool_size, client_factory=new_client)
+
+    print(f"chunks: {args.chunks}, client setup: {args.setup_latency}s, recognize: {args.recognize_latency}s")
+    print(f"{'clients':<18}{'wall (s)':>10}{'per chunk (s)':>15}{'created':>9}")
+    for label, get_client in [('one per chunk', new_client), (f'pool of {args.pool_size}', pool.get)]:
+        elapsed, per_chunk, created = run(args.chunks, get_client)
+        print(f"{label:<18}{elapsed:>10.2f}{per_chunk:>15.3f}{created:>9}")
+
+if __name__ == '__main__':
+    main()
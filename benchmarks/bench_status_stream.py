@@ -0,0 +1,133 @@
+"""Load test: many clients watching one task by polling /status versus one /status/<task_id>/stream each.
+
+Runs the Flask app in process with an in-memory Redis (fakeredis) for pub/sub and a counting
+stand-in for the Celery result backend, so the numbers are request and backend-read counts rather
+than network timings.
+
+Usage: python -m benchmarks.bench_status_stream --watchers 1000 --duration 10 --poll-interval 1
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from unittest.mock import patch
+
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret')
+os.environ.setdefault('OPENAI_API_KEY', 'bench-key')
+
+import fakeredis
+from flask_jwt_extended import create_access_token
+from main import app
+from services.task_events import TaskEventHub, publish_task_event
+
+TASK_ID = 'bench-task'
+
+class CountingResultBackend:
+    """Holds the task state the worker last stored and counts reads, like AsyncResult against Redis."""
+
+    def __init__(self):
+        self.state = 'PENDING'
+        self.info = None
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def async_result(self, task_id):
+        with self._lock:
+            self.reads += 1
+            state, info = self.state, self.info
+        return type('Result', (), {'state': state, 'info': info})()
+
+class Watchers:
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.finished_at = []
+        self._lock = threading.Lock()
+
+    def record(self, requests=0, size=0, finished_at=None):
+        with self._lock:
+            self.requests += requests
+            self.bytes += size
+            if finished_at is not None:
+                self.finished_at.append(finished_at)
+
+def run_job(backend, duration, num_events):
+    """Move the task through PROGRESS events to SUCCESS, as the worker would; returns when it finished."""
+    for index in range(num_events):
+        time.sleep(duration / (num_events + 1))
+        meta = {'status': 'Transcribing audio', 'partial_transcript': 'words ' * 20 * index,
+                'chunks_completed': index + 1, 'chunks_total': num_events}
+        backend.state, backend.info = 'PROGRESS', meta
+        publish_task_event(TASK_ID, 'PROGRESS', meta)
+
+    time.sleep(duration / (num_events + 1))
+    result = {'status': 'Completed', 'result': {'transcript': 'words ' * 20 * num_events, 'analysis': 'Summary'}}
+    backend.state, backend.info = 'SUCCESS', result
+    publish_task_event(TASK_ID, 'SUCCESS', result)
+    return time.perf_counter()
+
+def poll(headers, interval, watchers):
+    client = app.test_client()
+    while True:
+        response = client.get(f'/status/{TASK_ID}', headers=headers)
+        watchers.record(requests=1, size=len(response.data))
+        if response.json['state'] == 'SUCCESS':
+            watchers.record(finished_at=time.perf_counter())
+            return
+        time.sleep(interval)
+
+def stream(headers, watchers):
+    client = app.test_client()
+    response = client.get(f'/status/{TASK_ID}/stream', headers=headers, buffered=False)
+    watchers.record(requests=1)
+    for message in response.response:
+        watchers.record(size=len(message))
+        if message.startswith(b'data: ') and json.loads(message[len(b'data: '):])['state'] == 'SUCCESS':
+            watchers.record(finished_at=time.perf_counter())
+    response.close()
+
+def run(mode, args, headers):
+    backend = CountingResultBackend()
+    fake_redis = fakeredis.FakeRedis()
+    hub = TaskEventHub(redis_factory=lambda: fake_redis, poll_timeout=0.1)
+    watchers = Watchers()
+    target = (lambda: poll(headers, args.poll_interval, watchers)) if mode == 'poll' else (lambda: stream(headers, watchers))
+
+    with patch('main.download_and_process.AsyncResult', side_effect=backend.async_result), \
+            patch('main.task_event_hub', hub), \
+            patch('services.task_events.get_redis', return_value=fake_redis):
+        threads = [threading.Thread(target=target, daemon=True) for _ in range(args.watchers)]
+        for thread in threads:
+            thread.start()
+        # Stream clients are subscribed by the time the job starts; pollers only need to have started
+        while mode == 'stream' and hub.watcher_count() < args.watchers:
+            time.sleep(0.01)
+
+        done_at = run_job(backend, args.duration, args.events)
+        for thread in threads:
+            thread.join()
+
+    lag = sum(finished - done_at for finished in watchers.finished_at) / max(1, len(watchers.finished_at))
+    return watchers.requests, backend.reads, watchers.bytes, lag
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--watchers', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds the simulated task runs')
+    parser.add_argument('--events', type=int, default=10, help='progress events published by the task')
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    with app.test_request_context():
+        headers = {'Authorization': f"Bearer {create_access_token(identity={'username': 'bench'})}"}
+
+    print(f"watchers: {args.watchers}, task: {args.duration}s with {args.events} progress events, "
+          f"poll interval: {args.poll_interval}s")
+    print(f"{'mode':<8}{'requests':>10}{'backend reads':>15}{'bytes sent':>12}{'final event lag (s)':>21}")
+    for mode in ['poll', 'stream']:
+        requests, reads, size, lag = run(mode, args, headers)
+        print(f"{mode:<8}{requests:>10}{reads:>15}{size:>12}{lag:>21.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compare throughput and real-time factor of the Google and local transcription backends.
+
+The Google backend runs against FakeSpeechClient and the local backend against FakeWhisperModel
+unless --real is passed, in which case LOCAL_WHISPER_MODEL is loaded (requirements-local.txt).
+
+Usage: python -m benchmarks.bench_transcription_backends --jobs 4 --chunks 10
+"""
+import time
+import asyncio
+import argparse
+from contextlib import ExitStack
+from unittest.mock import patch
+import numpy as np
+from services import local_transcription_service
+from services.audio_service import CHUNK_LENGTH, SAMPLE_RATE_HERTZ
+from services.google_transcription_service import recognize_audio_content
+from services.local_transcription_service import BatchedInferenceEngine, load_whisper_model, transcribe_pcm_chunk
+from services.speech_client_pool import SpeechClientPool
+from tests.fakes import FakeSpeechClient, FakeWhisperModel
+
+def make_chunk():
+    # Low-level noise rather than silence so a real model does actual decoding work
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(CHUNK_LENGTH * SAMPLE_RATE_HERTZ) * 300).astype(np.int16).tobytes()
+
+def run_jobs(transcribe_chunk, jobs, chunks_per_job):
+    audio_content = make_chunk()
+
+    async def job():
+        return await asyncio.gather(*(transcribe_chunk(audio_content) for _ in range(chunks_per_job)))
+
+    async def all_jobs():
+        await asyncio.gather(*(job() for _ in range(jobs)))
+
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    asyncio.run(all_jobs())
+    return time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=4)
+    parser.add_argument('--chunks', type=int, default=10, help='30 second chunks per job')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--recognize-latency', type=float, default=1.5, help='fake Google round trip per chunk')
+    parser.add_argument('--call-overhead', type=float, default=0.3, help='fake local model cost per inference call')
+    parser.add_argument('--cost-per-second', type=float, default=0.01, help='fake local model cost per audio second')
+    parser.add_argument('--real', action='store_true', help='load the real local model instead of the fake one')
+    args = parser.parse_args()
+
+    audio_seconds = args.jobs * args.chunks * CHUNK_LENGTH
+    fake_model = FakeWhisperModel(args.call_overhead, args.cost_per_second)
+    model = load_whisper_model() if args.real else fake_model
+
+    pool = SpeechClientPool(size=4, client_factory=lambda: FakeSpeechClient(0.0, args.recognize_latency))
+    runs = [('google (fake)', recognize_audio_content, {'services.google_transcription_service.get_speech_client': pool.get})]
+    for batch_size in sorted({1, args.batch_size}):
+        engine = BatchedInferenceEngine(model_loader=lambda: model, max_batch_size=batch_size)
+        runs.append((f'local batch={batch_size}', transcribe_pcm_chunk, {'services.local_transcription_service.engine': engine}))
+
+    print(f"{args.jobs} jobs x {args.chunks} chunks = {audio_seconds / 60:.0f} min of audio, model: {'real' if args.real else 'fake'}")
+    print(f"{'backend':<18}{'wall (s)':>10}{'audio min/s':>13}{'RTF':>8}{'CPU s / audio s':>17}")
+    for label, transcribe_chunk, patches in runs:
+        with ExitStack() as stack:
+            for target, value in patches.items():
+                stack.enter_context(patch(target, value))
+            wall, cpu = run_jobs(transcribe_chunk, args.jobs, args.chunks)
+        print(f"{label:<18}{wall:>10.2f}{audio_seconds / 60 / wall:>13.2f}{wall / audio_seconds:>8.3f}{cpu / audio_seconds:>17.4f}")
+
+if __name__ == '__main__':
+    main()
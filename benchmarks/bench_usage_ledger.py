@@ -0,0 +1,83 @@
+"""Stress test: minute accounting for many parallel jobs per user, read-modify-write versus the usage ledger.
+
+'read-modify-write' is the old billing: read the user's minutes when the job starts, subtract and
+commit when it ends. 'ledger' reserves at submit time and settles at completion through
+services/usage_service.py. Each job charges --minutes; any shortfall in the final balance is
+lost updates. SQLite by default; pass --database-uri to run against Postgres.
+
+Usage: python -m benchmarks.bench_usage_ledger --users 4 --jobs-per-user 100 --job-seconds 0.01
+"""
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from db.models import db, User
+from services.usage_service import get_balance, reserve_minutes, settle_usage
+
+GRANT = 1_000_000
+
+def read_modify_write(app, user_id, job_id, minutes, job_seconds):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        free_minutes = user.free_minutes
+        db.session.commit()
+        time.sleep(job_seconds)
+        user = db.session.get(User, user_id)
+        user.free_minutes = max(0, free_minutes - minutes)
+        db.session.commit()
+
+def ledger(app, user_id, job_id, minutes, job_seconds):
+    with app.app_context():
+        reserve_minutes(user_id, job_id, minutes)
+        time.sleep(job_seconds)
+        settle_usage(user_id, job_id, minutes)
+
+def balance(app, mode, user_id):
+    with app.app_context():
+        if mode == 'ledger':
+            return get_balance(user_id)
+        return db.session.get(User, user_id).free_minutes
+
+def run(mode, database_uri, args):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': args.pool_size, 'max_overflow': 0}
+    db.init_app(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        users = [User(username=f'{mode}-{index}', password='unused', free_minutes=GRANT) for index in range(args.users)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+    job = read_modify_write if mode == 'read-modify-write' else ledger
+    jobs = [(user_id, f'{mode}-{user_id}-{index}') for index in range(args.jobs_per_user) for user_id in user_ids]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users * args.jobs_per_user) as executor:
+        list(executor.map(lambda item: job(app, item[0], item[1], args.minutes, args.job_seconds), jobs))
+    elapsed = time.perf_counter() - started
+
+    expected = GRANT - args.jobs_per_user * args.minutes
+    lost = sum(balance(app, mode, user_id) - expected for user_id in user_ids) // args.minutes
+    print(f"{mode:>17}: {len(jobs) / elapsed:8.1f} jobs/s, {lost} of {len(jobs)} charges lost")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--jobs-per-user', type=int, default=100)
+    parser.add_argument('--minutes', type=int, default=3)
+    parser.add_argument('--job-seconds', type=float, default=0.01, help='time between reading and charging minutes')
+    parser.add_argument('--pool-size', type=int, default=20)
+    parser.add_argument('--database-uri')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ('read-modify-write', 'ledger'):
+            database_uri = args.database_uri or f"sqlite:///{os.path.join(directory, mode + '.db')}"
+            run(mode, database_uri, args)
+
+if __name__ == '__main__':
+    main()
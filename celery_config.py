@@ -1,4 +1,17 @@
 from celery import Celery
+from celery.signals import worker_process_init
+from db.models import db
+from utils.metrics_exporter import start_metrics_pusher
+
+# Pipeline stages run on their own queues so each can be given workers sized for its load;
+# job entry, merge and billing tasks stay on the default 'celery' queue
+PIPELINE_TASK_ROUTES = {
+    'tasks.fetch_audio': {'queue': 'download'},
+    'tasks.segment_audio': {'queue': 'audio'},
+    'tasks.transcribe_chunk': {'queue': 'transcribe'},
+    'tasks.analyze_transcript': {'queue': 'analysis'},
+    'tasks.index_transcript': {'queue': 'search'},
+}
 
 def make_celery(app):
     celery = Celery(
@@ -8,6 +21,7 @@ def make_celery(app):
         broker_connection_retry_on_startup='False'
     )
     celery.conf.update(app.config)
+    celery.conf.task_routes = PIPELINE_TASK_ROUTES
 
     # Create a subclass of the celery Task class that runs tasks within the Flask app context
     class ContextTask(celery.Task):
@@ -16,4 +30,16 @@ def make_celery(app):
                 return super().__call__(*args, **kwargs)
 
     celery.Task = ContextTask
+
+    @worker_process_init.connect(weak=False)
+    def reset_db_pool(**kwargs):
+        # Pooled connections inherited from the parent are its sockets; each child opens its own
+        with app.app_context():
+            db.engine.dispose(close=False)
+        # Each child has its own metrics, which /metrics on the API collects from Redis
+        start_metrics_pusher('worker')
+
+    # The current app is thread-local; without a default, request threads other than the one that
+    # built the app resolve shared tasks against Celery's unconfigured fallback app
+    celery.set_default()
     return celery
\ No newline at end of file
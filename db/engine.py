@@ -0,0 +1,54 @@
+import os
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from utils.metrics import registry
+
+# Per-process pool. Postgres sees up to (size + overflow) connections from every API and Celery
+# worker process, so keep the sum across hosts under max_connections
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+# Seconds a checkout waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+# Replace connections older than this, before the server or a proxy drops them
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+
+pool_checkouts_total = registry.counter('db_pool_checkouts_total', 'Connections checked out of the pool')
+pool_checkout_wait_seconds_total = registry.counter(
+    'db_pool_checkout_wait_seconds_total', 'Time spent waiting for pool checkouts, including new connections'
+)
+pool_checkout_timeouts_total = registry.counter('db_pool_checkout_timeouts_total', 'Checkouts that gave up waiting')
+pool_checked_out = registry.gauge('db_pool_checked_out', 'Connections currently checked out in this process')
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_checkout_timeouts_total.inc()
+            raise
+        finally:
+            pool_checkouts_total.inc()
+            pool_checkout_wait_seconds_total.inc(time.perf_counter() - started)
+            pool_checked_out.set(self.checkedout())
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        pool_checked_out.set(self.checkedout())
+
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for database_uri; SQLite keeps SQLAlchemy's defaults."""
+    if database_uri.startswith('sqlite'):
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        # Test connections on checkout, so ones dropped while idle are replaced instead of failing a request
+        'pool_pre_ping': True,
+    }
@@ -1,4 +1,6 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 
 db = SQLAlchemy()
 
@@ -6,4 +8,68 @@ class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(120), nullable=False)
+    # Minutes granted to the user; what is left is this minus their usage, see services/usage_service.py
     free_minutes = db.Column(db.Integer, default=10)
+
+class Usage(db.Model):
+    """Minutes charged for one job: reserved when it is submitted, settled when it completes."""
+    __tablename__ = 'usage'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    task_id = db.Column(db.String(155), unique=True, nullable=False)
+    minutes = db.Column(db.Integer, nullable=False)
+    # 'reserved', 'settled' or 'released'; released rows no longer count against the user
+    status = db.Column(db.String(16), nullable=False, default='reserved')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    settled_at = db.Column(db.DateTime)
+
+class TranscriptSegment(db.Model):
+    """One transcribed chunk of a video, with its time range in the original audio.
+
+    Only the latest transcription of each video is kept, see services/transcript_store.py.
+    """
+    __tablename__ = 'transcript_segment'
+    __table_args__ = (db.UniqueConstraint('video_id', 'chunk_index'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(64), nullable=False)
+    chunk_index = db.Column(db.Integer, nullable=False)
+    start_seconds = db.Column(db.Float, nullable=False)
+    end_seconds = db.Column(db.Float, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    # Left null by backends that report neither, like the local one
+    confidence = db.Column(db.Float)
+    # [{'word', 'start', 'end'}] with times in seconds in the original audio
+    words = db.Column(db.JSON)
+
+class SearchDocument(db.Model):
+    """A transcript segment as indexed for /search, copied from TranscriptSegment by the index_transcript task.
+
+    The full-text index over text depends on the database, see the DDL below and services/transcript_search.py.
+    """
+    __tablename__ = 'search_document'
+
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.String(64), nullable=False, index=True)
+    chunk_index = db.Column(db.Integer, nullable=False)
+    start_seconds = db.Column(db.Float, nullable=False)
+    end_seconds = db.Column(db.Float, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+
+# SQLite: an FTS5 table over search_document, kept in step by triggers
+for statement in (
+    "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+    "text, content='search_document', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER search_document_ai AFTER INSERT ON search_document BEGIN "
+    "INSERT INTO search_document_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER search_document_ad AFTER DELETE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+):
+    event.listen(SearchDocument.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(SearchDocument.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS search_document_fts').execute_if(dialect='sqlite'))
+
+# Postgres: a GIN index over the text's tsvector
+event.listen(SearchDocument.__table__, 'after_create', DDL(
+    "CREATE INDEX search_document_text_tsv ON search_document USING GIN (to_tsvector('english', text))"
+).execute_if(dialect='postgresql'))
@@ -0,0 +1,29 @@
+import os
+import sys
+
+# Production server for the API: gunicorn -c gunicorn.conf.py main:app
+# gevent workers serve each request on a greenlet, so requests waiting on yt-dlp, Redis or
+# Postgres, and open /status streams, do not each hold a thread
+bind = os.getenv('BIND', '0.0.0.0:8080')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gevent')
+# Concurrent requests per worker, including open /status streams
+worker_connections = int(os.getenv('WEB_WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+
+def post_worker_init(worker):
+    # After gevent has patched the worker, so the pusher's Redis calls run on the hub like requests'
+    from utils.metrics_exporter import start_metrics_pusher
+    start_metrics_pusher('api')
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # httpcore (under the OpenAI client) imports trio when installed, which fails once gevent
+        # has patched select; make it fall back as if trio were absent
+        sys.modules.setdefault('trio', None)
+        try:
+            from utils.concurrency import make_psycopg2_green
+            make_psycopg2_green()
+        except ImportError:
+            # SQLite in development has no driver to patch
+            pass
@@ -1,47 +1,42 @@
 import os
+import uuid
 import logging
-from flask import Flask, request, jsonify
+from flask import Response, request, jsonify
 from flask_cors import CORS
-import yt_dlp
+from app_factory import create_base_app
 from celery_config import make_celery
-from dotenv import load_dotenv
 from tasks import download_and_process
 from db.models import db, User
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from utils.get_env_variables import load_secrets
 from celery.exceptions import TaskRevokedError
-
-secrets = load_secrets()
+from services.video_metadata_service import get_video_metadata, VideoMetadataError
+from services.usage_service import get_balance, minutes_for, reserve_minutes, release_reservation
+from services.transcript_store import get_segments, has_transcript, TRANSCRIPT_PAGE_SIZE, TRANSCRIPT_MAX_PAGE_SIZE
+from services.transcript_search import search_transcripts, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
+from services.task_events import task_status_response, task_event_hub, stream_task_events
+from utils.metrics_exporter import render_metrics
 
 logger = logging.getLogger(__name__)
 
+# When set, /metrics requires 'Authorization: Bearer <METRICS_TOKEN>'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
 def create_app():
-    app = Flask(__name__)
+    """Build the API app; tables are created by `flask --app main init-db`, not on import."""
+    secrets = load_secrets()
+    app = create_base_app(__name__)
     logger.info('createing app - main.py')
     logger.info(f"secrets: {secrets['CELERY_BROKER_URL']}")
     logger.info(f"secrets: {secrets['CELERY_RESULT_BACKEND']}")
 
-    load_dotenv()
-
-    app.config.update(
-        CELERY_broker_url=secrets['CELERY_BROKER_URL'],
-        result_backend=secrets['CELERY_RESULT_BACKEND'],
-        SQLALCHEMY_DATABASE_URI=secrets['SQLALCHEMY_DATABASE_URI'],
-        SQLALCHEMY_TRACK_MODIFICATIONS=secrets['SQLALCHEMY_TRACK_MODIFICATIONS'],
-        JWT_SECRET_KEY=secrets['JWT_SECRET_KEY'],
-    )
-
-    db.init_app(app) 
     jwt = JWTManager(app)
 
     CORS(app, resources={r"/*": {"origins": secrets['FRONTEND_URL']}})
 
     celery = make_celery(app) 
 
-    with app.app_context():
-        db.create_all()
-
     return app, celery
 
 def register_routes(app):
@@ -98,7 +93,7 @@ def register_routes(app):
             current_user = get_jwt_identity()
             user = User.query.filter_by(username=current_user['username']).first()
 
-            if user.free_minutes <= 0:
+            if get_balance(user.id) <= 0:
                 return jsonify({'error': 'You have exhausted your free transcription time. Please purchase more time.'}), 403
 
             url = request.json.get('url')
@@ -106,21 +101,31 @@ def register_routes(app):
 
             if not url or not prompt:
                 return jsonify({'error': 'YouTube URL and prompt are required'}), 400
-            
-            ydl_opts = {'quiet': True, 'skip_download': True}
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                try:
-                    info_dict = ydl.extract_info(url, download=False)
-                    duration = info_dict.get('duration', 0)
-                    
-                    if duration > 1800:  # 1800 seconds = 30 minutes
-                        return jsonify({'error': 'Video is too long. Maximum allowed length is 30 minutes.'}), 400
-                    
-                    task = download_and_process.apply_async(args=[url, prompt, user.id])
-                    return jsonify({'task_id': task.id}), 202
-                
-                except yt_dlp.utils.DownloadError:
-                    return jsonify({'error': 'Unable to retrieve video information. Please check the URL.'}), 400
+
+            # Hand the DB connection back to the pool rather than holding it through the probe
+            user_id = user.id
+            db.session.close()
+
+            try:
+                metadata = get_video_metadata(url)
+            except VideoMetadataError:
+                return jsonify({'error': 'Unable to retrieve video information. Please check the URL.'}), 400
+
+            duration = metadata.get('duration') or 0
+            if duration > 1800:  # 1800 seconds = 30 minutes
+                return jsonify({'error': 'Video is too long. Maximum allowed length is 30 minutes.'}), 400
+
+            # Reserve the minutes now so concurrent submissions see them; the job settles them when it completes
+            task_id = str(uuid.uuid4())
+            if not reserve_minutes(user_id, task_id, minutes_for(duration)):
+                return jsonify({'error': 'You do not have enough transcription time left for this video. Please purchase more time.'}), 403
+            try:
+                # The worker downloads from this metadata instead of probing the video again
+                task = download_and_process.apply_async(args=[url, prompt, user_id], kwargs={'metadata': metadata}, task_id=task_id)
+            except Exception:
+                release_reservation(task_id)
+                raise
+            return jsonify({'task_id': task.id, 'video_id': metadata.get('id')}), 202
         
         except Exception as e:
             logger.error(f"Error processing video: {str(e)}")
@@ -131,27 +136,8 @@ def register_routes(app):
     def task_status(task_id):
         try:
             task = download_and_process.AsyncResult(task_id)
-        
-            logger.info(f'Task: {task}\nTask State: {task.state}\nTask Info: {task.info}')
-
-            if task.state == 'PENDING':
-                response = {
-                    'state': task.state,
-                    'status': 'Pending...'
-                }
-
-            elif task.state == 'FAILURE':
-                response = {
-                    'state': task.state,
-                    'status': str(task.info) 
-                }
-            
-            else:
-                response = {
-                    'state': task.state,
-                    'result': task.info.get('result', ''),
-                    'status': task.info.get('status', 'Processing...'),
-                }
+            response = task_status_response(task.state, task.info)
+            logger.debug(f'Task {task_id} state: {response["state"]}')
             return jsonify(response)
         
         except TaskRevokedError:
@@ -160,6 +146,73 @@ def register_routes(app):
             logger.error(f"Error checking task status: {str(e)}")
             return jsonify({'state': 'ERROR', 'info': 'Error checking task status'}), 500 
 
+    @app.route('/status/<task_id>/stream')
+    @jwt_required(locations=['headers', 'query_string'])
+    def task_status_stream(task_id):
+        # EventSource cannot set headers, so browsers pass the token as ?jwt=<token>
+        events = None
+        try:
+            # Subscribe before reading the current state, so no transition in between is lost
+            events = task_event_hub.watch(task_id)
+            task = download_and_process.AsyncResult(task_id)
+            snapshot = task_status_response(task.state, task.info)
+        except TaskRevokedError:
+            snapshot = {'state': 'REVOKED', 'info': 'Task was revoked'}
+        except Exception as e:
+            if events is not None:
+                task_event_hub.unwatch(task_id, events)
+            logger.error(f"Error opening task status stream: {str(e)}")
+            return jsonify({'state': 'ERROR', 'info': 'Error checking task status'}), 500
+
+        return Response(
+            stream_task_events(task_id, snapshot, events, task_event_hub),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    @app.route('/transcripts/<video_id>', methods=['GET'])
+    @jwt_required()
+    def transcript_segments(video_id):
+        # ?start=&end= select segments overlapping that many seconds into the video; ?cursor= pages
+        try:
+            start = request.args.get('start', type=float)
+            end = request.args.get('end', type=float)
+            cursor = request.args.get('cursor', type=int)
+            limit = min(max(request.args.get('limit', TRANSCRIPT_PAGE_SIZE, type=int), 1), TRANSCRIPT_MAX_PAGE_SIZE)
+
+            segments, next_cursor = get_segments(video_id, start, end, cursor, limit)
+            if not segments and not has_transcript(video_id):
+                return jsonify({'error': 'Transcript not found'}), 404
+            return jsonify({'video_id': video_id, 'segments': segments, 'next_cursor': next_cursor}), 200
+        except Exception as e:
+            logger.error(f"Error fetching transcript segments: {str(e)}")
+            return jsonify({'error': 'Error fetching transcript'}), 500
+
+    @app.route('/search', methods=['GET'])
+    @jwt_required()
+    def search():
+        # ?q= matches words in indexed transcripts; videos come back best match first
+        try:
+            query = request.args.get('q', '').strip()
+            if not query:
+                return jsonify({'error': 'Search query is required'}), 400
+            limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), 1), SEARCH_MAX_PAGE_SIZE)
+
+            return jsonify({'query': query, 'results': search_transcripts(query, limit)}), 200
+        except Exception as e:
+            logger.error(f"Error searching transcripts: {str(e)}")
+            return jsonify({'error': 'Error searching transcripts'}), 500
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        # Scraped by Prometheus: this process's metrics and those every API and worker process pushed
+        if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+            return jsonify({'error': 'Unauthorized'}), 401
+        try:
+            return Response(render_metrics('api'), mimetype='text/plain; version=0.0.4')
+        except Exception as e:
+            logger.error(f"Error rendering metrics: {str(e)}")
+            return jsonify({'error': 'Error rendering metrics'}), 500
 
     @app.route('/profile', methods=['GET'])
     @jwt_required()
@@ -171,7 +224,7 @@ def register_routes(app):
                 return jsonify({"message": "User not found"}), 404
             return jsonify({
                 'username': user.username,
-                'free_minutes': user.free_minutes
+                'free_minutes': max(0, get_balance(user.id))
             }), 200
         except Exception as e:
             logger.error(f"Error fetching user profile: {str(e)}")
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import redis
+from utils.redis_client import get_redis
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_PREFIX = 'analysis:'
+ANALYSIS_CACHE_TTL = int(os.getenv('ANALYSIS_CACHE_TTL', 7 * 24 * 3600))
+# Entries kept in each process in front of Redis
+ANALYSIS_CACHE_L1_SIZE = int(os.getenv('ANALYSIS_CACHE_L1_SIZE', 256))
+# How long other workers wait on a worker already computing the same analysis before computing it themselves
+ANALYSIS_CACHE_LOCK_TIMEOUT = int(os.getenv('ANALYSIS_CACHE_LOCK_TIMEOUT', 300))
+
+cache_hits_total = registry.counter('analysis_cache_hits_total', 'Analysis results served from cache, by tier')
+cache_misses_total = registry.counter('analysis_cache_misses_total', 'Analysis results computed upstream')
+
+def normalize_prompt(prompt):
+    """Collapse whitespace, and treat any casing of 'summarize' as the built-in summary prompt."""
+    prompt = ' '.join((prompt or '').split())
+    return 'summarize' if prompt.casefold() == 'summarize' else prompt
+
+def make_analysis_key(transcript, prompt, model, retrieval=None):
+    """Build a cache key from the transcript hash, the normalized prompt and the model.
+
+    retrieval holds the settings of the retrieval an answer is built with, if any, so answers
+    from retrieved spans and from the whole transcript are cached apart.
+    """
+    transcript_hash = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    fields = {'transcript': transcript_hash, 'prompt': normalize_prompt(prompt), 'model': model}
+    if retrieval is not None:
+        fields['retrieval'] = retrieval
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class AnalysisCache:
+    """Analysis results in an in-process LRU (L1) backed by Redis (L2), shared by every worker.
+
+    get_or_compute() deduplicates concurrent misses: threads in one process wait on a shared
+    future, and processes coordinate through a short-lived Redis lock, so one upstream call is
+    made per key. Redis errors degrade to L1 only rather than failing the analysis.
+    """
+
+    def __init__(self, redis_factory=get_redis, ttl=ANALYSIS_CACHE_TTL, l1_size=ANALYSIS_CACHE_L1_SIZE,
+                 lock_timeout=ANALYSIS_CACHE_LOCK_TIMEOUT, poll_interval=0.1):
+        self.redis_factory = redis_factory
+        self.ttl = ttl
+        self.l1_size = l1_size
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._l1 = OrderedDict()
+        self._inflight = {}
+
+    def get(self, key):
+        """Return the cached result, or None on a miss."""
+        value = self._get_l1(key)
+        if value is not None:
+            cache_hits_total.inc(tier='l1')
+            return value
+
+        try:
+            value = self.redis_factory().get(ANALYSIS_CACHE_PREFIX + key)
+        except Exception as e:
+            logger.error(f"Error reading analysis cache: {str(e)}")
+            return None
+        if value is None:
+            return None
+
+        value = value.decode('utf-8')
+        self._set_l1(key, value)
+        cache_hits_total.inc(tier='redis')
+        return value
+
+    def set(self, key, value):
+        self._set_l1(key, value)
+        try:
+            self.redis_factory().set(ANALYSIS_CACHE_PREFIX + key, value, ex=self.ttl)
+        except Exception as e:
+            logger.error(f"Error writing analysis cache: {str(e)}")
+
+    def get_or_compute(self, key, compute):
+        """Return the cached result for key, calling compute() once across all concurrent callers on a miss."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._compute_once(key, compute)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def clear(self):
+        """Drop this process's L1 entries; Redis entries expire on their own."""
+        with self._lock:
+            self._l1.clear()
+
+    def _compute_once(self, key, compute):
+        lock_key = ANALYSIS_CACHE_PREFIX + 'lock:' + key
+        token = uuid.uuid4().hex
+        while True:
+            try:
+                acquired = self.redis_factory().set(lock_key, token, nx=True, ex=self.lock_timeout)
+            except Exception as e:
+                logger.error(f"Error locking analysis cache: {str(e)}")
+                return self._compute_and_store(key, compute)
+
+            if acquired:
+                try:
+                    # Another process may have stored the result between our miss and the lock
+                    value = self.get(key)
+                    return value if value is not None else self._compute_and_store(key, compute)
+                finally:
+                    self._release(lock_key, token)
+
+            value = self._wait_for_holder(key, lock_key)
+            if value is not None:
+                return value
+
+    def _compute_and_store(self, key, compute):
+        cache_misses_total.inc()
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def _wait_for_holder(self, key, lock_key):
+        """Poll until the process holding the lock stores the result; None if it gave up or failed."""
+        client = self.redis_factory()
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if not client.exists(lock_key):
+                return self.get(key)
+        return None
+
+    def _release(self, lock_key, token):
+        # Only delete the lock if it is still ours; it may have expired and been taken by another process
+        try:
+            with self.redis_factory().pipeline() as pipe:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token.encode():
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+        except redis.WatchError:
+            pass
+        except Exception as e:
+            logger.error(f"Error releasing analysis cache lock: {str(e)}")
+
+    def _get_l1(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return value
+
+    def _set_l1(self, key, value):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self.ttl, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+analysis_cache = AnalysisCache()
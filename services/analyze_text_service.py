@@ -1,40 +1,240 @@
-from openai import OpenAI
 import os
+import re
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from utils.get_env_variables import load_secrets
+from services.analysis_cache import analysis_cache, make_analysis_key, normalize_prompt
+from services.embedding_cache import embedding_cache, make_embedding_key
 
 load_dotenv()
 
-secrets = load_secrets()
-
-client = OpenAI(
-    api_key= secrets['OPEN_AI_API_KEY'],
-)
 import logging
 
 logger = logging.getLogger(__name__)
 
+ANALYSIS_MODEL = os.getenv('ANALYSIS_MODEL', 'gpt-3.5-turbo')
+# Transcripts up to this many tokens are analyzed in a single call
+ANALYSIS_SINGLE_CALL_TOKENS = int(os.getenv('ANALYSIS_SINGLE_CALL_TOKENS', 3000))
+# Longer transcripts are split into sections of at most this many tokens, analyzed concurrently
+ANALYSIS_SECTION_TOKENS = int(os.getenv('ANALYSIS_SECTION_TOKENS', 2000))
+ANALYSIS_MAX_PARALLEL = int(os.getenv('ANALYSIS_MAX_PARALLEL', 4))
+# Stream the answer the user sees and relay it through the job's progress as it is written
+ANALYSIS_STREAMING = os.getenv('ANALYSIS_STREAMING', 'true').lower() == 'true'
+# 'questions' answers question prompts from only the transcript spans most relevant to them, 'all' does
+# so for every prompt but 'summarize', and 'off' always sends the whole transcript
+ANALYSIS_RETRIEVAL = os.getenv('ANALYSIS_RETRIEVAL', 'questions')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+# Transcripts up to this many tokens are always sent whole
+RETRIEVAL_MIN_TOKENS = int(os.getenv('RETRIEVAL_MIN_TOKENS', 1500))
+# Transcripts are embedded in spans of at most this many tokens, and a prompt gets the RETRIEVAL_TOP_K best
+RETRIEVAL_SPAN_TOKENS = int(os.getenv('RETRIEVAL_SPAN_TOKENS', 200))
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', 6))
+# Inputs per embeddings request
+EMBEDDING_BATCH_SIZE = 256
 
-def analyze_text(transcript, user_prompt):
-    logger.info('Begin ----- analyze_text')
-    """Analyze the transcript based on the user's prompt using OpenAI GPT."""
+# Prompts starting with one of these are treated as questions, as are prompts ending with '?'
+QUESTION_WORDS = {
+    'who', 'whom', 'whose', 'what', 'when', 'where', 'which', 'why', 'how', 'is', 'are', 'was', 'were',
+    'do', 'does', 'did', 'can', 'could', 'should', 'would', 'will', 'has', 'have', 'had',
+}
+
+# Used when tiktoken or its encoding files are unavailable; close to the average for English text
+CHARS_PER_TOKEN = 4
+
+def get_client():
+    """Return the OpenAI client for the current API key, so a rotated key takes effect on refresh."""
+    return client_for_key(load_secrets()['OPEN_AI_API_KEY'])
+
+@lru_cache(maxsize=1)
+def client_for_key(api_key):
+    # Created on first use; the SDK alone takes over half a second to import
+    from openai import OpenAI
+    return OpenAI(
+        api_key=api_key,
+    )
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Return the tiktoken encoding for the analysis model, or None to fall back to estimates."""
     try:
-        if user_prompt == 'summarize':
-            prompt = f'write a detailed summary of the following text: {transcript}'
-        else:
-            prompt = f"{user_prompt}: {transcript}"
-
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="gpt-3.5-turbo"
-        )
+        import tiktoken
+        return tiktoken.encoding_for_model(ANALYSIS_MODEL)
+    except Exception as e:
+        logger.warning(f"Token counts are estimated, tiktoken encoding unavailable: {str(e)}")
+        return None
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _split_units(text, max_tokens):
+    """Yield pieces of text no longer than max_tokens, breaking at lines, then sentences, then words."""
+    for line in text.splitlines(keepends=True):
+        if count_tokens(line) <= max_tokens:
+            yield line
+            continue
+        for sentence in re.split(r'(?<=[.!?])(?=\s)', line):
+            if count_tokens(sentence) <= max_tokens:
+                yield sentence
+                continue
+            yield from re.findall(r'\s*\S+', sentence)
+
+def split_transcript(transcript, max_tokens=ANALYSIS_SECTION_TOKENS):
+    """Split a transcript into consecutive sections of at most max_tokens, preferring line and sentence breaks."""
+    sections = []
+    current = []
+    current_tokens = 0
+    for unit in _split_units(transcript, max_tokens):
+        unit_tokens = count_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            sections.append(''.join(current))
+            current = []
+            current_tokens = 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        sections.append(''.join(current))
+    return sections
+
+def complete(prompt, on_delta=None):
+    """Return the model's answer to prompt; with on_delta, stream it and pass on each piece as it arrives."""
+    messages = [
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    if on_delta is None:
+        chat_completion = get_client().chat.completions.create(messages=messages, model=ANALYSIS_MODEL)
         return chat_completion.choices[0].message.content
 
+    parts = []
+    for chunk in get_client().chat.completions.create(messages=messages, model=ANALYSIS_MODEL, stream=True):
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            on_delta(delta)
+    return ''.join(parts)
+
+def build_prompt(transcript, user_prompt):
+    if user_prompt == 'summarize':
+        return f'write a detailed summary of the following text: {transcript}'
+    return f"{user_prompt}: {transcript}"
+
+def build_map_prompt(section, index, total, user_prompt):
+    if user_prompt == 'summarize':
+        return f'write a detailed summary of the following text, part {index} of {total} of a transcript: {section}'
+    return (
+        f'The following text is part {index} of {total} of a transcript. Extract everything in it that is '
+        f'relevant to this request, without answering it yet: "{user_prompt}"\n\n{section}'
+    )
+
+def build_reduce_prompt(notes, user_prompt):
+    if user_prompt == 'summarize':
+        return f'combine the following summaries of consecutive parts of one text into a single detailed summary: {notes}'
+    return f"{user_prompt}: (the following are notes on consecutive parts of one transcript) {notes}"
+
+def map_reduce(transcript, user_prompt, on_delta=None):
+    """Analyze each section concurrently, then combine the partial results, reducing in rounds if they are still too long."""
+    sections = split_transcript(transcript, ANALYSIS_SECTION_TOKENS)
+    logger.info(f"Analyzing transcript in {len(sections)} sections")
+
+    with ThreadPoolExecutor(max_workers=ANALYSIS_MAX_PARALLEL) as executor:
+        prompts = [build_map_prompt(section, index, len(sections), user_prompt) for index, section in enumerate(sections, 1)]
+        notes = list(executor.map(complete, prompts))
+
+        while count_tokens('\n\n'.join(notes)) > ANALYSIS_SINGLE_CALL_TOKENS and len(notes) > 1:
+            groups = split_transcript('\n\n'.join(notes), ANALYSIS_SECTION_TOKENS)
+            if len(groups) >= len(notes):
+                break
+            notes = list(executor.map(lambda group: complete(build_reduce_prompt(group, user_prompt)), groups))
+
+    # Only the final answer is streamed; section notes are never shown
+    return complete(build_reduce_prompt('\n\n'.join(notes), user_prompt), on_delta)
+
+def is_question(prompt):
+    words = prompt.casefold().split()
+    return prompt.rstrip().endswith('?') or (bool(words) and words[0] in QUESTION_WORDS)
+
+def wants_retrieval(transcript, user_prompt):
+    """Whether the prompt is answered from the most relevant spans rather than the whole transcript."""
+    if user_prompt == 'summarize' or ANALYSIS_RETRIEVAL == 'off':
+        return False
+    if ANALYSIS_RETRIEVAL == 'questions' and not is_question(user_prompt):
+        return False
+    return count_tokens(transcript) > RETRIEVAL_MIN_TOKENS
+
+def retrieval_settings():
+    """Settings that change which spans a prompt is answered from, used to key cached analyses."""
+    return {'embedding_model': EMBEDDING_MODEL, 'top_k': RETRIEVAL_TOP_K, 'span_tokens': RETRIEVAL_SPAN_TOKENS}
+
+def embed(texts):
+    """Return the embeddings of texts as a float32 matrix, one row per text."""
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        response = get_client().embeddings.create(model=EMBEDDING_MODEL, input=texts[start:start + EMBEDDING_BATCH_SIZE])
+        vectors.extend(item.embedding for item in response.data)
+    return np.array(vectors, dtype=np.float32)
+
+def transcript_index(transcript):
+    """Return the transcript's spans and a vector index over them; spans are only embedded on a cache miss."""
+    key = make_embedding_key(transcript, EMBEDDING_MODEL, RETRIEVAL_SPAN_TOKENS)
+    cached = embedding_cache.get(key)
+    if cached is not None:
+        return cached
+    spans = split_transcript(transcript, RETRIEVAL_SPAN_TOKENS)
+    return embedding_cache.set(key, spans, embed(spans))
+
+class RetrievalError(Exception):
+    """The spans to answer a prompt from could not be retrieved."""
+
+def retrieve_spans(transcript, user_prompt, k=RETRIEVAL_TOP_K):
+    """Return the k spans of the transcript most relevant to the prompt, in transcript order."""
+    spans, index = transcript_index(transcript)
+    best, _ = index.search(embed([user_prompt])[0], k)
+    logger.info(f"Retrieved {len(best)} of {len(spans)} transcript spans")
+    return [spans[i] for i in sorted(best)]
+
+def build_retrieval_prompt(spans, user_prompt):
+    excerpts = '\n...\n'.join(span.strip() for span in spans)
+    return f"{user_prompt}: (the following are the parts of one transcript most relevant to this request) {excerpts}"
+
+def analyze_text(transcript, user_prompt, progress=None):
+    """Analyze the transcript based on the user's prompt using OpenAI GPT.
+
+    With a services.progress_service.AnalysisProgress, the answer is streamed into it as it is written.
+    """
+    logger.info('Begin ----- analyze_text')
+    try:
+        user_prompt = normalize_prompt(user_prompt)
+        on_delta = progress.add if progress is not None and ANALYSIS_STREAMING else None
+        if wants_retrieval(transcript, user_prompt):
+            key = make_analysis_key(transcript, user_prompt, ANALYSIS_MODEL, retrieval_settings())
+            try:
+                return analysis_cache.get_or_compute(key, lambda: answer_from_spans(transcript, user_prompt, on_delta))
+            except RetrievalError as e:
+                # The whole-transcript answer is cached as such, so retrieval is tried again next time
+                logger.error(f"Error retrieving transcript spans, analyzing the whole transcript: {str(e)}")
+
+        key = make_analysis_key(transcript, user_prompt, ANALYSIS_MODEL)
+        return analysis_cache.get_or_compute(key, lambda: run_analysis(transcript, user_prompt, on_delta))
+
     except Exception as e:
         logger.error(f"Error during transcript analysis: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def answer_from_spans(transcript, user_prompt, on_delta=None):
+    try:
+        spans = retrieve_spans(transcript, user_prompt)
+    except Exception as e:
+        raise RetrievalError(str(e)) from e
+    return complete(build_retrieval_prompt(spans, user_prompt), on_delta)
+
+def run_analysis(transcript, user_prompt, on_delta=None):
+    if count_tokens(transcript) <= ANALYSIS_SINGLE_CALL_TOKENS:
+        return complete(build_prompt(transcript, user_prompt), on_delta)
+    return map_reduce(transcript, user_prompt, on_delta)
@@ -0,0 +1,211 @@
+import os
+import re
+import time
+import glob
+import logging
+import asyncio
+import ffmpeg
+import numpy as np
+from services.vad import frame_energy_db, plan_chunks, VAD_FRAME_MS, VAD_HANGOVER_MS
+from services.pipeline_metrics import stage_seconds, job_chunks, bytes_total
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE_HERTZ = 16000
+BYTES_PER_SAMPLE = 2
+CHUNK_LENGTH = 30
+
+# Drop non-speech from streamed audio before it is sent to the recognizer
+VAD_ENABLED = os.getenv('VAD_ENABLED', 'true').lower() == 'true'
+# Frames decoded per block during VAD passes (100 frames of 30 ms = 3 seconds)
+VAD_BLOCK_FRAMES = 100
+
+CHUNK_INDEX_PATTERN = re.compile(r'_chunk(\d+)\.wav$')
+
+def split_audio_into_chunks(input_audio_file, chunk_length=CHUNK_LENGTH):
+    """Decode the audio file once and split it into 16 kHz mono WAV chunks of the specified length (in seconds)."""
+    base_path = os.path.splitext(input_audio_file)[0]
+    for stale_chunk in glob.glob(f"{glob.escape(base_path)}_chunk*.wav"):
+        os.remove(stale_chunk)
+
+    # Resample, downmix and re-packetize to whole seconds so the segment muxer cuts
+    # on exact sample boundaries, matching the old per-chunk seek-and-trim output.
+    audio = (
+        ffmpeg
+        .input(input_audio_file)
+        .audio
+        .filter('aresample', SAMPLE_RATE_HERTZ)
+        .filter('aformat', channel_layouts='mono')
+        .filter('asetnsamples', n=SAMPLE_RATE_HERTZ, p=0)
+    )
+    (
+        ffmpeg
+        .output(audio, f"{base_path}_chunk%d.wav", f='segment', segment_time=chunk_length, reset_timestamps=1)
+        .run(overwrite_output=True)
+    )
+
+    chunk_files = glob.glob(f"{glob.escape(base_path)}_chunk*.wav")
+    return sorted(chunk_files, key=lambda chunk: int(CHUNK_INDEX_PATTERN.search(chunk).group(1)))
+
+def read_pcm_chunks(input_audio_file, chunk_length=CHUNK_LENGTH):
+    """Decode the audio file to raw 16-bit mono PCM on a pipe and yield one chunk of bytes at a time."""
+    chunk_bytes = int(chunk_length * SAMPLE_RATE_HERTZ) * BYTES_PER_SAMPLE
+    process = (
+        ffmpeg
+        .input(input_audio_file)
+        .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=SAMPLE_RATE_HERTZ)
+        .run_async(pipe_stdout=True)
+    )
+
+    # A single read buffer is reused for every chunk; only the chunks handed out are copied
+    buffer = bytearray(chunk_bytes)
+    view = memoryview(buffer)
+    finished = False
+    try:
+        while True:
+            filled = 0
+            while filled < chunk_bytes:
+                read = process.stdout.readinto(view[filled:])
+                if not read:
+                    break
+                filled += read
+
+            if filled:
+                yield bytes(view[:filled])
+            if filled < chunk_bytes:
+                break
+        finished = True
+    finally:
+        view.release()
+        process.stdout.close()
+        returncode = process.wait()
+        if finished and returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {input_audio_file} (exit code {returncode})")
+
+class PcmCursor:
+    """Reads sample ranges, in increasing order, out of a sequence of PCM blocks.
+
+    Everything before the requested range is discarded, so only the current range is buffered.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.buffer = bytearray()
+        self.buffer_start = 0
+
+    def read(self, start, end):
+        while self.buffer_start + len(self.buffer) // BYTES_PER_SAMPLE < end:
+            block = next(self.blocks, None)
+            if block is None:
+                break
+            if self.buffer_start + len(self.buffer) // BYTES_PER_SAMPLE <= start:
+                self.buffer_start += len(self.buffer) // BYTES_PER_SAMPLE
+                self.buffer = bytearray(block)
+            else:
+                self.buffer += block
+
+        offset = max(0, start - self.buffer_start)
+        content = bytes(self.buffer[offset * BYTES_PER_SAMPLE:(end - self.buffer_start) * BYTES_PER_SAMPLE])
+        del self.buffer[:offset * BYTES_PER_SAMPLE]
+        self.buffer_start += offset
+        return content
+
+def read_speech_chunks(input_audio_file, chunk_length=CHUNK_LENGTH, stats=None, progress=None):
+    """Yield PCM chunks holding only detected speech, with chunk boundaries placed in silent gaps.
+
+    The file is decoded twice: the first pass keeps only per-frame energies to plan the chunks,
+    the second slices the planned spans out of the audio, so memory stays bounded.
+    """
+    frame_length = SAMPLE_RATE_HERTZ * VAD_FRAME_MS // 1000
+    block_length = frame_length * VAD_BLOCK_FRAMES / SAMPLE_RATE_HERTZ
+
+    energies = []
+    total_samples = 0
+    for block in read_pcm_chunks(input_audio_file, block_length):
+        samples = np.frombuffer(block, dtype=np.int16)
+        energies.append(frame_energy_db(samples, frame_length))
+        total_samples += len(samples)
+    energy_db = np.concatenate(energies) if energies else np.zeros(0)
+
+    chunk_frames = chunk_length * 1000 // VAD_FRAME_MS
+    plan = plan_chunks(energy_db, chunk_frames, VAD_HANGOVER_MS // VAD_FRAME_MS)
+
+    spans = [
+        [(start * frame_length, min(end * frame_length, total_samples)) for start, end in chunk]
+        for chunk in plan
+    ]
+    recognized_samples = sum(end - start for chunk in spans for start, end in chunk)
+    if stats is not None:
+        stats['audio_seconds'] = total_samples / SAMPLE_RATE_HERTZ
+        stats['recognized_audio_seconds'] = recognized_samples / SAMPLE_RATE_HERTZ
+        stats['audio_seconds_saved'] = (total_samples - recognized_samples) / SAMPLE_RATE_HERTZ
+        # Where each chunk's speech sits in the original audio, as silence is no longer in the chunks
+        stats['chunk_spans'] = [[(start / SAMPLE_RATE_HERTZ, end / SAMPLE_RATE_HERTZ) for start, end in chunk] for chunk in spans]
+    if progress is not None:
+        progress.set_total(len(spans))
+
+    if not spans:
+        return
+
+    blocks = read_pcm_chunks(input_audio_file, block_length)
+    cursor = PcmCursor(blocks)
+    try:
+        for chunk in spans:
+            yield b''.join(cursor.read(start, end) for start, end in chunk)
+    finally:
+        blocks.close()
+
+def read_audio_chunks(input_audio_file, chunk_length=CHUNK_LENGTH, stats=None, progress=None):
+    """Yield the PCM chunks to transcribe, with non-speech removed when VAD is enabled."""
+    if VAD_ENABLED:
+        return read_speech_chunks(input_audio_file, chunk_length, stats, progress)
+    return read_pcm_chunks(input_audio_file, chunk_length)
+
+async def map_pcm_chunks(audio_file, chunk_length, transcribe_chunk, max_in_flight, executor=None, stats=None, progress=None):
+    """Decode audio_file into PCM chunks and await transcribe_chunk(content) for each, in order.
+
+    transcribe_chunk returns a backend chunk result, see services/transcription_service.py. The
+    next chunk is only decoded once one of the max_in_flight slots frees up, so at most that many
+    chunks are held in memory at once. VAD savings are recorded in stats, and each chunk's result
+    is reported to progress as soon as it completes, if given.
+    """
+    slots = asyncio.Semaphore(max_in_flight)
+    loop = asyncio.get_event_loop()
+    chunks = read_audio_chunks(audio_file, chunk_length, stats, progress)
+
+    async def transcribe_slot(index, audio_content):
+        try:
+            result = await transcribe_chunk(audio_content)
+        finally:
+            slots.release()
+        if progress is not None:
+            progress.chunk_done(index, result['text'], result['confidence'], result['words'])
+        return result
+
+    tasks = []
+    # Decoding is interleaved with recognition, so only the time spent waiting on the decoder counts as segmenting
+    decode_seconds = 0.0
+    try:
+        while True:
+            await slots.acquire()
+            started = time.perf_counter()
+            audio_content = await loop.run_in_executor(executor, next, chunks, None)
+            decode_seconds += time.perf_counter() - started
+            if audio_content is None:
+                slots.release()
+                break
+            bytes_total.inc(len(audio_content), stage='segment')
+            tasks.append(asyncio.ensure_future(transcribe_slot(len(tasks), audio_content)))
+
+        stage_seconds.observe(decode_seconds, stage='segment')
+        job_chunks.observe(len(tasks))
+        if progress is not None and progress.total is None:
+            progress.set_total(len(tasks))
+
+        return await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+    finally:
+        chunks.close()
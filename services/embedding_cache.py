@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.redis_client import get_redis
+from utils.metrics import registry
+from services.vector_index import build_index
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_PREFIX = 'embeddings:'
+EMBEDDING_CACHE_TTL = int(os.getenv('EMBEDDING_CACHE_TTL', 30 * 24 * 3600))
+# Transcript indexes kept built in each process in front of Redis
+EMBEDDING_CACHE_L1_SIZE = int(os.getenv('EMBEDDING_CACHE_L1_SIZE', 32))
+
+embedding_cache_hits_total = registry.counter('embedding_cache_hits_total', 'Transcript embeddings served from cache, by tier')
+embedding_cache_misses_total = registry.counter('embedding_cache_misses_total', 'Transcripts embedded upstream')
+
+def make_embedding_key(transcript, model, span_tokens):
+    """Build a cache key from the transcript hash, the embedding model and how the transcript is split into spans."""
+    transcript_hash = hashlib.sha256(transcript.encode('utf-8')).hexdigest()
+    payload = json.dumps({'transcript': transcript_hash, 'model': model, 'span_tokens': span_tokens}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class EmbeddingCache:
+    """A transcript's spans and their embeddings, kept in Redis and shared by every worker.
+
+    Each process also keeps the vector indexes of recently used transcripts built (L1), so a
+    repeat prompt against the same video only embeds the prompt. Redis errors degrade to L1 only.
+    """
+
+    def __init__(self, redis_factory=get_redis, ttl=EMBEDDING_CACHE_TTL, l1_size=EMBEDDING_CACHE_L1_SIZE):
+        self.redis_factory = redis_factory
+        self.ttl = ttl
+        self.l1_size = l1_size
+        self._lock = threading.Lock()
+        self._l1 = OrderedDict()
+
+    def get(self, key):
+        """Return (spans, index), or None on a miss."""
+        entry = self._get_l1(key)
+        if entry is not None:
+            embedding_cache_hits_total.inc(tier='l1')
+            return entry
+
+        try:
+            stored = self.redis_factory().hgetall(EMBEDDING_CACHE_PREFIX + key)
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {str(e)}")
+            return None
+        if not stored:
+            return None
+
+        spans = json.loads(stored[b'spans'])
+        vectors = np.frombuffer(stored[b'vectors'], dtype=np.float32).reshape(len(spans), -1)
+        entry = (spans, build_index(vectors))
+        self._set_l1(key, entry)
+        embedding_cache_hits_total.inc(tier='redis')
+        return entry
+
+    def set(self, key, spans, vectors):
+        """Store spans and their embeddings; returns (spans, index) as get() would."""
+        embedding_cache_misses_total.inc()
+        entry = (spans, build_index(vectors))
+        self._set_l1(key, entry)
+        try:
+            with self.redis_factory().pipeline() as pipe:
+                pipe.hset(EMBEDDING_CACHE_PREFIX + key, mapping={
+                    'spans': json.dumps(spans),
+                    'vectors': np.asarray(vectors, dtype=np.float32).tobytes(),
+                })
+                pipe.expire(EMBEDDING_CACHE_PREFIX + key, self.ttl)
+                pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {str(e)}")
+        return entry
+
+    def clear(self):
+        """Drop this process's L1 entries; Redis entries expire on their own."""
+        with self._lock:
+            self._l1.clear()
+
+    def _get_l1(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return value
+
+    def _set_l1(self, key, value):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self.ttl, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.l1_size:
+                self._l1.popitem(last=False)
+
+embedding_cache = EmbeddingCache()
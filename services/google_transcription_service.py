@@ -4,80 +4,157 @@ import asyncio
 from google.cloud import speech, storage
 import ffmpeg
 from concurrent.futures import ThreadPoolExecutor
-import math
+from services.audio_service import split_audio_into_chunks, map_pcm_chunks, CHUNK_LENGTH, SAMPLE_RATE_HERTZ, VAD_ENABLED
+from services.speech_client_pool import get_speech_client
+from services.transcription_scheduler import transcription_scheduler
+from services.pipeline_metrics import time_stage, job_chunks
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent blocking IO operations (recognize calls, PCM reads) per process
+TRANSCRIPTION_MAX_WORKERS = int(os.getenv('TRANSCRIPTION_MAX_WORKERS', 32))
+
 # ThreadPoolExecutor for running blocking IO operations
-executor = ThreadPoolExecutor(max_workers=32)
+executor = ThreadPoolExecutor(max_workers=TRANSCRIPTION_MAX_WORKERS)
 
-def split_audio_into_chunks(input_audio_file, chunk_length=30):
-    """Split the audio file into chunks of specified length (in seconds)."""
-    probe = ffmpeg.probe(input_audio_file)
-    duration = float(probe['format']['duration'])
-    
-    num_chunks = math.ceil(duration / chunk_length)
-    
-    chunk_files = []
-    for i in range(num_chunks):
-        start_time = i * chunk_length
-        output_chunk = f"{input_audio_file.replace('.wav', '')}_chunk{i}.wav"
-        (
-            ffmpeg
-            .input(input_audio_file, ss=start_time, t=chunk_length)
-            .output(output_chunk)
-            .run(overwrite_output=True)
-        )
-        chunk_files.append(output_chunk)
+LANGUAGE_CODE = "en-US"
 
-    return chunk_files
+# 'stream' decodes to PCM in memory, 'files' writes WAV chunks to disk
+TRANSCRIPTION_MODE = os.getenv('TRANSCRIPTION_MODE', 'stream')
+# Per-job limit on chunks being decoded or recognized at once; the global limit is adaptive
+MAX_CHUNKS_IN_FLIGHT = int(os.getenv('MAX_CHUNKS_IN_FLIGHT', 8))
 
-async def transcribe_audio_chunk(audio_chunk):
-    """Asynchronously transcribe a single audio chunk."""
-    client = speech.SpeechClient()
-
-    # Read the audio chunk file as binary content
-    with open(audio_chunk, "rb") as audio_file:
-        audio_content = audio_file.read()
+async def recognize_audio_content(audio_content):
+    """Asynchronously transcribe a buffer of 16 kHz mono LINEAR16 audio into a chunk result, see chunk_result()."""
+    client = get_speech_client()
 
     audio = speech.RecognitionAudio(content=audio_content)
     config = speech.RecognitionConfig(
         encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-        sample_rate_hertz=16000,
-        language_code="en-US"
+        sample_rate_hertz=SAMPLE_RATE_HERTZ,
+        language_code=LANGUAGE_CODE,
+        enable_word_time_offsets=True,
     )
 
-    # Synchronous transcription offloaded to thread pool
-    response = await asyncio.get_event_loop().run_in_executor(
-        executor, lambda: client.recognize(config=config, audio=audio)
+    def recognize():
+        # Only the API call is timed, not the wait for a scheduler slot or an executor thread
+        with time_stage('recognize'):
+            return client.recognize(config=config, audio=audio)
+
+    # Synchronous transcription offloaded to thread pool, within the process-wide adaptive limit
+    response = await transcription_scheduler.run(
+        lambda: asyncio.get_event_loop().run_in_executor(executor, recognize)
     )
+    return chunk_result(response)
+
+def chunk_result(response):
+    """Turn a recognize response into the chunk's text, confidence and word offsets.
+
+    The confidence is the mean of the results' confidences, weighted by the audio each result
+    covers up to its result_end_time; it is None when Google reported none. Word offsets are
+    seconds into the chunk.
+    """
     transcript = ""
+    words = []
+    weighted_confidence = 0.0
+    scored_seconds = 0.0
+    result_start = 0.0
     for result in response.results:
-        transcript += result.alternatives[0].transcript + "\n"
+        best = result.alternatives[0]
+        transcript += best.transcript + "\n"
+        result_end = result.result_end_time.total_seconds()
+        # Google leaves confidence at 0 when it did not score a result
+        if best.confidence:
+            weighted_confidence += best.confidence * max(result_end - result_start, 0.0)
+            scored_seconds += max(result_end - result_start, 0.0)
+        result_start = result_end
+        words.extend(
+            {'word': word.word, 'start': word.start_time.total_seconds(), 'end': word.end_time.total_seconds()}
+            for word in best.words
+        )
+
+    return {
+        'text': transcript,
+        'confidence': weighted_confidence / scored_seconds if scored_seconds else None,
+        'words': words or None,
+    }
 
-    return transcript
+async def transcribe_pcm_chunk(audio_content):
+    """Transcription backend chunk entry point, see services/transcription_service.py."""
+    return await recognize_audio_content(audio_content)
 
-async def transcribe_audio_google(audio_file, chunk_length=30):
-    """Asynchronously transcribe long audio by splitting into chunks and transcribing each."""
-    # Convert MP3 to WAV
-    wav_file = convert_mp3_to_wav(audio_file)
+async def transcribe_audio_chunk(audio_chunk):
+    """Asynchronously transcribe a single audio chunk."""
+    # Read the audio chunk file as binary content
+    with open(audio_chunk, "rb") as audio_file:
+        audio_content = audio_file.read()
+
+    return await recognize_audio_content(audio_content)
+
+async def transcribe_audio_stream(audio_file, chunk_length=CHUNK_LENGTH, max_in_flight=None, stats=None, progress=None):
+    """Transcribe audio decoded straight into memory, holding at most max_in_flight chunks at once."""
+    results = await map_pcm_chunks(
+        audio_file, chunk_length, recognize_audio_content, max_in_flight or MAX_CHUNKS_IN_FLIGHT,
+        executor, stats, progress
+    )
+    return "".join(result['text'] for result in results)
 
-    # Split the WAV file into smaller chunks
-    audio_chunks = split_audio_into_chunks(wav_file, chunk_length)
+def transcription_settings(chunk_length=CHUNK_LENGTH):
+    """Settings that affect transcript output, used to key cached transcripts."""
+    return {
+        'language_code': LANGUAGE_CODE,
+        'chunk_length': chunk_length,
+        'sample_rate_hertz': SAMPLE_RATE_HERTZ,
+        'vad': VAD_ENABLED and TRANSCRIPTION_MODE == 'stream',
+    }
+
+async def transcribe_audio_google(audio_file, chunk_length=CHUNK_LENGTH, mode=None, stats=None, progress=None):
+    """Asynchronously transcribe long audio by splitting into chunks and transcribing each.
+
+    In 'stream' mode chunks are decoded into memory and nothing is written to disk, so the
+    returned list of chunk files is empty; with VAD enabled non-speech is dropped and the
+    savings are recorded in stats. In 'files' mode chunks are written as WAV files that the
+    caller is responsible for cleaning up. Each chunk's text is reported to progress, if given,
+    as soon as it completes.
+    """
+    if (mode or TRANSCRIPTION_MODE) == 'stream':
+        transcript = await transcribe_audio_stream(audio_file, chunk_length, stats=stats, progress=progress)
+        return transcript, []
+
+    # Decode the downloaded audio straight into 16 kHz mono WAV chunks
+    with time_stage('segment'):
+        audio_chunks = split_audio_into_chunks(audio_file, chunk_length)
+    job_chunks.observe(len(audio_chunks))
+
+    # Asynchronously transcribe each chunk, at most MAX_CHUNKS_IN_FLIGHT at a time for this job
+    job_slots = asyncio.Semaphore(MAX_CHUNKS_IN_FLIGHT)
+
+    async def transcribe_slot(index, chunk):
+        async with job_slots:
+            result = await transcribe_audio_chunk(chunk)
+        if progress is not None:
+            progress.chunk_done(index, result['text'], result['confidence'], result['words'])
+        return result
+
+    if progress is not None:
+        progress.set_total(len(audio_chunks))
 
-    # Asynchronously transcribe each chunk
     transcript = ""
-    tasks = [transcribe_audio_chunk(chunk) for chunk in audio_chunks]
+    tasks = [transcribe_slot(index, chunk) for index, chunk in enumerate(audio_chunks)]
     
     # Gather results asynchronously
     results = await asyncio.gather(*tasks)
 
     # Combine all transcriptions
     for result in results:
-        transcript += result
+        transcript += result['text']
 
     return transcript, audio_chunks
 
+async def transcribe_audio(audio_file, chunk_length=CHUNK_LENGTH, stats=None, progress=None):
+    """Transcription backend entry point, see services/transcription_service.py."""
+    return await transcribe_audio_google(audio_file, chunk_length, stats=stats, progress=progress)
+
 def convert_mp3_to_wav(mp3_file_path):
     """Convert MP3 at a given file path to WAV format."""
     try:
@@ -86,7 +163,7 @@ def convert_mp3_to_wav(mp3_file_path):
         
         wav_file_path = mp3_file_path.replace(".mp3", ".wav")
         
-        ffmpeg.input(mp3_file_path).output(wav_file_path, ac=1, ar=16000).run(overwrite_output=True)
+        ffmpeg.input(mp3_file_path).output(wav_file_path, ac=1, ar=SAMPLE_RATE_HERTZ).run(overwrite_output=True)
         
         return wav_file_path
     
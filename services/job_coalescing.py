@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextlib
+import redis
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_LOCK_PREFIX = 'transcription-lock:'
+TRANSCRIPTION_RESULT_PREFIX = 'transcription-result:'
+# The owner renews its lock every third of this; if its worker dies, waiting jobs take over within this many seconds
+TRANSCRIPTION_LOCK_TTL = int(os.getenv('TRANSCRIPTION_LOCK_TTL', 60))
+# TTL of the lock held across a pipeline's stage tasks; long enough to cover the wait between stages in a busy queue
+PIPELINE_LOCK_TTL = int(os.getenv('PIPELINE_LOCK_TTL', 900))
+# How long a finished transcription stays available to jobs that attached to it
+TRANSCRIPTION_RESULT_TTL = int(os.getenv('TRANSCRIPTION_RESULT_TTL', 3600))
+
+class RedisLease:
+    """A Redis lock that the holder keeps renewing, itself or from a background thread, until it is released.
+
+    The lock expires ttl seconds after the last renewal, so a crashed holder frees it without
+    anyone having to clean up.
+    """
+
+    def __init__(self, client, key, ttl, token=None):
+        self.client = client
+        self.key = key
+        self.ttl = ttl
+        self.token = token or uuid.uuid4().hex
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def acquire(self, keep_alive=True):
+        """Take the lock; with keep_alive it is renewed in the background until release()."""
+        if not self.client.set(self.key, self.token, nx=True, ex=self.ttl):
+            return False
+        if keep_alive:
+            self.start_keep_alive()
+        return True
+
+    def start_keep_alive(self):
+        """Renew the lock from a background thread until stop_keep_alive() or release()."""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._keep_alive, name='lease-renewal', daemon=True)
+        self._thread.start()
+
+    def stop_keep_alive(self):
+        """Stop the background renewal, leaving the lock held until it expires or is released."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def renew(self):
+        """Push the expiry back by ttl; False if the lock is no longer ours."""
+        if self._if_held(lambda pipe: pipe.expire(self.key, self.ttl)):
+            return True
+        logger.warning(f"Lost lock {self.key}; another job may repeat this work")
+        return False
+
+    def release(self):
+        self.stop_keep_alive()
+        self._if_held(lambda pipe: pipe.delete(self.key))
+
+    def _keep_alive(self):
+        while not self._stopped.wait(self.ttl / 3):
+            if not self.renew():
+                return
+
+    def _if_held(self, action):
+        """Run action in a transaction only if the lock still holds our token; True if it did."""
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.watch(self.key)
+                if pipe.get(self.key) != self.token.encode():
+                    return False
+                pipe.multi()
+                action(pipe)
+                pipe.execute()
+                return True
+        except redis.WatchError:
+            return False
+        except Exception as e:
+            logger.error(f"Error updating lock {self.key}: {str(e)}")
+            return False
+
+class TranscriptionCoalescer:
+    """Lets one job per video transcribe while concurrent jobs for the same video wait for its result.
+
+    Results are stored in Redis, so jobs on any worker host can attach to them. If the owner
+    fails, its lock is released without a result and a waiting job takes over; if its worker
+    dies, the lock expires and the same happens.
+    """
+
+    def __init__(self, redis_factory=get_redis, lock_ttl=TRANSCRIPTION_LOCK_TTL,
+                 result_ttl=TRANSCRIPTION_RESULT_TTL, poll_interval=0.5):
+        self.redis_factory = redis_factory
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+
+    def run(self, key, transcribe, on_wait=None):
+        """Return (result, owner): transcribe() if this job owns key, else the result of the job that does.
+
+        transcribe must return a JSON-serializable dict. on_wait is called once when this job
+        starts waiting on another one.
+        """
+        try:
+            client = self.redis_factory()
+            result = self._get_result(client, key)
+        except Exception as e:
+            logger.error(f"Error checking for shared transcription: {str(e)}")
+            return transcribe(), True
+        if result is not None:
+            return result, False
+
+        waiting = False
+        while True:
+            lease = RedisLease(client, TRANSCRIPTION_LOCK_PREFIX + key, self.lock_ttl)
+            try:
+                acquired = lease.acquire()
+            except Exception as e:
+                logger.error(f"Error locking transcription: {str(e)}")
+                return transcribe(), True
+
+            if acquired:
+                try:
+                    # The previous owner may have stored its result between our check and the lock
+                    result = self._get_result(client, key)
+                    if result is not None:
+                        return result, False
+                    result = transcribe()
+                    self._store_result(client, key, result)
+                    return result, True
+                finally:
+                    lease.release()
+
+            if not waiting:
+                waiting = True
+                logger.info(f"Waiting for transcription {key} owned by another job")
+                if on_wait:
+                    on_wait()
+
+            result = self._wait(client, key)
+            if result is not None:
+                return result, False
+
+    def get_result(self, key):
+        """Return the shared result for key, or None if there is none or Redis is unavailable."""
+        try:
+            return self._get_result(self.redis_factory(), key)
+        except Exception as e:
+            logger.error(f"Error checking for shared transcription: {str(e)}")
+            return None
+
+    def try_acquire(self, key, ttl=None):
+        """Take ownership of key without blocking or renewing, for owners that span several tasks.
+
+        Returns the lock token, '' if Redis is unavailable and the caller should proceed alone,
+        or None if another job owns key. The owner must renew the lock, with renew() or
+        keep_alive(), more often than ttl (lock_ttl by default) and finish with store_result()
+        or release().
+        """
+        lease = RedisLease(None, TRANSCRIPTION_LOCK_PREFIX + key, ttl or self.lock_ttl)
+        try:
+            lease.client = self.redis_factory()
+            return lease.token if lease.acquire(keep_alive=False) else None
+        except Exception as e:
+            logger.error(f"Error locking transcription: {str(e)}")
+            return ''
+
+    def renew(self, key, token, ttl=None):
+        if token:
+            RedisLease(self.redis_factory(), TRANSCRIPTION_LOCK_PREFIX + key, ttl or self.lock_ttl, token).renew()
+
+    @contextlib.contextmanager
+    def keep_alive(self, key, token, ttl=None):
+        """Renew an owner's lock now and in the background while the block runs; it stays held afterwards."""
+        if not token:
+            yield
+            return
+        lease = RedisLease(self.redis_factory(), TRANSCRIPTION_LOCK_PREFIX + key, ttl or self.lock_ttl, token)
+        lease.renew()
+        lease.start_keep_alive()
+        try:
+            yield
+        finally:
+            lease.stop_keep_alive()
+
+    def release(self, key, token):
+        if token:
+            RedisLease(self.redis_factory(), TRANSCRIPTION_LOCK_PREFIX + key, self.lock_ttl, token).release()
+
+    def store_result(self, key, token, result):
+        """Share the owner's result, then release its lock."""
+        try:
+            self._store_result(self.redis_factory(), key, result)
+            self.release(key, token)
+        except Exception as e:
+            logger.error(f"Error sharing transcription result: {str(e)}")
+
+    def _wait(self, client, key):
+        """Poll while the owner holds the lock; return its result, or None once the lock is free."""
+        while True:
+            time.sleep(self.poll_interval)
+            result = self._get_result(client, key)
+            if result is not None or not client.exists(TRANSCRIPTION_LOCK_PREFIX + key):
+                return result
+
+    def _get_result(self, client, key):
+        value = client.get(TRANSCRIPTION_RESULT_PREFIX + key)
+        return json.loads(value) if value else None
+
+    def _store_result(self, client, key, result):
+        try:
+            client.set(TRANSCRIPTION_RESULT_PREFIX + key, json.dumps(result), ex=self.result_ttl)
+        except Exception as e:
+            logger.error(f"Error sharing transcription result: {str(e)}")
+
+transcription_coalescer = TranscriptionCoalescer()
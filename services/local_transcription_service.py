@@ -0,0 +1,141 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+import numpy as np
+from services.audio_service import map_pcm_chunks, CHUNK_LENGTH, SAMPLE_RATE_HERTZ, VAD_ENABLED
+from utils.metrics import registry
+from services.pipeline_metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+LOCAL_WHISPER_MODEL = os.getenv('LOCAL_WHISPER_MODEL', 'openai/whisper-base.en')
+LOCAL_INFERENCE_THREADS = int(os.getenv('LOCAL_INFERENCE_THREADS', os.cpu_count() or 1))
+# Chunks from all jobs in the process are grouped into batches of up to this size
+LOCAL_MAX_BATCH_SIZE = int(os.getenv('LOCAL_MAX_BATCH_SIZE', 8))
+# How long the engine waits for more chunks before running a partial batch
+LOCAL_BATCH_WAIT = float(os.getenv('LOCAL_BATCH_WAIT', 0.05))
+# Per-job limit on decoded chunks waiting for or going through inference
+LOCAL_MAX_CHUNKS_IN_FLIGHT = int(os.getenv('LOCAL_MAX_CHUNKS_IN_FLIGHT', 2 * LOCAL_MAX_BATCH_SIZE))
+
+batches_total = registry.counter('local_transcription_batches_total', 'Inference calls made by the local engine')
+batched_chunks_total = registry.counter('local_transcription_chunks_total', 'Chunks transcribed by the local engine')
+
+def load_whisper_model(model_name=LOCAL_WHISPER_MODEL, num_threads=LOCAL_INFERENCE_THREADS):
+    """Load a Whisper model on CPU and return a function transcribing a batch of float32 waveforms."""
+    try:
+        import torch
+        from transformers import pipeline
+    except ImportError as e:
+        raise ImportError(
+            "The local transcription backend requires the optional dependencies in requirements-local.txt"
+        ) from e
+
+    torch.set_num_threads(num_threads)
+    logger.info(f"Loading local transcription model {model_name} with {num_threads} threads")
+    asr = pipeline('automatic-speech-recognition', model=model_name, device='cpu')
+
+    def transcribe_batch(waveforms):
+        inputs = [{'raw': waveform, 'sampling_rate': SAMPLE_RATE_HERTZ} for waveform in waveforms]
+        with torch.inference_mode():
+            outputs = asr(inputs, batch_size=len(inputs))
+        return [output['text'].strip() for output in outputs]
+
+    return transcribe_batch
+
+class BatchedInferenceEngine:
+    """Keeps one model resident per process and batches chunks from every job into single inference calls.
+
+    Requests are queued from any thread or event loop; a single inference thread collects up to
+    max_batch_size of them, waiting at most max_wait seconds for stragglers, and runs them together.
+    """
+
+    def __init__(self, model_loader=load_whisper_model, max_batch_size=LOCAL_MAX_BATCH_SIZE, max_wait=LOCAL_BATCH_WAIT):
+        self.model_loader = model_loader
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.model = None
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+
+    def submit(self, waveform):
+        """Queue a float32 waveform and return a concurrent.futures.Future for its text."""
+        future = Future()
+        with self._lock:
+            self._ensure_running()
+            self._queue.put((waveform, future))
+        return future
+
+    def _ensure_running(self):
+        # The inference thread does not survive a fork, so each worker process starts its own
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._run, args=(self._queue,), name='local-transcription', daemon=True)
+            self._thread.start()
+
+    def _next_batch(self, requests):
+        batch = [requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [(waveform, future) for waveform, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self, requests):
+        while True:
+            batch = self._next_batch(requests)
+            if not batch:
+                continue
+            try:
+                if self.model is None:
+                    self.model = self.model_loader()
+                texts = self.model([waveform for waveform, _ in batch])
+            except Exception as e:
+                logger.error(f"Local transcription batch failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            batches_total.inc()
+            batched_chunks_total.inc(len(batch))
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+engine = BatchedInferenceEngine()
+
+def pcm_to_waveform(audio_content):
+    """Convert 16-bit PCM bytes to the float32 waveform in [-1, 1] that the model expects."""
+    return np.frombuffer(audio_content, dtype=np.int16).astype(np.float32) / 32768.0
+
+async def transcribe_pcm_chunk(audio_content):
+    with time_stage('recognize'):
+        text = await asyncio.wrap_future(engine.submit(pcm_to_waveform(audio_content)))
+    # The Whisper pipeline reports neither confidence nor word timings
+    return {'text': text + "\n" if text else "", 'confidence': None, 'words': None}
+
+def transcription_settings(chunk_length=CHUNK_LENGTH):
+    """Settings that affect transcript output, used to key cached transcripts."""
+    return {
+        'model': LOCAL_WHISPER_MODEL,
+        'chunk_length': chunk_length,
+        'sample_rate_hertz': SAMPLE_RATE_HERTZ,
+        'vad': VAD_ENABLED,
+    }
+
+async def transcribe_audio(audio_file, chunk_length=CHUNK_LENGTH, stats=None, progress=None):
+    """Transcribe audio on this worker's CPU; chunks are decoded in memory, so there are no files to clean up."""
+    results = await map_pcm_chunks(
+        audio_file, chunk_length, transcribe_pcm_chunk, LOCAL_MAX_CHUNKS_IN_FLIGHT, stats=stats, progress=progress
+    )
+    return "".join(result['text'] for result in results), []
@@ -0,0 +1,29 @@
+import time
+import logging
+from contextlib import contextmanager
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Stages: 'metadata' (yt-dlp probe), 'download', 'segment' (decoding to PCM and splitting into
+# chunks, one ffmpeg pass), 'recognize' (one chunk), 'analyze' and 'billing'
+stage_seconds = registry.histogram('pipeline_stage_seconds', 'Time spent in each pipeline stage, by stage')
+queue_wait_seconds = registry.histogram(
+    'celery_queue_wait_seconds', 'Time from publishing a task to a worker starting it, by task; includes clock skew between hosts'
+)
+job_chunks = registry.histogram(
+    'pipeline_job_chunks', 'Audio chunks each job sent for recognition', buckets=(1, 2, 5, 10, 20, 30, 45, 60, 90, 120)
+)
+bytes_total = registry.counter('pipeline_bytes_total', "Bytes processed, by stage: audio downloaded, PCM decoded")
+
+@contextmanager
+def time_stage(stage, job_id=None):
+    """Record the time spent in the block under stage, whether or not it raises, and log it for job_id."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        if job_id:
+            logger.info(f"Job {job_id} stage {stage} took {elapsed:.3f}s")
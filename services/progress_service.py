@@ -0,0 +1,184 @@
+import os
+import time
+import logging
+import threading
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress publishes for one task
+PROGRESS_MIN_INTERVAL = float(os.getenv('PROGRESS_MIN_INTERVAL', 1.0))
+# Minimum seconds between publishes of a streamed analysis; short, since users read it as it is written
+ANALYSIS_PROGRESS_INTERVAL = float(os.getenv('ANALYSIS_PROGRESS_INTERVAL', 0.25))
+# Chunk texts collected for jobs transcribed by separate chunk tasks expire after this many seconds
+SHARED_PROGRESS_TTL = int(os.getenv('SHARED_PROGRESS_TTL', 3600))
+
+class TranscriptProgress:
+    """Collects chunk transcripts as they complete and publishes the contiguous prefix.
+
+    Each chunk's confidence and word offsets, if the backend reports them, are kept for
+    chunks() but not published. Chunks may finish out of order; only the text up to the first missing chunk is published.
+    Publishes are coalesced so that at most one goes out per min_interval seconds; whatever was
+    held back goes out with the next publish or with flush().
+    """
+
+    def __init__(self, publish, status='Transcribing audio', min_interval=PROGRESS_MIN_INTERVAL):
+        self.publish = publish
+        self.status = status
+        self.min_interval = min_interval
+        self.total = None
+        self.completed = 0
+        self._chunks = {}
+        self._prefix = []
+        self._dirty = False
+        self._last_publish = 0.0
+        self._lock = threading.Lock()
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+            self._dirty = True
+        self._maybe_publish()
+
+    def chunk_done(self, index, text, confidence=None, words=None):
+        with self._lock:
+            self._chunks[index] = {'text': text, 'confidence': confidence, 'words': words}
+            self.completed += 1
+            while len(self._prefix) in self._chunks:
+                self._prefix.append(self._chunks.pop(len(self._prefix)))
+            self._dirty = True
+        self._maybe_publish()
+
+    def meta(self):
+        with self._lock:
+            return self._meta()
+
+    def chunks(self):
+        """Return the result of each chunk in the contiguous prefix, in order, as backends return them."""
+        with self._lock:
+            return list(self._prefix)
+
+    def _meta(self):
+        return {
+            'status': self.status,
+            'partial_transcript': ''.join(chunk['text'] for chunk in self._prefix),
+            'chunks_completed': self.completed,
+            'chunks_total': self.total,
+        }
+
+    def flush(self):
+        """Publish any progress held back by coalescing."""
+        if self._dirty:
+            self._publish()
+
+    def _maybe_publish(self):
+        if time.monotonic() - self._last_publish >= self.min_interval:
+            self._publish()
+
+    def _publish(self):
+        with self._lock:
+            meta = self._meta()
+            self._dirty = False
+            self._last_publish = time.monotonic()
+        try:
+            self.publish(meta)
+        except Exception as e:
+            logger.error(f"Error publishing transcript progress: {str(e)}")
+
+class AnalysisProgress:
+    """Collects the analysis as the model streams it and publishes the text so far in small batches.
+
+    The first piece goes out at once, so nothing delays the first token; after that at most one
+    publish goes out per min_interval and flush() publishes whatever was held back.
+    """
+
+    def __init__(self, publish, status='Analyzing transcript', min_interval=ANALYSIS_PROGRESS_INTERVAL):
+        self.publish = publish
+        self.status = status
+        self.min_interval = min_interval
+        self._parts = []
+        self._dirty = False
+        self._last_publish = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, delta):
+        with self._lock:
+            self._parts.append(delta)
+            self._dirty = True
+        if time.monotonic() - self._last_publish >= self.min_interval:
+            self._publish()
+
+    def meta(self):
+        with self._lock:
+            return self._meta()
+
+    def _meta(self):
+        return {'status': self.status, 'partial_analysis': ''.join(self._parts)}
+
+    def flush(self):
+        """Publish any text held back by batching."""
+        if self._dirty:
+            self._publish()
+
+    def _publish(self):
+        with self._lock:
+            meta = self._meta()
+            self._dirty = False
+            self._last_publish = time.monotonic()
+        try:
+            self.publish(meta)
+        except Exception as e:
+            logger.error(f"Error publishing analysis progress: {str(e)}")
+
+class SharedTranscriptProgress:
+    """Progress for a job whose chunks are transcribed by separate tasks, possibly on different workers.
+
+    Chunk texts are collected in a Redis hash, so whichever task finishes a chunk can publish the
+    contiguous prefix for the whole job. A Redis key that expires after min_interval lets at most
+    one task per interval publish for the job; the last chunk always does. Publish errors are
+    logged, never raised.
+    """
+
+    def __init__(self, job_id, total, publish, status='Transcribing audio', redis_factory=get_redis,
+                 ttl=SHARED_PROGRESS_TTL, min_interval=PROGRESS_MIN_INTERVAL):
+        self.key = f'transcript-progress:{job_id}'
+        self.gate_key = f'transcript-progress-published:{job_id}'
+        self.total = total
+        self.publish = publish
+        self.status = status
+        self.redis_factory = redis_factory
+        self.ttl = ttl
+        self.min_interval = min_interval
+
+    def chunk_done(self, index, text):
+        try:
+            client = self.redis_factory()
+            with client.pipeline() as pipe:
+                pipe.hset(self.key, index, text)
+                pipe.expire(self.key, self.ttl)
+                pipe.hlen(self.key)
+                if self.min_interval > 0:
+                    pipe.set(self.gate_key, 1, nx=True, px=int(self.min_interval * 1000))
+                results = pipe.execute()
+            completed = results[2]
+            if completed < self.total and self.min_interval > 0 and not results[3]:
+                return
+
+            texts = {int(i): chunk.decode('utf-8') for i, chunk in client.hgetall(self.key).items()}
+            prefix = []
+            while len(prefix) in texts:
+                prefix.append(texts[len(prefix)])
+            self.publish({
+                'status': self.status,
+                'partial_transcript': ''.join(prefix),
+                'chunks_completed': len(texts),
+                'chunks_total': self.total,
+            })
+        except Exception as e:
+            logger.error(f"Error publishing transcript progress: {str(e)}")
+
+    def clear(self):
+        try:
+            self.redis_factory().delete(self.key, self.gate_key)
+        except Exception as e:
+            logger.error(f"Error clearing transcript progress: {str(e)}")
@@ -0,0 +1,64 @@
+import os
+import logging
+import threading
+from google.cloud import speech
+
+logger = logging.getLogger(__name__)
+
+SPEECH_CLIENT_POOL_SIZE = int(os.getenv('SPEECH_CLIENT_POOL_SIZE', 4))
+
+class SpeechClientPool:
+    """Per-process pool of SpeechClients, created lazily and reused across chunks and tasks.
+
+    gRPC channels do not survive a fork, so the pool remembers the PID that created its
+    clients and starts over when it is used from a forked Celery worker process.
+    """
+
+    def __init__(self, size=SPEECH_CLIENT_POOL_SIZE, client_factory=None):
+        self.size = max(1, size)
+        self.client_factory = client_factory or (lambda: speech.SpeechClient())
+        self._lock = threading.Lock()
+        self._clients = []
+        self._next = 0
+        self._pid = os.getpid()
+
+    def get(self):
+        """Return a client, creating one if the pool has not reached its size yet."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_locked()
+
+            if len(self._clients) < self.size:
+                self._clients.append(self.client_factory())
+                logger.info(f"Created SpeechClient {len(self._clients)}/{self.size} in process {self._pid}")
+                return self._clients[-1]
+
+            client = self._clients[self._next % self.size]
+            self._next += 1
+            return client
+
+    def reset(self):
+        """Drop every client; the next call to get() builds fresh ones."""
+        with self._lock:
+            self._reset_locked()
+
+    def after_fork_in_child(self):
+        """Start over in a forked child without taking the lock, which the fork may have copied held."""
+        self._lock = threading.Lock()
+        self._reset_locked()
+
+    def _reset_locked(self):
+        # Clients inherited across a fork are dropped, not closed: closing them would
+        # tear down channel state that still belongs to the parent process.
+        self._clients = []
+        self._next = 0
+        self._pid = os.getpid()
+
+speech_client_pool = SpeechClientPool()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=speech_client_pool.after_fork_in_child)
+
+def get_speech_client():
+    """Return a pooled SpeechClient for the current process."""
+    return speech_client_pool.get()
@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_PREFIX = 'task-events:'
+TERMINAL_STATES = {'SUCCESS', 'FAILURE', 'REVOKED'}
+# Seconds between keepalive comments on an idle event stream
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', 15))
+
+def task_status_response(state, info):
+    """Build the /status response body for a task state and its info."""
+    if state == 'PENDING':
+        return {'state': state, 'status': 'Pending...'}
+
+    if state == 'FAILURE':
+        return {'state': state, 'status': str(info)}
+
+    info = info if isinstance(info, dict) else {}
+    response = {
+        'state': state,
+        'result': info.get('result', ''),
+        'status': info.get('status', 'Processing...'),
+    }
+    if 'chunks_completed' in info:
+        response.update({
+            'partial_transcript': info.get('partial_transcript', ''),
+            'chunks_completed': info['chunks_completed'],
+            'chunks_total': info.get('chunks_total'),
+        })
+    if 'partial_analysis' in info:
+        response['partial_analysis'] = info['partial_analysis']
+    return response
+
+def publish_task_event(task_id, state, info):
+    """Publish a task state change to anyone watching the task; failures are logged, not raised."""
+    if not task_id:
+        return
+    try:
+        get_redis().publish(TASK_EVENTS_PREFIX + task_id, json.dumps(task_status_response(state, info)))
+    except Exception as e:
+        logger.error(f"Error publishing event for task {task_id}: {str(e)}")
+
+def format_sse(event):
+    return f"data: {json.dumps(event)}\n\n"
+
+class TaskEventHub:
+    """Fans task events out to the streams open in this process over one Redis subscription.
+
+    A single pattern subscription covers every task, so the number of Redis connections does not
+    grow with the number of watchers. Like the other per-process clients, the listener thread is
+    started lazily and restarted in a forked process.
+    """
+
+    def __init__(self, redis_factory=get_redis, poll_timeout=1.0):
+        self.redis_factory = redis_factory
+        self.poll_timeout = poll_timeout
+        self._lock = threading.Lock()
+        self._watchers = {}
+        self._thread = None
+        self._pid = None
+
+    def watch(self, task_id):
+        """Return a queue receiving every event published for task_id from now on."""
+        events = queue.Queue()
+        with self._lock:
+            self._ensure_running()
+            self._watchers.setdefault(task_id, set()).add(events)
+        return events
+
+    def unwatch(self, task_id, events):
+        with self._lock:
+            watchers = self._watchers.get(task_id)
+            if watchers is not None:
+                watchers.discard(events)
+                if not watchers:
+                    del self._watchers[task_id]
+
+    def watcher_count(self):
+        with self._lock:
+            return sum(len(watchers) for watchers in self._watchers.values())
+
+    def _ensure_running(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._watchers = {}
+            self._thread = None
+        if self._thread is None or not self._thread.is_alive():
+            # Subscribe before returning, so no event published after watch() is missed
+            pubsub = self._subscribe()
+            self._thread = threading.Thread(target=self._run, args=(pubsub,), name='task-events', daemon=True)
+            self._thread.start()
+
+    def _subscribe(self):
+        pubsub = self.redis_factory().pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(TASK_EVENTS_PREFIX + '*')
+        return pubsub
+
+    def _run(self, pubsub):
+        while True:
+            try:
+                message = pubsub.get_message(timeout=self.poll_timeout)
+            except Exception as e:
+                logger.error(f"Task event subscription failed: {str(e)}")
+                time.sleep(self.poll_timeout)
+                try:
+                    pubsub = self._subscribe()
+                except Exception as e:
+                    logger.error(f"Error resubscribing to task events: {str(e)}")
+                continue
+
+            if message and message['type'] == 'pmessage':
+                self._dispatch(message)
+
+    def _dispatch(self, message):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        task_id = channel[len(TASK_EVENTS_PREFIX):]
+        try:
+            event = json.loads(message['data'])
+        except ValueError as e:
+            logger.error(f"Ignoring malformed event for task {task_id}: {str(e)}")
+            return
+
+        with self._lock:
+            watchers = list(self._watchers.get(task_id, ()))
+        for events in watchers:
+            events.put(event)
+
+task_event_hub = TaskEventHub()
+
+def stream_task_events(task_id, snapshot, events, hub=task_event_hub, heartbeat_interval=SSE_HEARTBEAT_INTERVAL):
+    """Yield server-sent events: the current snapshot, then each published event until a terminal state."""
+    try:
+        yield format_sse(snapshot)
+        state = snapshot['state']
+        while state not in TERMINAL_STATES:
+            try:
+                event = events.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                # Keeps proxies from closing an idle connection and surfaces client disconnects
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+            state = event.get('state')
+    finally:
+        hub.unwatch(task_id, events)
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_CACHE_PATH = os.getenv('TRANSCRIPT_CACHE_PATH', '../tmp/transcript_cache.db')
+TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', 7 * 24 * 3600))
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+def make_cache_key(video_id, settings):
+    """Build a content address from the video ID and the transcription settings."""
+    payload = json.dumps({'video_id': video_id, 'settings': settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class TranscriptCache:
+    """Persistent transcript cache backed by SQLite, shared by every worker on the host."""
+
+    def __init__(self, path=TRANSCRIPT_CACHE_PATH, ttl=TRANSCRIPT_CACHE_TTL, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS transcripts ('
+                'key TEXT PRIMARY KEY, video_id TEXT NOT NULL, transcript TEXT NOT NULL, '
+                'duration REAL NOT NULL, size INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO stats (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _incr(self, conn, name, amount=1):
+        conn.execute('UPDATE stats SET value = value + ? WHERE name = ?', (amount, name))
+
+    def get(self, video_id, settings):
+        """Return the cached {'transcript', 'duration'} for the video, or None on a miss."""
+        key = make_cache_key(video_id, settings)
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT transcript, duration, created_at FROM transcripts WHERE key = ?', (key,)
+            ).fetchone()
+
+            if row and now - row[2] > self.ttl:
+                conn.execute('DELETE FROM transcripts WHERE key = ?', (key,))
+                self._incr(conn, 'evictions')
+                row = None
+
+            if not row:
+                self._incr(conn, 'misses')
+                return None
+
+            conn.execute('UPDATE transcripts SET accessed_at = ? WHERE key = ?', (now, key))
+            self._incr(conn, 'hits')
+            return {'transcript': row[0], 'duration': row[1]}
+
+    def set(self, video_id, settings, transcript, duration):
+        """Store a transcript and evict expired or least recently used entries."""
+        key = make_cache_key(video_id, settings)
+        now = time.time()
+        size = len(transcript.encode('utf-8'))
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO transcripts '
+                '(key, video_id, transcript, duration, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, video_id, transcript, duration, size, now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        expired = conn.execute('DELETE FROM transcripts WHERE created_at < ?', (now - self.ttl,)).rowcount
+        evicted = expired
+
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM transcripts').fetchone()[0]
+        if total > self.max_bytes:
+            rows = conn.execute('SELECT key, size FROM transcripts ORDER BY accessed_at ASC').fetchall()
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute('DELETE FROM transcripts WHERE key = ?', (key,))
+                total -= size
+                evicted += 1
+
+        if evicted:
+            self._incr(conn, 'evictions', evicted)
+            logger.info(f"Evicted {evicted} transcript cache entries")
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current cache footprint."""
+        with self._connect() as conn:
+            stats = dict(conn.execute('SELECT name, value FROM stats').fetchall())
+            entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts').fetchone()
+        stats.update({'entries': entries, 'bytes': size})
+        return stats
+
+_transcript_cache = None
+
+def get_transcript_cache():
+    """Return the process-wide transcript cache, creating it on first use."""
+    global _transcript_cache
+    if _transcript_cache is None:
+        _transcript_cache = TranscriptCache()
+    return _transcript_cache
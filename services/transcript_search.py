@@ -0,0 +1,84 @@
+import os
+import logging
+from sqlalchemy import text
+from db.models import db, TranscriptSegment, SearchDocument
+
+logger = logging.getLogger(__name__)
+
+# Videos returned per search by default, and the most a client may ask for
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 10))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', 50))
+# Best matching segments shown for each video
+SEARCH_SNIPPETS_PER_VIDEO = int(os.getenv('SEARCH_SNIPPETS_PER_VIDEO', 3))
+
+SQLITE_SEARCH = text("""
+    SELECT d.video_id, d.chunk_index, d.start_seconds, d.end_seconds,
+           snippet(search_document_fts, 0, '[', ']', '...', 16) AS snippet
+    FROM search_document_fts JOIN search_document d ON d.id = search_document_fts.rowid
+    WHERE search_document_fts MATCH :query
+    ORDER BY bm25(search_document_fts)
+    LIMIT :limit
+""")
+
+# Headlines are built for the page only, not for every match
+POSTGRES_SEARCH = text("""
+    SELECT video_id, chunk_index, start_seconds, end_seconds,
+           ts_headline('english', text, query, 'StartSel=[, StopSel=], MinWords=8, MaxWords=24') AS snippet
+    FROM (
+        SELECT d.*, query, ts_rank(to_tsvector('english', d.text), query) AS rank
+        FROM search_document d, websearch_to_tsquery('english', :query) query
+        WHERE to_tsvector('english', d.text) @@ query
+        ORDER BY rank DESC
+        LIMIT :limit
+    ) hits
+    ORDER BY rank DESC
+""")
+
+def fts5_query(query):
+    """Quote each word, so user input is matched as terms rather than parsed as FTS5 syntax."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+def search_sqlite(query, limit):
+    return db.session.execute(SQLITE_SEARCH, {'query': fts5_query(query), 'limit': limit}).all()
+
+def search_postgres(query, limit):
+    return db.session.execute(POSTGRES_SEARCH, {'query': query, 'limit': limit}).all()
+
+# Each backend takes the query and a row limit and returns the best matching segments first
+SEARCH_BACKENDS = {
+    'sqlite': search_sqlite,
+    'postgresql': search_postgres,
+}
+
+def index_transcript(video_id):
+    """Replace video_id's documents in the search index with its stored transcript segments."""
+    segments = TranscriptSegment.query.filter_by(video_id=video_id).order_by(TranscriptSegment.chunk_index).all()
+    SearchDocument.query.filter_by(video_id=video_id).delete()
+    db.session.add_all([
+        SearchDocument(video_id=video_id, chunk_index=segment.chunk_index, start_seconds=segment.start_seconds,
+                       end_seconds=segment.end_seconds, text=segment.text)
+        for segment in segments
+    ])
+    db.session.commit()
+    return len(segments)
+
+def search_transcripts(query, limit=SEARCH_PAGE_SIZE):
+    """Return up to limit videos matching query, best first, each with its best timestamped snippets."""
+    dialect = db.engine.dialect.name
+    if dialect not in SEARCH_BACKENDS:
+        raise ValueError(f"Transcript search is not supported on {dialect}")
+    if not query.split():
+        return []
+
+    rows = SEARCH_BACKENDS[dialect](query, limit * SEARCH_SNIPPETS_PER_VIDEO)
+    results = {}
+    for row in rows:
+        if row.video_id not in results:
+            if len(results) == limit:
+                continue
+            results[row.video_id] = {'video_id': row.video_id, 'snippets': []}
+        snippets = results[row.video_id]['snippets']
+        if len(snippets) < SEARCH_SNIPPETS_PER_VIDEO:
+            snippets.append({'index': row.chunk_index, 'start': row.start_seconds, 'end': row.end_seconds,
+                             'snippet': row.snippet})
+    return list(results.values())
@@ -0,0 +1,87 @@
+import os
+import logging
+from db.models import db, TranscriptSegment
+
+logger = logging.getLogger(__name__)
+
+# Segments returned per page by default, and the most a client may ask for
+TRANSCRIPT_PAGE_SIZE = int(os.getenv('TRANSCRIPT_PAGE_SIZE', 50))
+TRANSCRIPT_MAX_PAGE_SIZE = int(os.getenv('TRANSCRIPT_MAX_PAGE_SIZE', 500))
+
+def make_segments(chunks, chunk_length, duration, chunk_spans=None):
+    """Pair each chunk's result with its time range in the original audio; chunks without speech are left out.
+
+    chunks are backend chunk results, see services/transcription_service.py. chunk_spans are the
+    (start, end) seconds of the speech VAD kept in each chunk; without VAD, chunk i covers
+    chunk_length seconds from i * chunk_length. Word offsets into a chunk are converted to
+    seconds in the original audio.
+    """
+    segments = []
+    for index, chunk in enumerate(chunks):
+        if chunk_spans:
+            spans = chunk_spans[index]
+            start, end = spans[0][0], spans[-1][1]
+        else:
+            start, end = index * chunk_length, (index + 1) * chunk_length
+            if duration:
+                end = min(end, duration)
+            spans = [(start, end)]
+        if chunk['text'].strip():
+            segments.append({
+                'index': index, 'start': round(start, 3), 'end': round(end, 3), 'text': chunk['text'],
+                'confidence': chunk.get('confidence'), 'words': audio_words(chunk.get('words'), spans),
+            })
+    return segments
+
+def audio_words(words, spans):
+    if not words:
+        return None
+    return [
+        {'word': word['word'], 'start': round(audio_time(word['start'], spans), 3), 'end': round(audio_time(word['end'], spans), 3)}
+        for word in words
+    ]
+
+def audio_time(offset, spans):
+    """Map seconds into a chunk, which holds its speech spans back to back, to seconds in the original audio."""
+    for start, end in spans:
+        if offset <= end - start:
+            return start + offset
+        offset -= end - start
+    return spans[-1][1]
+
+def store_segments(video_id, segments):
+    """Replace the stored transcript of video_id with segments."""
+    TranscriptSegment.query.filter_by(video_id=video_id).delete()
+    db.session.add_all([
+        TranscriptSegment(video_id=video_id, chunk_index=segment['index'], start_seconds=segment['start'],
+                          end_seconds=segment['end'], text=segment['text'],
+                          confidence=segment.get('confidence'), words=segment.get('words'))
+        for segment in segments
+    ])
+    db.session.commit()
+
+def get_segments(video_id, start=None, end=None, cursor=None, limit=TRANSCRIPT_PAGE_SIZE):
+    """Return a page of the segments overlapping [start, end) seconds, and the cursor of the next page or None.
+
+    cursor is the index of the last segment of the previous page.
+    """
+    query = TranscriptSegment.query.filter(TranscriptSegment.video_id == video_id)
+    if start is not None:
+        query = query.filter(TranscriptSegment.end_seconds > start)
+    if end is not None:
+        query = query.filter(TranscriptSegment.start_seconds < end)
+    if cursor is not None:
+        query = query.filter(TranscriptSegment.chunk_index > cursor)
+
+    # One extra row tells whether there is another page
+    rows = query.order_by(TranscriptSegment.chunk_index).limit(limit + 1).all()
+    segments = [
+        {'index': row.chunk_index, 'start': row.start_seconds, 'end': row.end_seconds, 'text': row.text,
+         'confidence': row.confidence, 'words': row.words}
+        for row in rows[:limit]
+    ]
+    next_cursor = segments[-1]['index'] if len(rows) > limit else None
+    return segments, next_cursor
+
+def has_transcript(video_id):
+    return db.session.query(TranscriptSegment.query.filter_by(video_id=video_id).exists()).scalar()
@@ -0,0 +1,166 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from google.api_core import exceptions as google_exceptions
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_INITIAL_CONCURRENCY = int(os.getenv('TRANSCRIPTION_INITIAL_CONCURRENCY', 8))
+TRANSCRIPTION_MIN_CONCURRENCY = int(os.getenv('TRANSCRIPTION_MIN_CONCURRENCY', 1))
+TRANSCRIPTION_MAX_CONCURRENCY = int(os.getenv('TRANSCRIPTION_MAX_CONCURRENCY', 32))
+# A recognize call slower than this is treated as a congestion signal
+TRANSCRIPTION_TARGET_LATENCY = float(os.getenv('TRANSCRIPTION_TARGET_LATENCY', 15))
+TRANSCRIPTION_MAX_RETRIES = int(os.getenv('TRANSCRIPTION_MAX_RETRIES', 5))
+TRANSCRIPTION_BACKOFF_BASE = float(os.getenv('TRANSCRIPTION_BACKOFF_BASE', 0.5))
+TRANSCRIPTION_BACKOFF_MAX = float(os.getenv('TRANSCRIPTION_BACKOFF_MAX', 30))
+
+THROTTLING_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+queue_depth = registry.gauge('transcription_queue_depth', 'Recognize calls waiting for a global concurrency slot')
+in_flight = registry.gauge('transcription_in_flight', 'Recognize calls currently running')
+concurrency_limit = registry.gauge('transcription_concurrency_limit', 'Current adaptive global concurrency limit')
+throttled_total = registry.counter('transcription_throttled_total', 'Recognize calls rejected by provider throttling')
+retries_total = registry.counter('transcription_retries_total', 'Recognize calls retried after throttling')
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+class AdaptiveLimiter:
+    """Process-wide concurrency limit with AIMD adjustment, usable from any thread's event loop.
+
+    Every fast success raises the limit by 1/limit (about +1 per window of calls); a throttling
+    error or a call slower than target_latency multiplies it by `decrease`, at most once per
+    cooldown so that a single burst of errors does not collapse the limit to the floor.
+    """
+
+    def __init__(self, initial=TRANSCRIPTION_INITIAL_CONCURRENCY, min_limit=TRANSCRIPTION_MIN_CONCURRENCY,
+                 max_limit=TRANSCRIPTION_MAX_CONCURRENCY, target_latency=TRANSCRIPTION_TARGET_LATENCY,
+                 decrease=0.5, cooldown=1.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        concurrency_limit.set(self.limit)
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                self._publish()
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+            self._publish()
+
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # The slot was handed to us as we were cancelled; pass it on
+                    self._in_flight -= 1
+                    self._wake()
+                self._publish()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+            self._publish()
+
+    def record(self, latency=None, throttled=False):
+        """Feed back the outcome of one call to adapt the limit."""
+        with self._lock:
+            if throttled or (latency is not None and latency > self.target_latency):
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = now
+                    logger.info(f"Transcription concurrency limit decreased to {self.limit}")
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._wake()
+                self._publish()
+            concurrency_limit.set(self.limit)
+
+    def _wake(self):
+        # Hand slots directly to waiters, which may belong to other threads' event loops
+        while self._waiters and self._in_flight < self.limit:
+            loop, future = self._waiters.popleft()
+            self._in_flight += 1
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _publish(self):
+        in_flight.set(self._in_flight)
+        queue_depth.set(len(self._waiters))
+
+def backoff_delay(attempt, base=TRANSCRIPTION_BACKOFF_BASE, cap=TRANSCRIPTION_BACKOFF_MAX):
+    """Full-jitter exponential backoff for the given retry attempt (starting at 0)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class TranscriptionScheduler:
+    """Runs recognize calls under the shared adaptive limit, retrying throttled calls."""
+
+    def __init__(self, limiter=None, max_retries=TRANSCRIPTION_MAX_RETRIES):
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+
+    async def run(self, call):
+        """Await call() inside a global slot; call must return a new awaitable on each attempt."""
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            start = time.monotonic()
+            try:
+                result = await call()
+            except THROTTLING_ERRORS as e:
+                self.limiter.record(throttled=True)
+                throttled_total.inc()
+                if attempt >= self.max_retries:
+                    logger.error(f"Giving up on throttled recognize call after {attempt} retries: {str(e)}")
+                    raise
+            else:
+                self.limiter.record(latency=time.monotonic() - start)
+                return result
+            finally:
+                self.limiter.release()
+
+            delay = backoff_delay(attempt)
+            attempt += 1
+            retries_total.inc()
+            logger.info(f"Recognize call throttled, retry {attempt} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+transcription_scheduler = TranscriptionScheduler()
@@ -0,0 +1,42 @@
+import os
+import importlib
+from services.audio_service import CHUNK_LENGTH
+
+# 'google' sends chunks to Google Speech-to-Text, 'local' runs a Whisper model on this worker's CPU
+TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'google')
+
+# Each backend module provides transcription_settings(chunk_length), an async
+# transcribe_audio(audio_file, chunk_length, stats=None, progress=None) returning
+# (transcript, chunk_files_to_clean_up), recording VAD savings in stats and reporting each
+# completed chunk to a services.progress_service.TranscriptProgress, and an async
+# transcribe_pcm_chunk(audio_content) returning the result of one 16 kHz mono PCM chunk: a dict
+# of its 'text', its 'confidence' and its 'words' with their start and end seconds into the
+# chunk, the last two None where the backend does not report them.
+# Modules are imported on first use so a worker only loads the SDKs its backend needs.
+TRANSCRIPTION_BACKENDS = {
+    'google': 'services.google_transcription_service',
+    'local': 'services.local_transcription_service',
+}
+
+def get_transcription_backend(name=None):
+    """Return the backend module selected by name, or by TRANSCRIPTION_BACKEND."""
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return importlib.import_module(TRANSCRIPTION_BACKENDS[name])
+
+def transcription_settings(chunk_length=CHUNK_LENGTH, backend=None):
+    """Settings that affect transcript output, including which backend produced it."""
+    name = backend or TRANSCRIPTION_BACKEND
+    settings = get_transcription_backend(name).transcription_settings(chunk_length)
+    return dict(settings, backend=name)
+
+async def transcribe_audio(audio_file, chunk_length=CHUNK_LENGTH, backend=None, stats=None, progress=None):
+    """Transcribe audio_file with the configured backend."""
+    return await get_transcription_backend(backend).transcribe_audio(
+        audio_file, chunk_length, stats=stats, progress=progress
+    )
+
+async def transcribe_pcm_chunk(audio_content, backend=None):
+    """Transcribe one chunk of 16 kHz mono PCM with the configured backend."""
+    return await get_transcription_backend(backend).transcribe_pcm_chunk(audio_content)
@@ -0,0 +1,83 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, update, insert, select, literal, or_, and_
+from sqlalchemy.exc import IntegrityError
+from db.models import db, User, Usage
+
+logger = logging.getLogger(__name__)
+
+RESERVED = 'reserved'
+SETTLED = 'settled'
+RELEASED = 'released'
+# Reservations of jobs that never settled or released, e.g. because their worker was killed, stop counting after this many seconds
+RESERVATION_TTL = int(os.getenv('RESERVATION_TTL', 6 * 3600))
+
+def minutes_for(duration):
+    """Minutes billed for duration seconds of video; partial minutes are not charged."""
+    return int((duration or 0) / 60)
+
+def get_balance(user_id):
+    """Return the user's minutes left: their grant minus reserved and settled usage. May be negative.
+
+    Reservations older than RESERVATION_TTL are ignored; a job that completes after that is still
+    charged when it settles.
+    """
+    return db.session.query(balance(user_id)).filter(User.id == user_id).scalar()
+
+def balance(user_id):
+    """SQL expression for the minutes user_id has left, to select from the user's row."""
+    cutoff = datetime.utcnow() - timedelta(seconds=RESERVATION_TTL)
+    used = db.session.query(func.coalesce(func.sum(Usage.minutes), 0)).filter(
+        Usage.user_id == user_id,
+        or_(Usage.status == SETTLED, and_(Usage.status == RESERVED, Usage.created_at >= cutoff)),
+    ).scalar_subquery()
+    return User.free_minutes - used
+
+def reserve_minutes(user_id, task_id, minutes):
+    """Count a submitted job's minutes against the user while it runs; False, reserving nothing, if they have too few left.
+
+    A no-op update locks the user's row first, so concurrent submissions of the same user check
+    and reserve one at a time and cannot together reserve more than the user has.
+    """
+    db.session.execute(update(User).where(User.id == user_id).values(free_minutes=User.free_minutes))
+    reserved = db.session.execute(
+        insert(Usage).from_select(
+            ['user_id', 'task_id', 'minutes', 'status', 'created_at'],
+            select(literal(user_id), literal(task_id), literal(minutes), literal(RESERVED), literal(datetime.utcnow()))
+            .where(User.id == user_id, balance(user_id) >= minutes),
+        )
+    ).rowcount
+    db.session.commit()
+    return reserved > 0
+
+def settle_usage(user_id, task_id, minutes):
+    """Charge a completed job's minutes and return the user's minutes left, never below zero.
+
+    Only the job's own ledger row is written, so jobs of the same user never wait on each other's
+    locks. Settling a job again, e.g. after a retry, does not charge it twice.
+    """
+    now = datetime.utcnow()
+    settled = db.session.execute(
+        update(Usage)
+        .where(Usage.task_id == task_id, Usage.status == RESERVED)
+        .values(minutes=minutes, status=SETTLED, settled_at=now)
+    ).rowcount
+    if not settled and not db.session.query(Usage.id).filter_by(task_id=task_id).first():
+        # Jobs queued without a reservation are charged when they complete
+        db.session.add(Usage(user_id=user_id, task_id=task_id, minutes=minutes, status=SETTLED, settled_at=now))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent settlement of the same job won; it is charged once
+        db.session.rollback()
+    return max(0, get_balance(user_id))
+
+def release_reservation(task_id):
+    """Stop counting a failed job's reserved minutes against the user."""
+    db.session.execute(
+        update(Usage)
+        .where(Usage.task_id == task_id, Usage.status == RESERVED)
+        .values(status=RELEASED, settled_at=datetime.utcnow())
+    )
+    db.session.commit()
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+
+VAD_FRAME_MS = 30
+# Frames louder than the noise floor (this percentile of frame energies) plus the margin are speech.
+# The threshold never rises above the speech level minus the margin, so audio with little or no
+# silence, where the noise floor percentile lands on speech, is kept.
+VAD_NOISE_PERCENTILE = float(os.getenv('VAD_NOISE_PERCENTILE', 10))
+VAD_SPEECH_PERCENTILE = float(os.getenv('VAD_SPEECH_PERCENTILE', 90))
+VAD_MARGIN_DB = float(os.getenv('VAD_MARGIN_DB', 10))
+# Frames quieter than this (dBFS) are never speech, so near-silent recordings are not all kept
+VAD_MIN_ENERGY_DB = float(os.getenv('VAD_MIN_ENERGY_DB', -50))
+# Audio kept on each side of detected speech, so word edges and short pauses survive
+VAD_HANGOVER_MS = int(os.getenv('VAD_HANGOVER_MS', 300))
+
+def frame_energy_db(samples, frame_length):
+    """Energy in dBFS of each frame of 16-bit samples; a trailing partial frame is zero-padded."""
+    num_frames = -(-len(samples) // frame_length)
+    frames = np.zeros(num_frames * frame_length, dtype=np.float32)
+    frames[:len(samples)] = samples.astype(np.float32) / 32768.0
+    power = np.mean(frames.reshape(num_frames, frame_length) ** 2, axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+def speech_mask(energy_db, hangover_frames=0):
+    """Boolean mask of frames to keep: speech frames widened by hangover_frames on each side."""
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+
+    noise_floor, speech_level = np.percentile(energy_db, [VAD_NOISE_PERCENTILE, VAD_SPEECH_PERCENTILE])
+    threshold = max(min(noise_floor + VAD_MARGIN_DB, speech_level - VAD_MARGIN_DB), VAD_MIN_ENERGY_DB)
+    speech = energy_db > threshold
+    if hangover_frames:
+        speech = np.convolve(speech, np.ones(2 * hangover_frames + 1), mode='same') > 0
+    return speech
+
+def speech_spans(mask):
+    """Return (start, end) frame ranges of each run of True in mask."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+def plan_chunks(energy_db, chunk_frames, hangover_frames=0):
+    """Group speech into chunks of at most chunk_frames kept frames, each a list of (start, end) frame spans.
+
+    Non-speech between spans is dropped and chunks are closed in those gaps. A span longer than a
+    chunk first fills up the current chunk, cut at its quietest frame in the second half of the
+    room left, and the rest carries on into the next chunks the same way.
+    """
+    chunks = []
+    current = []
+    current_frames = 0
+
+    for start, end in speech_spans(speech_mask(energy_db, hangover_frames)):
+        while start < end:
+            room = chunk_frames - current_frames
+            if end - start <= room:
+                current.append((start, end))
+                current_frames += end - start
+                break
+
+            if current and (end - start <= chunk_frames or room == 0):
+                # The span fits a chunk of its own, so this one is closed in the silence before it
+                chunks.append(current)
+                current = []
+                current_frames = 0
+                continue
+
+            window_start = start + room // 2
+            cut = window_start + int(np.argmin(energy_db[window_start:start + room])) + 1
+            current.append((start, cut))
+            chunks.append(current)
+            current = []
+            current_frames = 0
+            start = cut
+
+    if current:
+        chunks.append(current)
+    return chunks
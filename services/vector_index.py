@@ -0,0 +1,74 @@
+import os
+import numpy as np
+
+# Indexes of at least this many vectors are searched through clusters (IVF) instead of exhaustively.
+# A transcript has tens of spans, so per-video indexes stay exact
+VECTOR_ANN_MIN_SIZE = int(os.getenv('VECTOR_ANN_MIN_SIZE', 5000))
+# Clusters an approximate search scores; more is slower and closer to exact
+VECTOR_ANN_PROBES = int(os.getenv('VECTOR_ANN_PROBES', 8))
+
+def normalize(vectors):
+    """Scale vectors to unit length, so a dot product is their cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def top_k(scores, k):
+    """Return the positions of the k highest scores, highest first, and the scores."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return best, scores[best]
+
+class VectorIndex:
+    """Exact cosine similarity search: every vector is scored against the query in one matrix product."""
+
+    def __init__(self, vectors):
+        self.vectors = normalize(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, query, k):
+        """Return the indices of the k vectors most similar to query, best first, and their similarities."""
+        return top_k(self.vectors @ normalize(query), k)
+
+class IVFIndex(VectorIndex):
+    """Approximate search: vectors are clustered by k-means and a query only scores the probes clusters nearest to it."""
+
+    def __init__(self, vectors, lists=None, probes=VECTOR_ANN_PROBES, iterations=10, seed=0):
+        super().__init__(vectors)
+        lists = min(lists or max(1, int(np.sqrt(len(self.vectors)))), len(self.vectors))
+        self.centroids, assignments = kmeans(self.vectors, lists, iterations, seed)
+        # Vectors sorted by cluster, so each cluster is one slice of self.members
+        self.members = np.argsort(assignments, kind='stable')
+        self.offsets = np.searchsorted(assignments[self.members], np.arange(lists + 1))
+        self.probes = probes
+
+    def search(self, query, k):
+        query = normalize(query)
+        clusters, _ = top_k(self.centroids @ query, self.probes)
+        candidates = np.concatenate([self.members[self.offsets[c]:self.offsets[c + 1]] for c in clusters])
+        best, scores = top_k(self.vectors[candidates] @ query, k)
+        return candidates[best], scores
+
+def kmeans(vectors, clusters, iterations, seed):
+    """Spherical k-means; returns the unit-length centroids and each vector's cluster."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)]
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        # An emptied cluster keeps its previous centroid
+        filled = np.bincount(assignments, minlength=clusters) > 0
+        centroids[filled] = normalize(sums[filled])
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+def build_index(vectors):
+    """Return an exact index, or an approximate one once there are VECTOR_ANN_MIN_SIZE vectors or more."""
+    if len(vectors) >= VECTOR_ANN_MIN_SIZE:
+        return IVFIndex(vectors)
+    return VectorIndex(vectors)
@@ -0,0 +1,68 @@
+import os
+import json
+import logging
+from services.youtube_service import get_video_id
+from utils.redis_client import get_redis
+from utils.concurrency import run_blocking
+from services.pipeline_metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+VIDEO_METADATA_PREFIX = 'video-metadata:'
+# Format URLs in the extracted info expire after a few hours, so entries must not outlive them
+VIDEO_METADATA_TTL = int(os.getenv('VIDEO_METADATA_TTL', 3600))
+
+# Keys the worker never needs; dropping them keeps cache entries and task payloads small
+DROPPED_INFO_KEYS = (
+    'thumbnails', 'thumbnail', 'subtitles', 'automatic_captions', 'requested_subtitles',
+    'heatmap', 'chapters', 'description', 'tags', 'categories', 'requested_formats',
+)
+
+class VideoMetadataError(Exception):
+    """The video's information could not be extracted, e.g. because the URL is invalid or the video unavailable."""
+
+def slim_info(info):
+    """Return a JSON-safe copy of yt-dlp info with only what audio download and billing use."""
+    import yt_dlp as youtube_dl
+    info = youtube_dl.YoutubeDL.sanitize_info(info, remove_private_keys=True)
+    for key in DROPPED_INFO_KEYS:
+        info.pop(key, None)
+    # Only formats carrying audio can satisfy 'bestaudio/best'
+    info['formats'] = [fmt for fmt in info.get('formats') or [] if fmt.get('acodec') != 'none']
+    return info
+
+def extract_video_metadata(youtube_url):
+    # Imported on first use, as yt-dlp's extractors take a fifth of a second to import
+    import yt_dlp as youtube_dl
+    ydl_opts = {'quiet': True, 'skip_download': True, 'noplaylist': True}
+    try:
+        with youtube_dl.YoutubeDL(ydl_opts) as ydl:
+            return slim_info(ydl.extract_info(youtube_url, download=False))
+    except youtube_dl.utils.DownloadError as e:
+        raise VideoMetadataError(str(e)) from e
+
+def get_video_metadata(youtube_url):
+    """Return extracted video info, from the shared cache when another process already probed the video."""
+    video_id = get_video_id(youtube_url)
+    cache_key = VIDEO_METADATA_PREFIX + video_id if video_id else None
+
+    if cache_key:
+        try:
+            cached = get_redis().get(cache_key)
+            if cached:
+                logger.info(f"Video metadata cache hit for video {video_id}")
+                return json.loads(cached)
+        except Exception as e:
+            logger.error(f"Error reading video metadata cache: {str(e)}")
+
+    # yt-dlp parses pages and player scripts for seconds at a time; under gevent that would stall every request
+    with time_stage('metadata'):
+        metadata = run_blocking(extract_video_metadata, youtube_url)
+
+    cache_key = VIDEO_METADATA_PREFIX + metadata['id'] if metadata.get('id') else cache_key
+    if cache_key:
+        try:
+            get_redis().set(cache_key, json.dumps(metadata), ex=VIDEO_METADATA_TTL)
+        except Exception as e:
+            logger.error(f"Error writing video metadata cache: {str(e)}")
+    return metadata
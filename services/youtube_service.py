@@ -1,30 +1,80 @@
-import yt_dlp as youtube_dl
 import ffmpeg
 import os
+import re
+import tempfile
 import logging
 
 logger = logging.getLogger(__name__)
 
-def download_audio(youtube_url):
-    output_dir = "../tmp/downloads"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-    
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})')
+
+def get_video_id(youtube_url):
+    """Extract the YouTube video ID from a URL without a network call, or None if unknown."""
+    match = VIDEO_ID_PATTERN.search(youtube_url or '')
+    return match.group(1) if match else None
+
+DOWNLOAD_DIR = "../tmp/downloads"
+# 'fast' keeps the native audio stream, which transcription decodes to 16 kHz PCM anyway;
+# 'mp3' re-encodes it to 192 kbps MP3 as before
+DOWNLOAD_MODE = os.getenv('DOWNLOAD_MODE', 'fast')
+# Fragments of HLS and DASH formats fetched at once in fast mode
+DOWNLOAD_CONCURRENT_FRAGMENTS = int(os.getenv('DOWNLOAD_CONCURRENT_FRAGMENTS', 8))
+# Non-fragmented formats are fetched in ranges of this many bytes, as YouTube throttles long single requests
+DOWNLOAD_HTTP_CHUNK_SIZE = int(os.getenv('DOWNLOAD_HTTP_CHUNK_SIZE', 10 * 1024 * 1024))
+
+def download_options(output_dir, mode=None):
+    """yt-dlp options for downloading the audio track into output_dir."""
     ydl_opts = {
         'format': 'bestaudio/best',
         'noplaylist': True,
         'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
-        'postprocessors': [{
+    }
+    if (mode or DOWNLOAD_MODE) == 'mp3':
+        ydl_opts['postprocessors'] = [{
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': '192',
-        }],
-    }
+        }]
+    else:
+        ydl_opts['concurrent_fragment_downloads'] = DOWNLOAD_CONCURRENT_FRAGMENTS
+        ydl_opts['http_chunk_size'] = DOWNLOAD_HTTP_CHUNK_SIZE
+        # Container fixups are another ffmpeg pass over the file; the PCM decode reads it as downloaded
+        ydl_opts['fixup'] = 'never'
+    return ydl_opts
+
+def downloaded_file(info_dict, output_dir):
+    """Return the path yt-dlp wrote, after any post-processing."""
+    for download in info_dict.get('requested_downloads') or []:
+        if download.get('filepath'):
+            return download['filepath']
+    return os.path.join(output_dir, f"{info_dict.get('id')}.{info_dict.get('ext')}")
+
+def download_audio(youtube_url, info=None, output_dir=None, mode=None):
+    """Download the audio track into output_dir, a new temporary directory by default, and return its path.
+
+    With info from the metadata service the video is not probed again. The caller removes the directory.
+    """
+    if output_dir is None:
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix='job-', dir=DOWNLOAD_DIR)
+    elif not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    ydl_opts = download_options(output_dir, mode)
     try:
+        # Imported on first use, so workers that never download do not pay for it
+        import yt_dlp as youtube_dl
         with youtube_dl.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(youtube_url, download=True)
-            video_id = info_dict.get("id", None)
-            audio_file = os.path.join(output_dir, f"{video_id}.mp3")
+            info_dict = None
+            if info:
+                try:
+                    info_dict = ydl.process_ie_result(info, download=True)
+                except youtube_dl.utils.DownloadError as e:
+                    # Format URLs expire; fall back to a fresh extraction
+                    logger.warning(f"Download from extracted info failed, extracting again: {str(e)}")
+            if info_dict is None:
+                info_dict = ydl.extract_info(youtube_url, download=True)
+            audio_file = downloaded_file(info_dict, output_dir)
 
         if not os.path.exists(audio_file):
             raise FileNotFoundError("Audio file could not be created")
@@ -1,61 +1,393 @@
 import os
+import time
+import shutil
 import logging
 import asyncio
-from celery.signals import task_success, task_failure
-from services.youtube_service import download_audio, get_audio_duration
-from services.google_transcription_service import transcribe_audio_google
+from datetime import datetime
+from celery import shared_task, chain, chord
+from celery.exceptions import Ignore, Retry
+from celery.signals import task_success, task_failure, before_task_publish, task_prerun
+from services.youtube_service import download_audio, get_audio_duration, get_video_id
+from services.video_metadata_service import get_video_metadata
+from services.audio_service import read_pcm_chunks, read_speech_chunks, CHUNK_LENGTH
+from services.transcription_service import transcribe_audio, transcribe_pcm_chunk, transcription_settings
+from services.transcript_cache import get_transcript_cache, make_cache_key
+from services.transcript_store import make_segments, store_segments
+from services.transcript_search import index_transcript as index_transcript_segments
+from services.job_coalescing import transcription_coalescer, PIPELINE_LOCK_TTL
+from services.progress_service import TranscriptProgress, SharedTranscriptProgress, AnalysisProgress
+from services.task_events import publish_task_event
+from services.pipeline_metrics import time_stage, queue_wait_seconds, job_chunks, bytes_total
 from services.analyze_text_service import analyze_text
+from services.usage_service import minutes_for, settle_usage, release_reservation
 from db.models import User, db
-from celery import shared_task
 from contextlib import contextmanager
+from flask import has_app_context
 
 logger = logging.getLogger(__name__)
 
+# 'canvas' runs each stage as its own task on its own queue; 'single' runs the whole job in one task
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'canvas')
+# Each job downloads and segments in its own directory here. Stage tasks hand files to each other
+# through it, so it must be shared by all workers
+PIPELINE_WORK_DIR = os.getenv('PIPELINE_WORK_DIR', '../tmp/pipeline')
+# Whether job results carry the full transcript. Turned off, the result backend only holds the
+# analysis and clients page through /transcripts/<video_id> instead
+TRANSCRIPT_IN_RESULT = os.getenv('TRANSCRIPT_IN_RESULT', 'true').lower() == 'true'
+# How often a job waiting on another job's transcription checks back, without holding a worker slot
+TRANSCRIPTION_WAIT_INTERVAL = int(os.getenv('TRANSCRIPTION_WAIT_INTERVAL', 5))
+
 @contextmanager
 def app_context():
-    from main import app
+    """Run in the current Flask app context, which Celery tasks already have (see celery_config), or push one."""
+    if has_app_context():
+        yield
+        return
+    from worker import app
     with app.app_context():
         yield
 
-@shared_task(bind=True)
-def download_and_process(self, url, prompt, user_id):
+@contextmanager
+def db_session():
+    """A short-lived DB session; on exit it is closed and its connection goes back to the pool.
+
+    Jobs run for minutes, so a session held across one would keep a connection checked out throughout.
+    """
+    with app_context():
+        try:
+            yield db.session
+        finally:
+            db.session.remove()
+
+# Unlimited retries only apply to jobs waiting on another job's transcription, which retry until it finishes or its lock expires
+@shared_task(bind=True, max_retries=None)
+def download_and_process(self, url, prompt, user_id, metadata=None):
     logger.info('Starting task ---- download_and_process')
-    audio_path = None
-    audio_chunks = []
     try:
-        with app_context():
-            user = User.query.get(user_id)
-            if not user:
+        with db_session() as session:
+            if not session.get(User, user_id):
                 raise ValueError("User not found")
 
-            self.update_state(state='PROGRESS', meta={'status': 'Downloading video'})
-            audio_path = download_audio(url)
-
-            self.update_state(state='PROGRESS', meta={'status': 'Transcribing audio'})
-            transcript, audio_chunks = asyncio.run(transcribe_audio_google(audio_path))
+        video_id = get_video_id(url) or (metadata or {}).get('id')
+        settings = transcription_settings()
+        cached = get_cached_transcript(video_id, settings)
 
-            transcription_time_used = get_audio_duration(audio_path) / 60
-            user.free_minutes = max(0, user.free_minutes - int(transcription_time_used))
-            db.session.commit()
+        if PIPELINE_MODE == 'canvas':
+            return start_pipeline(self, url, prompt, user_id, metadata, video_id, settings, cached)
 
-            self.update_state(state='PROGRESS', meta={'status': 'Analyzing transcript'})
-            analysis = analyze_text(transcript, prompt)
+        if cached:
+            logger.info(f"Transcript cache hit for video {video_id}")
+            transcription = cached_transcription(cached)
+        elif video_id:
+            # Concurrent jobs for the same video share one download and transcription
+            transcription, owner = transcription_coalescer.run(
+                make_cache_key(video_id, settings),
+                lambda: transcribe_video(self, url, metadata, video_id, settings),
+                on_wait=lambda: report_progress(self.request.id, {'status': 'Waiting for another job transcribing this video'}),
+            )
+            if not owner:
+                logger.info(f"Reused transcription of video {video_id} from another job")
+        else:
+            transcription = transcribe_video(self, url, metadata, video_id, settings)
 
-            result = {
-                'status': 'Completed',
-                'result': {
-                    'transcript': transcript,
-                    'analysis': analysis,
-                    'free_minutes_left': user.free_minutes,
-                }
-            }
-            return result
+        analysis = stream_analysis(self.request.id, transcription['transcript'], prompt)
+        return bill_user(user_id, self.request.id, transcription, analysis)
+    except (Ignore, Retry):
+        raise
     except Exception as e:
         logger.error(f"Task failed: {str(e)}")
         self.update_state(state='FAILURE', meta={'status': str(e)})
+        release_job_minutes(self.request.id)
         raise
+
+def transcribe_video(task, url, metadata, video_id, settings):
+    """Download and transcribe the video, cache the transcript and return it with the duration to bill."""
+    audio_path = None
+    audio_chunks = []
+    try:
+        report_progress(task.request.id, {'status': 'Downloading video'})
+        # Jobs queued by /process carry the metadata it extracted
+        metadata = metadata or get_video_metadata(url)
+        audio_path = timed_download(task.request.id, url, metadata)
+
+        report_progress(task.request.id, {'status': 'Transcribing audio'})
+        transcription_stats = {}
+        progress = TranscriptProgress(lambda meta: report_progress(task.request.id, meta))
+        transcript, audio_chunks = asyncio.run(
+            transcribe_audio(audio_path, stats=transcription_stats, progress=progress)
+        )
+        progress.flush()
+
+        # Minutes are billed on the original duration, even when VAD skipped silence
+        duration = metadata.get('duration') or get_audio_duration(audio_path)
+        log_vad_savings(video_id, transcription_stats, duration)
+        cache_id = video_id or os.path.splitext(os.path.basename(audio_path))[0]
+        cache_transcript(cache_id, settings, transcript, duration)
+        chunks = progress.chunks()
+        if chunks:
+            segments = make_segments(chunks, settings.get('chunk_length', CHUNK_LENGTH), duration, transcription_stats.get('chunk_spans'))
+        else:
+            # The backend reported no chunks, so the transcript is stored as one segment
+            segments = make_segments([{'text': transcript}], duration, duration)
+        save_transcript_segments(cache_id, segments)
+        return {
+            'transcript': transcript,
+            'duration': duration,
+            'audio_seconds_saved': transcription_stats.get('audio_seconds_saved', 0),
+        }
     finally:
         cleanup_files(audio_path, audio_chunks)
+        shutil.rmtree(job_work_dir(task.request.id), ignore_errors=True)
+
+def stream_analysis(job_id, transcript, prompt):
+    """Analyze the transcript, relaying the answer through the job's progress as the model writes it."""
+    report_progress(job_id, {'status': 'Analyzing transcript'})
+    progress = AnalysisProgress(lambda meta: report_progress(job_id, meta))
+    with time_stage('analyze', job_id):
+        analysis = analyze_text(transcript, prompt, progress)
+    progress.flush()
+    return analysis
+
+def bill_user(user_id, job_id, transcription, analysis):
+    """Settle the job's minutes in the usage ledger and build the job result."""
+    with time_stage('billing', job_id), db_session():
+        free_minutes_left = settle_usage(user_id, job_id, minutes_for(transcription['duration']))
+
+    result = {
+        'transcript': transcription['transcript'],
+        'analysis': analysis,
+        'free_minutes_left': free_minutes_left,
+        'audio_seconds_saved': transcription['audio_seconds_saved'],
+    }
+    if not TRANSCRIPT_IN_RESULT:
+        del result['transcript']
+    return {'status': 'Completed', 'result': result}
+
+def log_vad_savings(video_id, stats, duration):
+    if 'audio_seconds_saved' in stats:
+        logger.info(
+            f"VAD skipped {stats['audio_seconds_saved']:.1f}s "
+            f"of {duration:.1f}s audio for video {video_id}"
+        )
+
+def start_pipeline(task, url, prompt, user_id, metadata, video_id, settings, cached):
+    """Replace the job task with a chain of stage tasks; the last stage finishes under the job's task ID."""
+    job_id = task.request.id
+    finish = [analyze_transcript.s(job_id, prompt), bill_job.s(job_id, user_id)]
+
+    if cached:
+        logger.info(f"Transcript cache hit for video {video_id}")
+        return task.replace(chain(analyze_transcript.s(cached_transcription(cached), job_id, prompt), finish[1]))
+
+    lock = None
+    if video_id:
+        key = make_cache_key(video_id, settings)
+        shared = transcription_coalescer.get_result(key)
+        if shared is not None:
+            logger.info(f"Reused transcription of video {video_id} from another job")
+            return task.replace(chain(analyze_transcript.s(shared, job_id, prompt), finish[1]))
+
+        token = transcription_coalescer.try_acquire(key, PIPELINE_LOCK_TTL)
+        if token is None:
+            # Check back later rather than hold a worker slot while another job transcribes
+            report_progress(job_id, {'status': 'Waiting for another job transcribing this video'})
+            raise task.retry(countdown=TRANSCRIPTION_WAIT_INTERVAL)
+        lock = {'key': key, 'token': token}
+
+    try:
+        if lock:
+            # The previous owner may have shared its result, and cached the transcript, between our check and the lock
+            cached = get_cached_transcript(video_id, settings)
+            shared = transcription_coalescer.get_result(key) or (cached and cached_transcription(cached))
+            if shared:
+                transcription_coalescer.release(key, token)
+                logger.info(f"Reused transcription of video {video_id} from another job")
+                return task.replace(chain(analyze_transcript.s(shared, job_id, prompt), finish[1]))
+
+        pipeline = chain(
+            fetch_audio.s(job_id, url, metadata, lock),
+            segment_audio.s(job_id, video_id, settings, lock),
+            *finish,
+        )
+        pipeline.link_error(abort_pipeline.s(job_id, lock))
+        return task.replace(pipeline)
+    except Ignore:
+        # Raised by replace() once the pipeline is sent; from here on it releases the lock
+        raise
+    except Exception:
+        if lock:
+            transcription_coalescer.release(lock['key'], lock['token'])
+        raise
+
+def cached_transcription(cached):
+    return {'transcript': cached['transcript'], 'duration': cached['duration'], 'audio_seconds_saved': 0}
+
+def job_work_dir(job_id):
+    return os.path.join(PIPELINE_WORK_DIR, job_id)
+
+def timed_download(job_id, url, metadata):
+    """Download the audio into the job's work directory, recording how long it took and how much was fetched."""
+    with time_stage('download', job_id):
+        audio_path = download_audio(url, metadata, job_work_dir(job_id))
+    bytes_total.inc(os.path.getsize(audio_path), stage='download')
+    return audio_path
+
+def renew_lock(lock):
+    if lock:
+        transcription_coalescer.renew(lock['key'], lock['token'], PIPELINE_LOCK_TTL)
+
+@contextmanager
+def lock_kept_alive(lock):
+    """Keep the pipeline's transcription lock renewed while a long stage runs."""
+    if not lock:
+        yield
+        return
+    with transcription_coalescer.keep_alive(lock['key'], lock['token'], PIPELINE_LOCK_TTL):
+        yield
+
+@shared_task(bind=True, ignore_result=True)
+def fetch_audio(self, job_id, url, metadata, lock):
+    """Pipeline stage: download the audio into the job's work directory."""
+    with lock_kept_alive(lock):
+        report_progress(job_id, {'status': 'Downloading video'})
+        # Jobs queued by /process carry the metadata it extracted
+        metadata = metadata or get_video_metadata(url)
+        audio_path = timed_download(job_id, url, metadata)
+    return {'audio_path': audio_path, 'duration': metadata.get('duration')}
+
+@shared_task(bind=True, ignore_result=True)
+def segment_audio(self, fetched, job_id, video_id, settings, lock):
+    """Pipeline stage: decode the audio into PCM chunk files, then fan out one transcription task per chunk."""
+    with lock_kept_alive(lock):
+        report_progress(job_id, {'status': 'Transcribing audio'})
+        audio_path = fetched['audio_path']
+        chunk_length = settings['chunk_length']
+
+        # The same chunks the single-task pipeline would transcribe, so transcripts are identical
+        stats = {}
+        if settings.get('vad'):
+            chunks = read_speech_chunks(audio_path, chunk_length, stats)
+        else:
+            chunks = read_pcm_chunks(audio_path, chunk_length)
+
+        chunk_paths = []
+        with time_stage('segment', job_id):
+            for index, audio_content in enumerate(chunks):
+                chunk_path = os.path.join(job_work_dir(job_id), f'chunk{index}.pcm')
+                with open(chunk_path, 'wb') as chunk_file:
+                    chunk_file.write(audio_content)
+                chunk_paths.append(chunk_path)
+                bytes_total.inc(len(audio_content), stage='segment')
+        job_chunks.observe(len(chunk_paths))
+
+        # Minutes are billed on the original duration, even when VAD skipped silence
+        duration = fetched['duration'] or get_audio_duration(audio_path)
+        log_vad_savings(video_id, stats, duration)
+        transcription = {'duration': duration, 'audio_seconds_saved': stats.get('audio_seconds_saved', 0)}
+        cache_id = video_id or os.path.splitext(os.path.basename(audio_path))[0]
+        os.remove(audio_path)
+
+    merge = merge_transcript.s(job_id, cache_id, settings, transcription, lock, stats.get('chunk_spans'))
+    if not chunk_paths:
+        return self.replace(merge.clone(args=([],)))
+
+    return self.replace(chord(
+        [transcribe_chunk.s(path, job_id, index, len(chunk_paths), settings['backend'], lock)
+         for index, path in enumerate(chunk_paths)],
+        merge,
+    ))
+
+@shared_task(bind=True)
+def transcribe_chunk(self, chunk_path, job_id, index, total, backend, lock):
+    """Pipeline stage: transcribe one PCM chunk file into the backend's chunk result."""
+    renew_lock(lock)
+    with open(chunk_path, 'rb') as chunk_file:
+        audio_content = chunk_file.read()
+
+    result = asyncio.run(transcribe_pcm_chunk(audio_content, backend))
+    SharedTranscriptProgress(job_id, total, lambda meta: report_progress(job_id, meta)).chunk_done(index, result['text'])
+    return result
+
+@shared_task(bind=True, ignore_result=True)
+def merge_transcript(self, chunks, job_id, video_id, settings, transcription, lock, chunk_spans=None):
+    """Pipeline stage: join the chunk texts in order, cache, store and share the transcript, and clean up."""
+    transcript = "".join(chunk['text'] for chunk in chunks)
+    transcription = dict(transcription, transcript=transcript)
+    cache_transcript(video_id, settings, transcript, transcription['duration'])
+    save_transcript_segments(video_id, make_segments(chunks, settings['chunk_length'], transcription['duration'], chunk_spans))
+    if lock:
+        transcription_coalescer.store_result(lock['key'], lock['token'], transcription)
+
+    SharedTranscriptProgress(job_id, len(chunks), None).clear()
+    shutil.rmtree(job_work_dir(job_id), ignore_errors=True)
+    return transcription
+
+@shared_task(bind=True, ignore_result=True)
+def analyze_transcript(self, transcription, job_id, prompt):
+    """Pipeline stage: run the user's prompt against the transcript."""
+    return {'transcription': transcription, 'analysis': stream_analysis(job_id, transcription['transcript'], prompt)}
+
+@shared_task(bind=True)
+def bill_job(self, analyzed, job_id, user_id):
+    """Pipeline stage: settle the job's minutes and return the job result, stored under the job's task ID."""
+    return bill_user(user_id, job_id, analyzed['transcription'], analyzed['analysis'])
+
+@shared_task
+def abort_pipeline(request, exc, traceback, job_id, lock):
+    """Pipeline error callback: fail the job under its task ID and release what it held."""
+    logger.error(f"Pipeline stage {request.task} failed for job {job_id}: {str(exc)}")
+    if lock:
+        transcription_coalescer.release(lock['key'], lock['token'])
+    SharedTranscriptProgress(job_id, None, None).clear()
+    shutil.rmtree(job_work_dir(job_id), ignore_errors=True)
+    release_job_minutes(job_id)
+    download_and_process.backend.mark_as_failure(job_id, exc)
+    publish_task_event(job_id, 'FAILURE', exc)
+
+def release_job_minutes(job_id):
+    """Release a failed job's reserved minutes; errors are logged so the job's own failure is reported."""
+    try:
+        with db_session():
+            release_reservation(job_id)
+    except Exception as e:
+        logger.error(f"Error releasing reserved minutes for job {job_id}: {str(e)}")
+
+def report_progress(job_id, meta):
+    """Record progress in the result backend for /status and push it to /status/<task_id>/stream watchers."""
+    download_and_process.update_state(task_id=job_id, state='PROGRESS', meta=meta)
+    publish_task_event(job_id, 'PROGRESS', meta)
+
+def get_cached_transcript(video_id, settings):
+    if not video_id:
+        return None
+    try:
+        return get_transcript_cache().get(video_id, settings)
+    except Exception as e:
+        logger.error(f"Error reading transcript cache: {str(e)}")
+        return None
+
+def cache_transcript(video_id, settings, transcript, duration):
+    try:
+        get_transcript_cache().set(video_id, settings, transcript, duration)
+    except Exception as e:
+        logger.error(f"Error writing transcript cache: {str(e)}")
+
+def save_transcript_segments(video_id, segments):
+    """Store the transcript's segments for /transcripts; failures are logged and the job carries on."""
+    try:
+        with db_session():
+            store_segments(video_id, segments)
+        # Searching a transcript can wait; the job does not
+        index_transcript.delay(video_id)
+    except Exception as e:
+        logger.error(f"Error storing transcript segments: {str(e)}")
+
+@shared_task
+def index_transcript(video_id):
+    """Add a video's stored transcript to the /search index, replacing what was indexed for it before."""
+    with db_session():
+        count = index_transcript_segments(video_id)
+    logger.info(f"Indexed {count} transcript segments of video {video_id} for search")
 
 def cleanup_files(audio_path, audio_chunks):
     try:
@@ -73,10 +405,28 @@ def cleanup_files(audio_path, audio_chunks):
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
 
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    # Read back in record_queue_wait; the workers' clocks are assumed to be in step with the publisher's
+    headers['published_at'] = time.time()
+
+@task_prerun.connect
+def record_queue_wait(task=None, **kwargs):
+    published_at = task.request.get('published_at')
+    # Tasks run eagerly or published by an older release carry no stamp
+    if published_at:
+        # Tasks published with a countdown or ETA, like jobs waiting on another job's transcription, only queue once it passes
+        if task.request.eta:
+            published_at = max(published_at, datetime.fromisoformat(task.request.eta).timestamp())
+        queue_wait_seconds.observe(max(0.0, time.time() - published_at), task=task.name)
+
 @task_success.connect
 def task_success_handler(sender=None, result=None, **kwargs):
-    logger.info(f"Task {sender.name} completed successfully with result: {result}")
+    # Results carry whole transcripts, which do not belong in the logs
+    logger.info(f"Task {sender.name} {sender.request.id} completed successfully")
+    publish_task_event(sender.request.id, 'SUCCESS', result)
 
 @task_failure.connect
 def task_failure_handler(sender=None, task_id=None, exception=None, **kwargs):
     logger.error(f"Task {sender.name} failed with exception: {exception}")
+    publish_task_event(task_id, 'FAILURE', exception)
@@ -0,0 +1,218 @@
+"""Local stand-ins for external services, shared by tests and benchmarks."""
+import re
+import json
+import zlib
+import base64
+import struct
+import time
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+class FakeSpeechClient:
+    """Offline stand-in for google.cloud.speech.SpeechClient.
+
+    setup_latency models channel creation, auth and the TLS handshake paid when a client
+    is constructed; recognize_latency models the round trip of a single recognize call.
+    """
+
+    instances = 0
+    _instances_lock = threading.Lock()
+
+    def __init__(self, setup_latency=0.2, recognize_latency=0.05, transcript='fake transcript'):
+        time.sleep(setup_latency)
+        self.recognize_latency = recognize_latency
+        self.transcript = transcript
+        self.calls = 0
+        with FakeSpeechClient._instances_lock:
+            FakeSpeechClient.instances += 1
+
+    def recognize(self, config=None, audio=None):
+        time.sleep(self.recognize_latency)
+        self.calls += 1
+        words = [
+            SimpleNamespace(word=word, start_time=timedelta(seconds=index), end_time=timedelta(seconds=index + 0.5))
+            for index, word in enumerate(self.transcript.split())
+        ]
+        alternative = SimpleNamespace(transcript=self.transcript, confidence=0.9, words=words)
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], result_end_time=timedelta(seconds=len(words)))])
+
+class FakeWhisperModel:
+    """Offline stand-in for a local batched speech model, callable with a list of float32 waveforms.
+
+    Work is simulated by spinning the CPU: call_overhead seconds per inference call plus
+    cost_per_second for every second of audio, so batching amortizes the fixed overhead.
+    """
+
+    def __init__(self, call_overhead=0.0, cost_per_second=0.0, sample_rate=16000):
+        self.call_overhead = call_overhead
+        self.cost_per_second = cost_per_second
+        self.sample_rate = sample_rate
+        self.batch_sizes = []
+
+    def __call__(self, waveforms):
+        self.batch_sizes.append(len(waveforms))
+        audio_seconds = sum(len(waveform) for waveform in waveforms) / self.sample_rate
+        deadline = time.perf_counter() + self.call_overhead + audio_seconds * self.cost_per_second
+        while time.perf_counter() < deadline:
+            pass
+        return [f'fake transcript {len(waveform)}' for waveform in waveforms]
+
+class FakeOpenAIServer:
+    """Local HTTP server answering the OpenAI chat completions API, for use as an OpenAI client base_url.
+
+    Each reply is "Summary of N words" where N is the word count of the last message. Latency is
+    base_latency plus per_prompt_token for every prompt token (4 characters each) plus
+    per_output_token for each generated token: output_tokens plus output_ratio per prompt token,
+    since a detailed answer grows with its input. Prompts over context_tokens are rejected with the
+    API's context length error. Requests with stream=True get the reply as server-sent
+    chat.completion.chunk events, one word at a time: the first after the prompt latency, the
+    rest spread over the generation time.
+
+    The embeddings API returns a bag of words hashed into embedding_dimensions, so texts sharing
+    words are similar; every input embedded is recorded in embedded_inputs.
+    """
+
+    def __init__(self, base_latency=0.0, per_prompt_token=0.0, per_output_token=0.0, output_tokens=100,
+                 output_ratio=0.0, context_tokens=None, embedding_dimensions=64):
+        self.base_latency = base_latency
+        self.per_prompt_token = per_prompt_token
+        self.per_output_token = per_output_token
+        self.output_tokens = output_tokens
+        self.output_ratio = output_ratio
+        self.context_tokens = context_tokens
+        self.embedding_dimensions = embedding_dimensions
+        self.prompts = []
+        self.embedded_inputs = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}/v1'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def complete(self, body, send_event=None):
+        """Return (status, payload); a streamed reply is sent through send_event and its payload is None."""
+        prompt = body['messages'][-1]['content']
+        prompt_tokens = len(prompt) // 4
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.context_tokens and prompt_tokens > self.context_tokens:
+                return 400, {'error': {
+                    'message': f"This model's maximum context length is {self.context_tokens} tokens.",
+                    'type': 'invalid_request_error', 'code': 'context_length_exceeded',
+                }}
+            output_tokens = self.output_tokens + int(prompt_tokens * self.output_ratio)
+            content = f'Summary of {len(prompt.split())} words'
+            time.sleep(self.base_latency + prompt_tokens * self.per_prompt_token)
+            if send_event is not None:
+                self.stream(body, content, output_tokens, send_event)
+                return 200, None
+
+            time.sleep(output_tokens * self.per_output_token)
+            return 200, {
+                'id': f'chatcmpl-{len(self.prompts)}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body['model'],
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': content},
+                }],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': output_tokens,
+                          'total_tokens': prompt_tokens + output_tokens},
+            }
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def embed(self, body):
+        """Return (status, payload) for an embeddings request."""
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        with self._lock:
+            self.embedded_inputs.extend(inputs)
+        time.sleep(self.base_latency)
+        data = []
+        for index, text in enumerate(inputs):
+            vector = [0.0] * self.embedding_dimensions
+            for word in re.findall(r'\w+', text.lower()):
+                vector[zlib.crc32(word.encode()) % self.embedding_dimensions] += 1.0
+            if body.get('encoding_format') == 'base64':
+                vector = base64.b64encode(struct.pack(f'<{len(vector)}f', *vector)).decode()
+            data.append({'object': 'embedding', 'index': index, 'embedding': vector})
+        tokens = sum(len(text) // 4 for text in inputs)
+        return 200, {'object': 'list', 'data': data, 'model': body['model'],
+                     'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
+
+    def stream(self, body, content, output_tokens, send_event):
+        pieces = re.findall(r'\S+\s*', content)
+        for index, piece in enumerate(pieces):
+            delta = {'role': 'assistant', 'content': piece} if index == 0 else {'content': piece}
+            send_event(self._chunk(body, delta, None))
+            time.sleep(output_tokens * self.per_output_token / len(pieces))
+        send_event(self._chunk(body, {}, 'stop'))
+        send_event('[DONE]')
+
+    def _chunk(self, body, delta, finish_reason):
+        return {
+            'id': f'chatcmpl-{len(self.prompts)}',
+            'object': 'chat.completion.chunk',
+            'created': int(time.time()),
+            'model': body['model'],
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def send_event(self, event):
+                if not self.streaming:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    self.streaming = True
+                data = f"data: {event if isinstance(event, str) else json.dumps(event)}\n\n".encode()
+                self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                self.streaming = False
+                if self.path.endswith('/embeddings'):
+                    status, payload = fake.embed(body)
+                else:
+                    status, payload = fake.complete(body, self.send_event if body.get('stream') else None)
+                if payload is None:
+                    self.wfile.write(b'0\r\n\r\n')
+                    return
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
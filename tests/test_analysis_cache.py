@@ -0,0 +1,128 @@
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import fakeredis
+from services.analysis_cache import AnalysisCache, make_analysis_key, normalize_prompt
+
+class TestAnalysisKey(unittest.TestCase):
+
+    def test_key_ignores_prompt_whitespace_and_summarize_casing(self):
+        key = make_analysis_key('transcript', 'summarize', 'gpt-3.5-turbo')
+
+        self.assertEqual(make_analysis_key('transcript', ' Summarize\n', 'gpt-3.5-turbo'), key)
+        self.assertEqual(normalize_prompt('List   the\ntopics '), 'List the topics')
+        self.assertNotEqual(make_analysis_key('transcript', 'List the topics', 'gpt-3.5-turbo'), key)
+        self.assertNotEqual(make_analysis_key('transcript', 'summarize', 'gpt-4o'), key)
+        self.assertNotEqual(make_analysis_key('other transcript', 'summarize', 'gpt-3.5-turbo'), key)
+
+    def test_key_depends_on_retrieval_settings(self):
+        retrieval = {'embedding_model': 'text-embedding-3-small', 'top_k': 6, 'span_tokens': 200}
+        key = make_analysis_key('transcript', 'What is said?', 'gpt-4o', retrieval)
+
+        self.assertNotEqual(make_analysis_key('transcript', 'What is said?', 'gpt-4o'), key)
+        self.assertNotEqual(make_analysis_key('transcript', 'What is said?', 'gpt-4o', dict(retrieval, top_k=3)), key)
+        self.assertNotEqual(make_analysis_key('transcript', 'What is said?', 'gpt-4o', dict(retrieval, span_tokens=400)), key)
+        self.assertNotEqual(make_analysis_key('transcript', 'What is said?', 'gpt-4o', dict(retrieval, embedding_model='other')), key)
+
+class TestAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def make_cache(self, **kwargs):
+        return AnalysisCache(redis_factory=lambda: self.redis, poll_interval=0.01, **kwargs)
+
+    def slow_compute(self, calls, value='analysis', delay=0.1):
+        def compute():
+            calls.append(threading.get_ident())
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_results_are_shared_through_redis(self):
+        worker_a, worker_b = self.make_cache(), self.make_cache()
+
+        worker_a.set('key', 'analysis')
+
+        self.assertEqual(worker_b.get('key'), 'analysis')
+        self.redis.flushall()
+        # Now served from worker_b's L1
+        self.assertEqual(worker_b.get('key'), 'analysis')
+
+    def test_l1_evicts_least_recently_used_and_expired_entries(self):
+        cache = AnalysisCache(redis_factory=MagicMock(side_effect=ConnectionError('redis down')), l1_size=2, ttl=60)
+
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+
+        self.assertEqual(cache.get('a'), '1')
+        self.assertIsNone(cache.get('b'))
+        with patch('services.analysis_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+
+    def test_concurrent_misses_in_one_process_compute_once(self):
+        cache = self.make_cache()
+        calls = []
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', self.slow_compute(calls))))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['analysis'] * 10)
+
+    def test_concurrent_misses_across_processes_compute_once(self):
+        workers = [self.make_cache() for _ in range(4)]
+        calls = []
+        results = []
+
+        threads = [threading.Thread(target=lambda w=worker: results.append(w.get_or_compute('key', self.slow_compute(calls))))
+                   for worker in workers for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['analysis'] * 12)
+        self.assertFalse(self.redis.exists('analysis:lock:key'))
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self):
+        cache = self.make_cache()
+        errors = []
+
+        def failing():
+            time.sleep(0.05)
+            raise RuntimeError('upstream failed')
+
+        def call():
+            try:
+                cache.get_or_compute('key', failing)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(errors), 5)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.get_or_compute('key', lambda: 'recovered'), 'recovered')
+
+    def test_redis_outage_still_computes(self):
+        cache = AnalysisCache(redis_factory=MagicMock(side_effect=ConnectionError('redis down')))
+
+        self.assertEqual(cache.get_or_compute('key', lambda: 'analysis'), 'analysis')
+        self.assertEqual(cache.get_or_compute('key', lambda: 'other'), 'analysis')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+import time
+import unittest
+from unittest.mock import patch
+import fakeredis
+from openai import OpenAI, BadRequestError
+from services import analyze_text_service
+from services.analyze_text_service import analyze_text, count_tokens, split_transcript
+from services.analysis_cache import AnalysisCache
+from services.embedding_cache import EmbeddingCache
+from services.progress_service import AnalysisProgress
+from tests.fakes import FakeOpenAIServer
+
+def make_transcript(lines, words_per_line=40):
+    return ''.join(f"{' '.join(f'word{i}' for i in range(words_per_line))}. Line {n} ends here.\n" for n in range(lines))
+
+class TestSplitTranscript(unittest.TestCase):
+
+    def test_sections_fit_and_cover_the_transcript(self):
+        transcript = make_transcript(50)
+
+        sections = split_transcript(transcript, max_tokens=200)
+
+        self.assertGreater(len(sections), 1)
+        self.assertEqual(''.join(sections), transcript)
+        self.assertTrue(all(count_tokens(section) <= 200 for section in sections))
+        # Breaks fall on line ends when lines fit
+        self.assertTrue(all(section.endswith('\n') for section in sections))
+
+    def test_long_lines_are_broken_at_sentences_then_words(self):
+        transcript = 'First sentence is short. ' + ' '.join(['word'] * 500) + '. Last one.'
+
+        sections = split_transcript(transcript, max_tokens=50)
+
+        self.assertEqual(''.join(sections), transcript)
+        self.assertTrue(all(count_tokens(section) <= 50 for section in sections))
+
+class TestAnalyzeText(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer(base_latency=0.05)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+        fake_client = OpenAI(api_key='test-key', base_url=self.server.base_url, max_retries=0)
+        fake_redis = fakeredis.FakeRedis()
+        patchers = [
+            patch.object(analyze_text_service, 'get_client', return_value=fake_client),
+            patch.object(analyze_text_service, 'analysis_cache', AnalysisCache(redis_factory=lambda: fake_redis)),
+            patch.object(analyze_text_service, 'ANALYSIS_SINGLE_CALL_TOKENS', 500),
+            patch.object(analyze_text_service, 'ANALYSIS_SECTION_TOKENS', 300),
+            patch.object(analyze_text_service, 'ANALYSIS_MAX_PARALLEL', 3),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_short_transcript_uses_a_single_call(self):
+        result = analyze_text('A short transcript.\n', 'summarize')
+
+        self.assertEqual(result, 'Summary of 11 words')
+        self.assertEqual(self.server.prompts, ['write a detailed summary of the following text: A short transcript.\n'])
+
+    def test_long_transcript_is_mapped_in_parallel_then_reduced(self):
+        transcript = make_transcript(40)
+        sections = split_transcript(transcript, max_tokens=300)
+
+        result = analyze_text(transcript, 'List the main topics')
+
+        self.assertEqual(len(self.server.prompts), len(sections) + 1)
+        self.assertEqual(self.server.max_in_flight, 3)
+        map_prompts, reduce_prompt = self.server.prompts[:-1], self.server.prompts[-1]
+        self.assertTrue(all('List the main topics' in prompt for prompt in map_prompts))
+        self.assertTrue(reduce_prompt.startswith('List the main topics: '))
+        self.assertEqual(reduce_prompt.count('Summary of'), len(sections))
+        self.assertEqual(result, f'Summary of {len(reduce_prompt.split())} words')
+
+    def test_repeated_analysis_is_served_from_cache(self):
+        first = analyze_text('A short transcript.\n', 'summarize')
+        second = analyze_text('A short transcript.\n', '  Summarize ')
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.server.prompts), 1)
+
+    def test_api_errors_propagate(self):
+        self.server.context_tokens = 10
+
+        with self.assertRaises(BadRequestError):
+            analyze_text('A transcript that is longer than the fake context window allows.\n', 'summarize')
+
+class TestStreamingAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        # 50 ms to the first token, then a second of generation
+        self.server = FakeOpenAIServer(base_latency=0.05, per_output_token=0.02, output_tokens=50)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+        fake_client = OpenAI(api_key='test-key', base_url=self.server.base_url, max_retries=0)
+        fake_redis = fakeredis.FakeRedis()
+        patchers = [
+            patch.object(analyze_text_service, 'get_client', return_value=fake_client),
+            patch.object(analyze_text_service, 'analysis_cache', AnalysisCache(redis_factory=lambda: fake_redis)),
+            patch.object(analyze_text_service, 'ANALYSIS_SINGLE_CALL_TOKENS', 500),
+            patch.object(analyze_text_service, 'ANALYSIS_SECTION_TOKENS', 300),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.published = []
+        self.progress = AnalysisProgress(lambda meta: self.published.append((time.perf_counter(), meta)), min_interval=0.1)
+
+    def test_first_token_reaches_progress_before_the_answer_is_done(self):
+        started = time.perf_counter()
+        result = analyze_text('A short transcript.\n', 'summarize', self.progress)
+        finished = time.perf_counter()
+        self.progress.flush()
+
+        time_to_first_token = self.published[0][0] - started
+        self.assertLess(time_to_first_token, 0.5)
+        self.assertGreater(finished - started, 1.0)
+        self.assertEqual(self.published[0][1]['partial_analysis'], 'Summary ')
+        self.assertEqual(self.published[-1][1]['partial_analysis'], result)
+        self.assertEqual(result, 'Summary of 11 words')
+
+    def test_only_the_final_answer_of_map_reduce_is_streamed(self):
+        self.server.per_output_token = 0.002
+        result = analyze_text(make_transcript(20), 'List the main topics', self.progress)
+        self.progress.flush()
+
+        self.assertGreater(len(self.server.prompts), 2)
+        self.assertEqual(self.published[-1][1]['partial_analysis'], result)
+        self.assertTrue(all(result.startswith(meta['partial_analysis']) for _, meta in self.published))
+
+    def test_streaming_can_be_turned_off(self):
+        with patch.object(analyze_text_service, 'ANALYSIS_STREAMING', False):
+            result = analyze_text('A short transcript.\n', 'summarize', self.progress)
+
+        self.assertEqual(result, 'Summary of 11 words')
+        self.assertEqual(self.published, [])
+
+TOPICS = ['weather forecast rain clouds', 'football match goals score', 'cooking pasta sauce recipe', 'stock market shares prices']
+
+def make_topical_transcript(lines_per_topic=6):
+    """Lines about a few unrelated topics, with the rocket launch mentioned once in the middle."""
+    lines = [f"Today we talk about {topic} and more {topic}.\n" for topic in TOPICS for _ in range(lines_per_topic)]
+    lines.insert(len(lines) // 2, "The rocket launch is scheduled for March from the rocket launch site.\n")
+    return ''.join(lines)
+
+class TestRetrieval(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer()
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+        fake_client = OpenAI(api_key='test-key', base_url=self.server.base_url, max_retries=0)
+        fake_redis = fakeredis.FakeRedis()
+        self.embedding_cache = EmbeddingCache(redis_factory=lambda: fake_redis)
+        patchers = [
+            patch.object(analyze_text_service, 'get_client', return_value=fake_client),
+            patch.object(analyze_text_service, 'analysis_cache', AnalysisCache(redis_factory=lambda: fake_redis)),
+            patch.object(analyze_text_service, 'embedding_cache', self.embedding_cache),
+            patch.object(analyze_text_service, 'ANALYSIS_SINGLE_CALL_TOKENS', 1000),
+            patch.object(analyze_text_service, 'RETRIEVAL_MIN_TOKENS', 100),
+            patch.object(analyze_text_service, 'RETRIEVAL_SPAN_TOKENS', 30),
+            patch.object(analyze_text_service, 'RETRIEVAL_TOP_K', 2),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.transcript = make_topical_transcript()
+
+    def test_questions_are_answered_from_the_most_relevant_spans(self):
+        analyze_text(self.transcript, 'When is the rocket launch?')
+
+        self.assertEqual(len(self.server.prompts), 1)
+        prompt = self.server.prompts[0]
+        self.assertTrue(prompt.startswith('When is the rocket launch?: '))
+        self.assertIn('The rocket launch is scheduled for March', prompt)
+        self.assertLess(count_tokens(prompt), count_tokens(self.transcript) / 2)
+
+    def test_repeat_prompts_only_embed_the_prompt(self):
+        analyze_text(self.transcript, 'When is the rocket launch?')
+        embedded = len(self.server.embedded_inputs)
+        analyze_text(self.transcript, 'Where is the rocket launch site?')
+        # Another worker process only has the spans in Redis
+        self.embedding_cache.clear()
+        analyze_text(self.transcript, 'Who scored the football goals?')
+
+        self.assertEqual(len(self.server.embedded_inputs), embedded + 2)
+        self.assertIn('football match goals', self.server.prompts[-1])
+
+    def test_summaries_and_instructions_get_the_whole_transcript(self):
+        analyze_text(self.transcript, 'summarize')
+        analyze_text(self.transcript, 'List the main topics')
+
+        self.assertEqual(self.server.embedded_inputs, [])
+        self.assertTrue(all(self.transcript in prompt for prompt in self.server.prompts))
+
+    def test_answers_are_cached_apart_by_retrieval_mode_and_settings(self):
+        question = 'When is the rocket launch?'
+        analyze_text(self.transcript, question)
+        with patch.object(analyze_text_service, 'ANALYSIS_RETRIEVAL', 'off'):
+            analyze_text(self.transcript, question)
+        with patch.object(analyze_text_service, 'RETRIEVAL_TOP_K', 3):
+            analyze_text(self.transcript, question)
+        analyze_text(self.transcript, question)
+
+        self.assertEqual(len(self.server.prompts), 3)
+        self.assertEqual(self.server.prompts[1], f'{question}: {self.transcript}')
+
+    def test_embedding_errors_fall_back_to_the_whole_transcript(self):
+        with patch.object(analyze_text_service, 'embed', side_effect=RuntimeError('unavailable')):
+            analyze_text(self.transcript, 'When is the rocket launch?')
+
+        self.assertEqual(self.server.prompts, [f'When is the rocket launch?: {self.transcript}'])
+
+    def test_fallback_answers_are_not_served_once_retrieval_recovers(self):
+        question = 'When is the rocket launch?'
+        with patch.object(analyze_text_service, 'embed', side_effect=RuntimeError('unavailable')):
+            analyze_text(self.transcript, question)
+        analyze_text(self.transcript, question)
+        # The fallback is cached for whole-transcript requests
+        with patch.object(analyze_text_service, 'ANALYSIS_RETRIEVAL', 'off'):
+            analyze_text(self.transcript, question)
+
+        self.assertEqual(len(self.server.prompts), 2)
+        self.assertEqual(self.server.prompts[0], f'{question}: {self.transcript}')
+        self.assertIn('The rocket launch is scheduled for March', self.server.prompts[1])
+        self.assertLess(count_tokens(self.server.prompts[1]), count_tokens(self.transcript) / 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,16 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 import logging
-import yt_dlp
+import json
+import fakeredis
+from functools import partial
 from main import create_app, db, register_routes
+from db.models import Usage
+from services.video_metadata_service import VideoMetadataError
+from services.task_events import TaskEventHub, publish_task_event
+from services.transcript_store import store_segments
+from services.transcript_search import index_transcript
+from utils.metrics_exporter import render_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -67,12 +75,15 @@ class TestApiRoutes(unittest.TestCase):
         """Helper method to generate headers with JWT token."""
         return {'Authorization': f'Bearer {self.access_token}'}
 
+    @patch('main.get_video_metadata')
     @patch('tasks.download_and_process.apply_async')
-    def test_process_video_success(self, mock_apply_async):
+    def test_process_video_success(self, mock_apply_async, mock_get_metadata):
         """Test /process route with valid data and authentication."""
         mock_task = MagicMock()
         mock_task.id = "test_task_id"
         mock_apply_async.return_value = mock_task
+        metadata = {'id': 'dQw4w9WgXcQ', 'duration': 212, 'formats': []}
+        mock_get_metadata.return_value = metadata
 
         # Simulate POST request to /process with JWT headers
         response = self.client.post('/process', json={
@@ -84,10 +95,21 @@ class TestApiRoutes(unittest.TestCase):
 
         # Assert response code and JSON content
         self.assertEqual(response.status_code, 202)
-        self.assertEqual(response.json, {'task_id': 'test_task_id'})
+        self.assertEqual(response.json, {'task_id': 'test_task_id', 'video_id': 'dQw4w9WgXcQ'})
 
-        # Ensure the task is called with correct arguments
-        mock_apply_async.assert_called_once_with(args=['https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'Summarize the video', 1])  # Assuming the test user has ID 1
+        # Ensure the task is called with correct arguments and the extracted metadata
+        mock_apply_async.assert_called_once_with(
+            args=['https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'Summarize the video', 1],  # Assuming the test user has ID 1
+            kwargs={'metadata': metadata},
+            task_id=ANY,
+        )
+
+        # The job's minutes are reserved under its task ID until it settles them
+        with self.app.app_context():
+            usage = Usage.query.filter_by(task_id=mock_apply_async.call_args.kwargs['task_id']).one()
+            self.assertEqual((usage.user_id, usage.minutes, usage.status), (1, 3, 'reserved'))
+            db.session.delete(usage)
+            db.session.commit()
 
     def test_process_video_missing_data(self):
         """Test /process route with missing data and authentication."""
@@ -156,6 +178,61 @@ class TestApiRoutes(unittest.TestCase):
             'status': 'Task failed'
         })
 
+    @patch('tasks.download_and_process.AsyncResult')
+    def test_task_status_partial_transcript(self, mock_async_result):
+        """Test /status/<task_id> route while chunks are still being transcribed."""
+        mock_task = MagicMock()
+        mock_task.state = 'PROGRESS'
+        mock_task.info = {
+            'status': 'Transcribing audio',
+            'partial_transcript': 'First chunk\n',
+            'chunks_completed': 2,
+            'chunks_total': 5,
+        }
+        mock_async_result.return_value = mock_task
+
+        response = self.client.get('/status/test_task_id', headers=self.get_headers())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, {
+            'state': 'PROGRESS',
+            'result': '',
+            'status': 'Transcribing audio',
+            'partial_transcript': 'First chunk\n',
+            'chunks_completed': 2,
+            'chunks_total': 5,
+        })
+
+    @patch('tasks.download_and_process.AsyncResult')
+    def test_task_status_stream(self, mock_async_result):
+        """Test /status/<task_id>/stream pushes published events until the task finishes."""
+        fake_redis = fakeredis.FakeRedis()
+        hub = TaskEventHub(redis_factory=lambda: fake_redis, poll_timeout=0.05)
+        mock_task = MagicMock()
+        mock_task.state = 'PROGRESS'
+        mock_task.info = {'status': 'Downloading video'}
+        mock_async_result.return_value = mock_task
+
+        with patch('main.task_event_hub', hub), patch('services.task_events.get_redis', return_value=fake_redis):
+            # EventSource clients pass the token in the query string
+            response = self.client.get(f'/status/test_task_id/stream?jwt={self.access_token}', buffered=False)
+            publish_task_event('test_task_id', 'PROGRESS', {'status': 'Analyzing transcript'})
+            publish_task_event('test_task_id', 'SUCCESS', {'status': 'Completed', 'result': {'analysis': 'Done'}})
+            body = b''.join(response.response).decode()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        events = [json.loads(line[len('data: '):]) for line in body.split('\n\n') if line.startswith('data: ')]
+        self.assertEqual([event['status'] for event in events], ['Downloading video', 'Analyzing transcript', 'Completed'])
+        self.assertEqual(events[-1]['result'], {'analysis': 'Done'})
+        mock_async_result.assert_called_once_with('test_task_id')
+        self.assertEqual(hub.watcher_count(), 0)
+
+    def test_task_status_stream_no_auth(self):
+        """Test /status/<task_id>/stream without a token."""
+        response = self.client.get('/status/test_task_id/stream')
+        self.assertEqual(response.status_code, 401)
+
     def test_process_video_no_auth(self):
         """Test /process route without authentication."""
         response = self.client.post('/process', json={
@@ -166,16 +243,29 @@ class TestApiRoutes(unittest.TestCase):
         # Assert response code for missing authentication
         self.assertEqual(response.status_code, 401)
     
-    @patch('yt_dlp.YoutubeDL')
-    def test_process_video_too_long(self, mock_yt_dlp):
+    @patch('main.get_video_metadata')
+    @patch('tasks.download_and_process.apply_async')
+    def test_process_video_needs_enough_minutes_left(self, mock_apply_async, mock_get_metadata):
+        """Test /process route with a video longer than the user's 10 minutes left."""
+        mock_get_metadata.return_value = {'id': 'dQw4w9WgXcQ', 'duration': 1200}
+
+        response = self.client.post('/process', json={
+            'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+            'prompt': 'Summarize the video'
+        }, headers=self.get_headers())
+
+        self.assertEqual(response.status_code, 403)
+        mock_apply_async.assert_not_called()
+        with self.app.app_context():
+            self.assertEqual(Usage.query.count(), 0)
+
+    @patch('main.get_video_metadata')
+    def test_process_video_too_long(self, mock_get_metadata):
         """Test /process route with a video that exceeds the duration limit."""
-        
-        # Mock the YoutubeDL instance
-        mock_ydl_instance = MagicMock()
-        mock_ydl_instance.extract_info.return_value = {
+        mock_get_metadata.return_value = {
+            'id': 'dQw4w9WgXcQ',
             'duration': 2000  # 33 minutes, exceeding the allowed limit of 30 minutes
         }
-        mock_yt_dlp.return_value.__enter__.return_value = mock_ydl_instance
 
         # Simulate POST request to /process with JWT headers
         response = self.client.post('/process', json={
@@ -187,14 +277,10 @@ class TestApiRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json, {'error': 'Video is too long. Maximum allowed length is 30 minutes.'})
 
-    @patch('yt_dlp.YoutubeDL')
-    def test_process_video_invalid_url(self, mock_yt_dlp):
+    @patch('main.get_video_metadata')
+    def test_process_video_invalid_url(self, mock_get_metadata):
         """Test /process route with an invalid or non-retrievable video URL."""
-        
-        # Mock the YoutubeDL instance to raise a DownloadError
-        mock_ydl_instance = MagicMock()
-        mock_ydl_instance.extract_info.side_effect = yt_dlp.utils.DownloadError("Unable to retrieve video information")
-        mock_yt_dlp.return_value.__enter__.return_value = mock_ydl_instance
+        mock_get_metadata.side_effect = VideoMetadataError("Unable to retrieve video information")
 
         # Simulate POST request to /process with JWT headers
         response = self.client.post('/process', json={
@@ -206,5 +292,71 @@ class TestApiRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.json, {'error': 'Unable to retrieve video information. Please check the URL.'})
 
+    def test_transcript_segments_are_paged_by_time_range(self):
+        """Test /transcripts/<video_id> with a time range, one page at a time."""
+        with self.app.app_context():
+            store_segments('dQw4w9WgXcQ', [
+                {'index': index, 'start': index * 30, 'end': index * 30 + 30, 'text': f'chunk {index}\n', 'confidence': 0.9,
+                 'words': [{'word': 'chunk', 'start': index * 30 + 1, 'end': index * 30 + 1.5}]}
+                for index in range(10)
+            ])
+
+        response = self.client.get('/transcripts/dQw4w9WgXcQ?start=45&end=200&limit=3', headers=self.get_headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([segment['index'] for segment in response.json['segments']], [1, 2, 3])
+        self.assertEqual(response.json['segments'][0], {
+            'index': 1, 'start': 30, 'end': 60, 'text': 'chunk 1\n', 'confidence': 0.9,
+            'words': [{'word': 'chunk', 'start': 31, 'end': 31.5}],
+        })
+
+        cursor = response.json['next_cursor']
+        response = self.client.get(f'/transcripts/dQw4w9WgXcQ?start=45&end=200&limit=3&cursor={cursor}', headers=self.get_headers())
+        self.assertEqual([segment['index'] for segment in response.json['segments']], [4, 5, 6])
+        self.assertIsNone(response.json['next_cursor'])
+
+    def test_transcript_not_found(self):
+        """Test /transcripts/<video_id> for a video that was never transcribed."""
+        response = self.client.get('/transcripts/neverseen01', headers=self.get_headers())
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_search_returns_videos_with_timestamped_snippets(self):
+        with self.app.app_context():
+            store_segments('dQw4w9WgXcQ', [
+                {'index': 0, 'start': 0, 'end': 30, 'text': 'We are no strangers to love\n'},
+                {'index': 1, 'start': 30, 'end': 60, 'text': 'A full commitment is what I am thinking of\n'},
+            ])
+            store_segments('otherVideo1', [{'index': 0, 'start': 0, 'end': 30, 'text': 'Cooking pasta tonight\n'}])
+            index_transcript('dQw4w9WgXcQ')
+            index_transcript('otherVideo1')
+
+        response = self.client.get('/search?q=commitments', headers=self.get_headers())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['results'], [{'video_id': 'dQw4w9WgXcQ', 'snippets': [
+            {'index': 1, 'start': 30, 'end': 60, 'snippet': 'A full [commitment] is what I am thinking of\n'},
+        ]}])
+
+    def test_metrics_are_exposed_for_prometheus(self):
+        fake_redis = fakeredis.FakeRedis()
+        fake_redis.set('metrics:process:worker@host:2', json.dumps([{
+            'name': 'pipeline_stage_seconds', 'kind': 'histogram', 'description': '',
+            'samples': [[{'stage': 'download'}, {'buckets': [[1, 0], [10, 1]], 'sum': 4.2, 'count': 1}]],
+        }]))
+
+        with patch('main.render_metrics', partial(render_metrics, redis_factory=lambda: fake_redis)):
+            response = self.client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        text = response.get_data(as_text=True)
+        self.assertIn('# TYPE pipeline_stage_seconds histogram', text)
+        self.assertIn('pipeline_stage_seconds_count{process="worker@host:2",stage="download"} 1', text)
+
+    def test_search_requires_a_query(self):
+        response = self.client.get('/search?q=%20', headers=self.get_headers())
+
+        self.assertEqual(response.status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
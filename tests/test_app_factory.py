@@ -0,0 +1,24 @@
+import os
+import unittest
+from unittest.mock import patch
+from sqlalchemy import inspect
+from utils.get_env_variables import clear_secrets_cache
+from app_factory import create_base_app
+from db.models import db
+
+class TestInitDb(unittest.TestCase):
+
+    @patch.dict(os.environ, {'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    def test_init_db_command_creates_tables(self):
+        clear_secrets_cache()
+        self.addCleanup(clear_secrets_cache)
+
+        app = create_base_app(__name__)
+        result = app.test_cli_runner().invoke(args=['init-db'])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        with app.app_context():
+            self.assertIn('usage', inspect(db.engine).get_table_names())
+
+if __name__ == '__main__':
+    unittest.main()
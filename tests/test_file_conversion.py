@@ -1,6 +1,10 @@
+import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open
 from services.google_transcription_service import convert_mp3_to_wav
+from services.audio_service import split_audio_into_chunks
 
 class TestFileConversion(unittest.TestCase):
 
@@ -16,3 +20,40 @@ class TestFileConversion(unittest.TestCase):
     def test_convert_mp3_to_wav_file_not_found(self, mock_isfile):
         with self.assertRaises(FileNotFoundError):
             convert_mp3_to_wav("non_existent.mp3")
+
+class TestSplitAudioIntoChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.audio_file = os.path.join(self.tmp_dir, 'video.mp3')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @patch('ffmpeg.output')
+    def test_split_runs_one_ffmpeg_pass(self, mock_ffmpeg_output):
+        def write_segments(*args, **kwargs):
+            for i in range(12):
+                open(os.path.join(self.tmp_dir, f'video_chunk{i}.wav'), 'wb').close()
+        mock_ffmpeg_output.return_value.run.side_effect = write_segments
+
+        chunks = split_audio_into_chunks(self.audio_file, 30)
+
+        mock_ffmpeg_output.assert_called_once()
+        _, output_pattern = mock_ffmpeg_output.call_args[0]
+        self.assertEqual(output_pattern, os.path.join(self.tmp_dir, 'video_chunk%d.wav'))
+        self.assertEqual(mock_ffmpeg_output.call_args[1]['f'], 'segment')
+        self.assertEqual(mock_ffmpeg_output.call_args[1]['segment_time'], 30)
+        self.assertEqual(chunks, [os.path.join(self.tmp_dir, f'video_chunk{i}.wav') for i in range(12)])
+
+    @patch('ffmpeg.output')
+    def test_split_removes_stale_chunks(self, mock_ffmpeg_output):
+        open(os.path.join(self.tmp_dir, 'video_chunk5.wav'), 'wb').close()
+
+        def write_segments(*args, **kwargs):
+            open(os.path.join(self.tmp_dir, 'video_chunk0.wav'), 'wb').close()
+        mock_ffmpeg_output.return_value.run.side_effect = write_segments
+
+        chunks = split_audio_into_chunks(self.audio_file, 30)
+
+        self.assertEqual(chunks, [os.path.join(self.tmp_dir, 'video_chunk0.wav')])
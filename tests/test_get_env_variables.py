@@ -0,0 +1,135 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from cryptography.fernet import Fernet
+from utils.get_env_variables import SECRET_NAMES, SECRETS_BACKENDS, load_secrets, clear_secrets_cache
+
+def fake_backend(names):
+    return {name: f'{name}-value' for name in names}
+
+class TestLoadSecrets(unittest.TestCase):
+
+    def setUp(self):
+        clear_secrets_cache()
+        self.addCleanup(clear_secrets_cache)
+
+    @patch.dict(os.environ, {'FLASK_ENV': 'production'})
+    @patch('utils.get_env_variables.get_secret')
+    def test_production_secrets_are_fetched_concurrently_once(self, mock_get_secret):
+        def get_secret(name):
+            time.sleep(0.2)
+            return f'{name}-value'
+        mock_get_secret.side_effect = get_secret
+
+        started = time.perf_counter()
+        secrets = load_secrets()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(secrets['OPEN_AI_API_KEY'], 'OPEN_AI_API_KEY-value')
+        self.assertLess(elapsed, 0.2 * len(SECRET_NAMES) / 2)
+        self.assertIs(load_secrets(), secrets)
+        self.assertEqual(mock_get_secret.call_count, len(SECRET_NAMES))
+
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'local-key', 'FRONTEND_URL': 'http://app.test'})
+    def test_local_backend_reads_environment_with_defaults(self):
+        secrets = load_secrets('local')
+
+        self.assertEqual(secrets['OPEN_AI_API_KEY'], 'local-key')
+        self.assertEqual(secrets['FRONTEND_URL'], 'http://app.test')
+        self.assertEqual(secrets['CELERY_BROKER_URL'], os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+        self.assertIs(secrets['SQLALCHEMY_TRACK_MODIFICATIONS'], False)
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            load_secrets('vault')
+
+    @patch('utils.get_env_variables.SECRETS_TTL', 60)
+    @patch('utils.get_env_variables.time')
+    def test_secrets_are_refreshed_after_ttl(self, mock_time):
+        mock_time.time.return_value = 1000
+        backend = MagicMock(side_effect=fake_backend)
+
+        with patch.dict(SECRETS_BACKENDS, {'fake': backend}):
+            load_secrets('fake')
+            mock_time.time.return_value = 1059
+            load_secrets('fake')
+            self.assertEqual(backend.call_count, 1)
+
+            mock_time.time.return_value = 1060
+            load_secrets('fake')
+            self.assertEqual(backend.call_count, 2)
+
+    @patch('utils.get_env_variables.SECRETS_TTL', 60)
+    @patch('utils.get_env_variables.time')
+    def test_failed_refresh_keeps_previous_secrets(self, mock_time):
+        mock_time.time.return_value = 1000
+        backend = MagicMock(side_effect=fake_backend)
+
+        with patch.dict(SECRETS_BACKENDS, {'fake': backend}):
+            secrets = load_secrets('fake')
+            backend.side_effect = RuntimeError('unavailable')
+            mock_time.time.return_value = 2000
+
+            self.assertEqual(load_secrets('fake'), secrets)
+            # The next attempt waits for another TTL
+            load_secrets('fake')
+            self.assertEqual(backend.call_count, 2)
+
+class TestSecretsDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        clear_secrets_cache()
+        self.addCleanup(clear_secrets_cache)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'secrets.cache')
+        self.key = Fernet.generate_key().decode()
+
+        self.backend = MagicMock(side_effect=fake_backend)
+        for patcher in (
+            patch.dict(SECRETS_BACKENDS, {'fake': self.backend}),
+            patch('utils.get_env_variables.SECRETS_CACHE_PATH', self.path),
+            patch('utils.get_env_variables.SECRETS_CACHE_KEY', self.key),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_new_process_reads_encrypted_cache_instead_of_backend(self):
+        secrets = load_secrets('fake')
+        clear_secrets_cache()
+
+        self.assertEqual(load_secrets('fake'), secrets)
+        self.assertEqual(self.backend.call_count, 1)
+        with open(self.path, 'rb') as f:
+            self.assertNotIn(b'JWT_SECRET_KEY-value', f.read())
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_cache_is_ignored_with_another_key(self):
+        load_secrets('fake')
+        clear_secrets_cache()
+
+        with patch('utils.get_env_variables.SECRETS_CACHE_KEY', Fernet.generate_key().decode()):
+            load_secrets('fake')
+
+        self.assertEqual(self.backend.call_count, 2)
+
+    def test_cache_is_ignored_after_ttl(self):
+        load_secrets('fake')
+        clear_secrets_cache()
+
+        with patch('utils.get_env_variables.SECRETS_TTL', 60), patch('cryptography.fernet.time.time', return_value=time.time() + 61):
+            load_secrets('fake')
+
+        self.assertEqual(self.backend.call_count, 2)
+
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'local-key'})
+    def test_local_backend_is_never_written_to_disk(self):
+        load_secrets('local')
+
+        self.assertFalse(os.path.exists(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock
+import fakeredis
+from services.job_coalescing import RedisLease, TranscriptionCoalescer
+
+RESULT = {'transcript': 'Shared transcript\n', 'duration': 120.0, 'audio_seconds_saved': 0}
+
+class TestTranscriptionCoalescer(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+
+    def make_coalescer(self, **kwargs):
+        return TranscriptionCoalescer(redis_factory=lambda: self.redis, poll_interval=0.01, **kwargs)
+
+    def run_concurrently(self, coalescers, transcribe, on_wait=None):
+        results = []
+        threads = [threading.Thread(target=lambda c=c: results.append(c.run('video', transcribe, on_wait))) for c in coalescers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_jobs_share_one_transcription(self):
+        calls = []
+        waits = []
+
+        def transcribe():
+            calls.append(1)
+            time.sleep(0.2)
+            return RESULT
+
+        # One coalescer per job, as on separate workers
+        results = self.run_concurrently([self.make_coalescer() for _ in range(5)], transcribe, lambda: waits.append(1))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(owner for _, owner in results), [False, False, False, False, True])
+        self.assertTrue(all(result == RESULT for result, _ in results))
+        self.assertEqual(len(waits), 4)
+        self.assertFalse(self.redis.exists('transcription-lock:video'))
+
+    def test_later_job_reuses_stored_result(self):
+        self.make_coalescer().run('video', lambda: RESULT)
+        transcribe = MagicMock()
+
+        result, owner = self.make_coalescer().run('video', transcribe)
+
+        self.assertEqual(result, RESULT)
+        self.assertFalse(owner)
+        transcribe.assert_not_called()
+
+    def test_waiting_job_takes_over_from_crashed_owner(self):
+        # A worker that died mid-transcription leaves its lock to expire
+        self.redis.set('transcription-lock:video', 'crashed-worker', px=200)
+        transcribe = MagicMock(return_value=RESULT)
+
+        start = time.monotonic()
+        result, owner = self.make_coalescer().run('video', transcribe)
+
+        self.assertTrue(owner)
+        self.assertEqual(result, RESULT)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        transcribe.assert_called_once()
+
+    def test_waiting_job_takes_over_from_failed_owner(self):
+        attempts = []
+
+        def transcribe():
+            attempts.append(1)
+            time.sleep(0.1)
+            if len(attempts) == 1:
+                raise RuntimeError('download failed')
+            return RESULT
+
+        results = []
+        def job():
+            try:
+                results.append(self.make_coalescer().run('video', transcribe))
+            except RuntimeError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=job) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(sum(isinstance(result, RuntimeError) for result in results), 1)
+        self.assertIn((RESULT, True), results)
+
+    def test_lease_is_renewed_while_owner_works(self):
+        lease = RedisLease(self.redis, 'transcription-lock:video', ttl=1)
+        self.assertTrue(lease.acquire())
+
+        time.sleep(1.5)
+
+        self.assertFalse(RedisLease(self.redis, 'transcription-lock:video', ttl=1).acquire())
+        lease.release()
+        self.assertFalse(self.redis.exists('transcription-lock:video'))
+
+    def test_redis_outage_transcribes_without_coalescing(self):
+        coalescer = TranscriptionCoalescer(redis_factory=MagicMock(side_effect=ConnectionError('redis down')))
+
+        self.assertEqual(coalescer.run('video', lambda: RESULT), (RESULT, True))
+
+    def test_owner_spanning_tasks_shares_result_and_releases(self):
+        coalescer = self.make_coalescer()
+        token = coalescer.try_acquire('video')
+
+        self.assertTrue(token)
+        self.assertIsNone(coalescer.try_acquire('video'))
+        coalescer.renew('video', token)
+        coalescer.store_result('video', token, RESULT)
+
+        self.assertEqual(coalescer.get_result('video'), RESULT)
+        self.assertFalse(self.redis.exists('transcription-lock:video'))
+
+    def test_keep_alive_renews_owner_lock_during_a_long_stage(self):
+        coalescer = self.make_coalescer(lock_ttl=1)
+        token = coalescer.try_acquire('video')
+
+        with coalescer.keep_alive('video', token):
+            time.sleep(1.5)
+            self.assertIsNone(coalescer.try_acquire('video'))
+
+        # Still held for the next stage, which renews or releases it
+        self.assertEqual(self.redis.get('transcription-lock:video'), token.encode())
+        coalescer.release('video', token)
+        self.assertFalse(self.redis.exists('transcription-lock:video'))
+
+    def test_try_acquire_with_longer_ttl_for_pipelines(self):
+        coalescer = self.make_coalescer(lock_ttl=1)
+
+        coalescer.try_acquire('video', ttl=900)
+
+        self.assertGreater(self.redis.ttl('transcription-lock:video'), 60)
+
+    def test_release_by_stale_owner_keeps_new_owners_lock(self):
+        coalescer = self.make_coalescer()
+        self.redis.set('transcription-lock:video', 'new-owner')
+
+        coalescer.release('video', 'old-owner')
+
+        self.assertEqual(self.redis.get('transcription-lock:video'), b'new-owner')
+
+    def test_try_acquire_without_redis_proceeds_alone(self):
+        coalescer = TranscriptionCoalescer(redis_factory=MagicMock(side_effect=ConnectionError('redis down')))
+
+        self.assertEqual(coalescer.try_acquire('video'), '')
+        self.assertIsNone(coalescer.get_result('video'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+from unittest.mock import patch, MagicMock
+import numpy as np
+from services import local_transcription_service
+from services.local_transcription_service import BatchedInferenceEngine, pcm_to_waveform
+from services.transcription_service import get_transcription_backend, transcription_settings
+from tests.fakes import FakeWhisperModel
+
+class TestBatchedInferenceEngine(unittest.TestCase):
+
+    def test_concurrent_jobs_share_batches(self):
+        model = FakeWhisperModel(call_overhead=0.01)
+        loader = MagicMock(return_value=model)
+        engine = BatchedInferenceEngine(model_loader=loader, max_batch_size=4, max_wait=0.2)
+
+        async def job(num_chunks):
+            return await asyncio.gather(*(
+                asyncio.wrap_future(engine.submit(np.zeros(16000, dtype=np.float32))) for _ in range(num_chunks)
+            ))
+
+        async def main():
+            return await asyncio.gather(job(3), job(3))
+
+        results = asyncio.run(main())
+
+        self.assertEqual(results, [['fake transcript 16000'] * 3] * 2)
+        self.assertEqual(sum(model.batch_sizes), 6)
+        self.assertEqual(model.batch_sizes[0], 4)
+        loader.assert_called_once_with()
+
+    def test_model_errors_fail_the_batch(self):
+        engine = BatchedInferenceEngine(model_loader=MagicMock(side_effect=ImportError('no model')), max_wait=0)
+
+        with self.assertRaises(ImportError):
+            engine.submit(np.zeros(10, dtype=np.float32)).result(timeout=5)
+
+    def test_pcm_to_waveform_scales_samples(self):
+        pcm = np.array([0, 16384, -32768], dtype=np.int16).tobytes()
+
+        np.testing.assert_allclose(pcm_to_waveform(pcm), [0.0, 0.5, -1.0])
+
+class TestTranscriptionBackends(unittest.TestCase):
+
+    def test_backend_selection(self):
+        self.assertIs(get_transcription_backend('local'), local_transcription_service)
+        with self.assertRaises(ValueError):
+            get_transcription_backend('unknown')
+
+    def test_settings_identify_backend(self):
+        google_settings = transcription_settings(30, backend='google')
+        local_settings = transcription_settings(30, backend='local')
+
+        self.assertEqual(google_settings['backend'], 'google')
+        self.assertEqual(local_settings['backend'], 'local')
+        self.assertNotEqual(google_settings, local_settings)
+
+    @patch('services.audio_service.VAD_ENABLED', False)
+    @patch('services.audio_service.read_pcm_chunks')
+    def test_local_transcribe_audio(self, mock_read_pcm_chunks):
+        mock_read_pcm_chunks.return_value = (chunk for chunk in [bytes(32000), bytes(16000)])
+        model = FakeWhisperModel()
+        engine = BatchedInferenceEngine(model_loader=lambda: model, max_wait=0.05)
+
+        with patch.object(local_transcription_service, 'engine', engine):
+            transcript, chunks = asyncio.run(local_transcription_service.transcribe_audio('file.mp3', 1))
+
+        self.assertEqual(transcript, 'fake transcript 16000\nfake transcript 8000\n')
+        self.assertEqual(chunks, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import json
+import unittest
+from unittest.mock import patch
+import fakeredis
+from utils.metrics import Registry, render_prometheus
+from utils.metrics_exporter import METRICS_PREFIX, push_metrics, collect_metrics, process_name
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets_are_cumulative(self):
+        histogram = Registry().histogram('stage_seconds', buckets=(0.1, 1, 10))
+        for value in (0.05, 0.5, 0.7, 20):
+            histogram.observe(value, stage='download')
+
+        [(labels, value)] = histogram.samples()
+
+        self.assertEqual(labels, {'stage': 'download'})
+        self.assertEqual(value['buckets'], [(0.1, 1), (1, 3), (10, 3)])
+        self.assertEqual(value['count'], 4)
+        self.assertAlmostEqual(value['sum'], 21.25)
+
+    def test_prometheus_text_labels_each_sample_with_its_process(self):
+        registry = Registry()
+        registry.histogram('stage_seconds', 'Time per stage', buckets=(1,)).observe(0.5, stage='download')
+        registry.counter('bytes_total', 'Bytes').inc(10, stage='say "hi"')
+
+        text = render_prometheus([('api@host:1', registry.export()), ('worker@host:2', registry.export())])
+
+        self.assertIn('# TYPE stage_seconds histogram\n', text)
+        self.assertIn('stage_seconds_bucket{le="1.0",process="api@host:1",stage="download"} 1\n', text)
+        self.assertIn('stage_seconds_bucket{le="+Inf",process="worker@host:2",stage="download"} 1\n', text)
+        self.assertIn('stage_seconds_sum{process="api@host:1",stage="download"} 0.5\n', text)
+        self.assertIn('bytes_total{process="worker@host:2",stage="say \\"hi\\""} 10\n', text)
+        # One family per metric, whatever the number of processes
+        self.assertEqual(text.count('# TYPE bytes_total'), 1)
+
+    def test_kind_conflicts_are_rejected(self):
+        registry = Registry()
+        registry.counter('jobs')
+
+        with self.assertRaises(ValueError):
+            registry.histogram('jobs')
+
+class TestMetricsExporter(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.redis_factory = lambda: self.redis
+
+    def test_pushed_processes_are_collected_once(self):
+        self.redis.set(METRICS_PREFIX + 'worker@host:2', json.dumps([
+            {'name': 'jobs_total', 'kind': 'counter', 'description': '', 'samples': [[{}, 3]]},
+        ]))
+        push_metrics('api', self.redis_factory)
+
+        processes = [process for process, _ in collect_metrics('api', self.redis_factory)]
+
+        self.assertEqual(processes, [process_name('api'), 'worker@host:2'])
+        self.assertGreater(self.redis.ttl(METRICS_PREFIX + process_name('api')), 0)
+
+    def test_redis_errors_still_return_this_process(self):
+        def broken():
+            raise ConnectionError('unavailable')
+
+        with patch('utils.metrics_exporter.logger'):
+            exports = collect_metrics('api', broken)
+
+        self.assertEqual([process for process, _ in exports], [process_name('api')])
+
+if __name__ == '__main__':
+    unittest.main()
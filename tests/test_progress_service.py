@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import MagicMock
+import fakeredis
+from services.progress_service import TranscriptProgress, SharedTranscriptProgress, AnalysisProgress
+
+class TestTranscriptProgress(unittest.TestCase):
+
+    def test_publishes_contiguous_prefix(self):
+        publish = MagicMock()
+        progress = TranscriptProgress(publish, min_interval=0)
+
+        progress.set_total(3)
+        progress.chunk_done(1, 'second\n')
+        self.assertEqual(publish.call_args[0][0]['partial_transcript'], '')
+
+        progress.chunk_done(0, 'first\n')
+        progress.chunk_done(2, 'third\n')
+
+        self.assertEqual(publish.call_args[0][0], {
+            'status': 'Transcribing audio',
+            'partial_transcript': 'first\nsecond\nthird\n',
+            'chunks_completed': 3,
+            'chunks_total': 3,
+        })
+
+    def test_publishes_are_coalesced(self):
+        publish = MagicMock()
+        progress = TranscriptProgress(publish, min_interval=60)
+
+        progress.set_total(10)
+        for index in range(10):
+            progress.chunk_done(index, f'chunk {index}\n')
+
+        publish.assert_called_once()
+
+        progress.flush()
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(publish.call_args[0][0]['chunks_completed'], 10)
+
+        progress.flush()
+        self.assertEqual(publish.call_count, 2)
+
+    def test_publish_errors_do_not_propagate(self):
+        progress = TranscriptProgress(MagicMock(side_effect=ConnectionError('redis down')), min_interval=0)
+
+        progress.chunk_done(0, 'text\n')
+
+        self.assertEqual(progress.meta()['partial_transcript'], 'text\n')
+
+class TestAnalysisProgress(unittest.TestCase):
+
+    def test_first_delta_is_published_at_once_then_batched(self):
+        publish = MagicMock()
+        progress = AnalysisProgress(publish, min_interval=60)
+
+        for word in ['The ', 'video ', 'covers ', 'three ', 'topics.']:
+            progress.add(word)
+
+        publish.assert_called_once_with({'status': 'Analyzing transcript', 'partial_analysis': 'The '})
+
+        progress.flush()
+        self.assertEqual(publish.call_args[0][0]['partial_analysis'], 'The video covers three topics.')
+        progress.flush()
+        self.assertEqual(publish.call_count, 2)
+
+class TestSharedTranscriptProgress(unittest.TestCase):
+
+    def test_chunk_tasks_publish_contiguous_prefix_for_whole_job(self):
+        redis = fakeredis.FakeRedis()
+        publish = MagicMock()
+
+        # Each chunk task creates its own instance, as tasks on different workers would
+        SharedTranscriptProgress('job-1', 3, publish, redis_factory=lambda: redis, min_interval=0).chunk_done(1, 'second\n')
+        self.assertEqual(publish.call_args[0][0]['partial_transcript'], '')
+        SharedTranscriptProgress('job-1', 3, publish, redis_factory=lambda: redis, min_interval=0).chunk_done(0, 'first\n')
+
+        self.assertEqual(publish.call_args[0][0], {
+            'status': 'Transcribing audio',
+            'partial_transcript': 'first\nsecond\n',
+            'chunks_completed': 2,
+            'chunks_total': 3,
+        })
+        SharedTranscriptProgress('job-1', 3, None, redis_factory=lambda: redis).clear()
+        self.assertEqual(redis.keys('transcript-progress:*'), [])
+
+    def test_publishes_are_throttled_across_tasks_but_last_chunk_always_publishes(self):
+        redis = fakeredis.FakeRedis()
+        publish = MagicMock()
+
+        for index in range(4):
+            SharedTranscriptProgress('job-1', 5, publish, redis_factory=lambda: redis, min_interval=60).chunk_done(index, f'chunk {index}\n')
+        publish.assert_called_once()
+
+        SharedTranscriptProgress('job-1', 5, publish, redis_factory=lambda: redis, min_interval=60).chunk_done(4, 'chunk 4\n')
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(publish.call_args[0][0]['chunks_completed'], 5)
+
+        SharedTranscriptProgress('job-1', 5, None, redis_factory=lambda: redis).clear()
+        self.assertEqual(redis.keys('transcript-progress*'), [])
+
+if __name__ == '__main__':
+    unittest.main()
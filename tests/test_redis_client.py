@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import patch
+from utils import redis_client
+from utils.get_env_variables import SECRETS_BACKENDS, clear_secrets_cache
+
+def broker_only_in_secrets(names):
+    return {name: 'redis://broker.internal:6379/0' if name == 'CELERY_BROKER_URL' else 'unused' for name in names}
+
+class TestGetRedis(unittest.TestCase):
+
+    def setUp(self):
+        clear_secrets_cache()
+        self.addCleanup(clear_secrets_cache)
+        for patcher in (
+            patch.object(redis_client, '_client', None),
+            patch.object(redis_client, 'REDIS_URL', None),
+            patch.dict(SECRETS_BACKENDS, {'remote': broker_only_in_secrets}),
+            patch('utils.get_env_variables.SECRETS_BACKEND', 'remote'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @patch.dict('os.environ', {}, clear=True)
+    def test_broker_url_from_the_secrets_backend_is_used(self):
+        client = redis_client.get_redis()
+
+        self.assertEqual(client.connection_pool.connection_kwargs['host'], 'broker.internal')
+        self.assertIs(redis_client.get_redis(), client)
+
+    def test_redis_url_takes_precedence(self):
+        with patch.object(redis_client, 'REDIS_URL', 'redis://events.internal:6380/1'):
+            client = redis_client.get_redis()
+
+        self.assertEqual(client.connection_pool.connection_kwargs['host'], 'events.internal')
+
+if __name__ == '__main__':
+    unittest.main()
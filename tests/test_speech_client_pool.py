@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from services.speech_client_pool import SpeechClientPool
+
+class TestSpeechClientPool(unittest.TestCase):
+
+    def test_clients_are_created_lazily_and_reused(self):
+        factory = MagicMock(side_effect=lambda: object())
+        pool = SpeechClientPool(size=2, client_factory=factory)
+
+        factory.assert_not_called()
+
+        clients = [pool.get() for _ in range(6)]
+
+        self.assertEqual(factory.call_count, 2)
+        self.assertEqual(len(set(map(id, clients))), 2)
+
+    def test_pool_rebuilds_after_fork(self):
+        factory = MagicMock(side_effect=lambda: object())
+        pool = SpeechClientPool(size=1, client_factory=factory)
+        parent_client = pool.get()
+
+        with patch('services.speech_client_pool.os.getpid', return_value=-1):
+            child_client = pool.get()
+            self.assertIs(pool.get(), child_client)
+
+        self.assertIsNot(parent_client, child_client)
+        self.assertEqual(factory.call_count, 2)
+
+    def test_child_forked_while_a_client_was_being_created_does_not_deadlock(self):
+        factory = MagicMock(side_effect=lambda: object())
+        pool = SpeechClientPool(size=1, client_factory=factory)
+        pool.get()
+        # The lock as a child sees it when the parent forked inside get()
+        pool._lock.acquire()
+
+        pool.after_fork_in_child()
+
+        self.assertIsNotNone(pool.get())
+        self.assertEqual(factory.call_count, 2)
+
+    @patch('google.cloud.speech.SpeechClient')
+    def test_default_factory_uses_speech_client(self, mock_speech_client):
+        pool = SpeechClientPool(size=1)
+
+        self.assertIs(pool.get(), mock_speech_client.return_value)
+        self.assertIs(pool.get(), mock_speech_client.return_value)
+        mock_speech_client.assert_called_once_with()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,408 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from functools import partial
+from unittest.mock import patch, MagicMock, PropertyMock, ANY
+import fakeredis
+from celery.backends.cache import CacheBackend
+from celery.exceptions import Retry
+from tasks import download_and_process, abort_pipeline, stamp_published_at, record_queue_wait, TRANSCRIPTION_WAIT_INTERVAL
+from services.pipeline_metrics import stage_seconds, job_chunks, queue_wait_seconds
+from services.job_coalescing import TranscriptionCoalescer
+from services.progress_service import SharedTranscriptProgress
+from services.transcript_cache import make_cache_key
+
+class TestDownloadAndProcess(unittest.TestCase):
+
+    def setUp(self):
+        patchers = {
+            'app_context': patch('tasks.app_context'),
+            'user_model': patch('tasks.User'),
+            'db': patch('tasks.db'),
+            'settle_usage': patch('tasks.settle_usage', side_effect=lambda user_id, job_id, minutes: 10 - minutes),
+            'release': patch('tasks.release_reservation'),
+            'get_metadata': patch('tasks.get_video_metadata', return_value={'id': 'dQw4w9WgXcQ', 'duration': 120.0}),
+            'download_audio': patch('tasks.download_audio'),
+            'transcribe': patch('tasks.transcribe_audio'),
+            'duration': patch('tasks.get_audio_duration', return_value=119.5),
+            'analyze_text': patch('tasks.analyze_text', return_value='Analysis'),
+            'get_cache': patch('tasks.get_transcript_cache'),
+            'cleanup': patch('tasks.cleanup_files'),
+            'store_segments': patch('tasks.store_segments'),
+            'index_transcript': patch('tasks.index_transcript'),
+            'update_state': patch.object(download_and_process, 'update_state'),
+            'publish_event': patch('tasks.publish_task_event'),
+            'settings': patch('tasks.transcription_settings', return_value={'backend': 'google'}),
+            'mode': patch('tasks.PIPELINE_MODE', 'single'),
+        }
+        self.mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+
+        self.user = MagicMock(free_minutes=10)
+        self.mocks['db'].session.get.return_value = self.user
+        self.cache = self.mocks['get_cache'].return_value
+
+        self.redis = fakeredis.FakeRedis()
+        coalescer_patcher = patch('tasks.transcription_coalescer', TranscriptionCoalescer(redis_factory=lambda: self.redis, poll_interval=0.01))
+        coalescer_patcher.start()
+        self.addCleanup(coalescer_patcher.stop)
+
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        work_dir_patcher = patch('tasks.PIPELINE_WORK_DIR', self.work_dir)
+        work_dir_patcher.start()
+        self.addCleanup(work_dir_patcher.stop)
+        self.audio_path = os.path.join(self.work_dir, 'dQw4w9WgXcQ.mp3')
+        with open(self.audio_path, 'wb') as audio_file:
+            audio_file.write(b'\0' * 1000)
+        self.mocks['download_audio'].return_value = self.audio_path
+        download_and_process.push_request(id='job-1')
+        self.addCleanup(download_and_process.pop_request)
+
+    def test_cache_hit_skips_download_and_transcription(self):
+        self.cache.get.return_value = {'transcript': 'Cached transcript\n', 'duration': 180.0}
+
+        result = download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1)
+
+        self.mocks['download_audio'].assert_not_called()
+        self.mocks['transcribe'].assert_not_called()
+        self.mocks['analyze_text'].assert_called_once_with('Cached transcript\n', 'summarize', ANY)
+        self.assertEqual(result['result']['transcript'], 'Cached transcript\n')
+        self.assertEqual(result['result']['free_minutes_left'], 7)
+
+    def test_cache_miss_transcribes_and_stores(self):
+        self.cache.get.return_value = None
+
+        async def fake_transcribe(audio_path, stats=None, progress=None):
+            stats['audio_seconds_saved'] = 45.0
+            return 'Fresh transcript\n', []
+        self.mocks['transcribe'].side_effect = fake_transcribe
+
+        result = download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1)
+
+        self.mocks['download_audio'].assert_called_once()
+        self.assertEqual(result['result']['transcript'], 'Fresh transcript\n')
+        self.cache.set.assert_called_once()
+        self.assertEqual(self.cache.set.call_args[0][0], 'dQw4w9WgXcQ')
+        self.assertEqual(self.cache.set.call_args[0][2:], ('Fresh transcript\n', 120.0))
+        self.assertEqual(result['result']['audio_seconds_saved'], 45.0)
+        # Billing uses the original duration, not the audio left after VAD
+        self.mocks['settle_usage'].assert_called_once_with(1, 'job-1', 2)
+        self.assertEqual(result['result']['free_minutes_left'], 8)
+
+    def test_metadata_from_api_is_not_probed_again(self):
+        self.cache.get.return_value = None
+        self.mocks['transcribe'].return_value = ('Fresh transcript\n', [])
+        metadata = {'id': 'dQw4w9WgXcQ', 'duration': 240, 'formats': []}
+
+        result = download_and_process.run('https://youtu.be/dQw4w9WgXcQ', 'summarize', 1, metadata=metadata)
+
+        self.mocks['get_metadata'].assert_not_called()
+        self.mocks['download_audio'].assert_called_once_with('https://youtu.be/dQw4w9WgXcQ', metadata, os.path.join(self.work_dir, 'job-1'))
+        self.mocks['duration'].assert_not_called()
+        self.assertEqual(result['result']['free_minutes_left'], 6)
+
+    def test_duration_falls_back_to_ffprobe(self):
+        self.cache.get.return_value = None
+        self.mocks['transcribe'].return_value = ('Fresh transcript\n', [])
+        self.mocks['get_metadata'].return_value = {'id': 'dQw4w9WgXcQ', 'duration': None}
+
+        download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1)
+
+        self.mocks['duration'].assert_called_once_with(self.audio_path)
+        self.assertEqual(self.cache.set.call_args[0][3], 119.5)
+
+    def test_unknown_user_fails_before_downloading(self):
+        self.mocks['db'].session.get.return_value = None
+
+        with self.assertRaisesRegex(ValueError, 'User not found'):
+            download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1)
+
+        self.mocks['db'].session.get.assert_called_once_with(self.mocks['user_model'], 1)
+        self.mocks['download_audio'].assert_not_called()
+        self.mocks['release'].assert_called_once_with('job-1')
+
+    def test_no_db_session_is_held_while_transcribing(self):
+        self.cache.get.return_value = None
+        session = self.mocks['db'].session
+
+        async def fake_transcribe(audio_path, stats=None, progress=None):
+            # The user check's session was removed, and billing has not opened one yet
+            session.remove.assert_called_once()
+            self.mocks['settle_usage'].assert_not_called()
+            return 'Fresh transcript\n', []
+        self.mocks['transcribe'].side_effect = fake_transcribe
+
+        download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1)
+
+        # The user check, storing the transcript's segments and billing
+        self.assertEqual(session.remove.call_count, 3)
+
+    def test_failed_job_releases_reserved_minutes(self):
+        self.cache.get.return_value = None
+        self.mocks['transcribe'].side_effect = RuntimeError('Speech API unavailable')
+
+        with self.assertRaises(RuntimeError):
+            download_and_process.apply(args=['https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1], task_id='job-1').get()
+
+        self.mocks['release'].assert_called_once_with('job-1')
+        self.mocks['settle_usage'].assert_not_called()
+
+    def test_job_attaches_to_transcription_of_another_job(self):
+        self.cache.get.return_value = None
+        shared = {'transcript': 'Shared transcript\n', 'duration': 300.0, 'audio_seconds_saved': 12.0}
+        self.redis.set('transcription-result:' + make_cache_key('dQw4w9WgXcQ', {'backend': 'google'}), json.dumps(shared))
+
+        result = download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'List the topics', 1)
+
+        self.mocks['download_audio'].assert_not_called()
+        self.mocks['transcribe'].assert_not_called()
+        self.mocks['analyze_text'].assert_called_once_with('Shared transcript\n', 'List the topics', ANY)
+        self.assertEqual(result['result']['transcript'], 'Shared transcript\n')
+        # Each job is billed for the video, including jobs that shared the transcription
+        self.assertEqual(result['result']['free_minutes_left'], 5)
+
+    def test_owner_shares_its_transcription(self):
+        self.cache.get.return_value = None
+        self.mocks['transcribe'].return_value = ('Fresh transcript\n', [])
+
+        download_and_process.run('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'summarize', 1)
+
+        shared = json.loads(self.redis.get('transcription-result:' + make_cache_key('dQw4w9WgXcQ', {'backend': 'google'})))
+        self.assertEqual(shared, {'transcript': 'Fresh transcript\n', 'duration': 120.0, 'audio_seconds_saved': 0})
+        self.assertEqual(self.redis.keys('transcription-lock:*'), [])
+        self.mocks['cleanup'].assert_called_once_with(self.audio_path, [])
+
+class TestPipeline(unittest.TestCase):
+    """Runs the stage tasks eagerly, chained exactly as workers would run them."""
+
+    URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    SETTINGS = {'backend': 'google', 'chunk_length': 30, 'vad': False}
+    CHUNKS = [b'first', b'second', b'third']
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        self.redis = fakeredis.FakeRedis()
+
+        async def transcribe_pcm_chunk(audio_content, backend=None):
+            return {'text': audio_content.decode('utf-8') + '\n', 'confidence': 0.9, 'words': [{'word': audio_content.decode('utf-8'), 'start': 1.0, 'end': 1.5}]}
+
+        async def transcribe_audio(audio_path, stats=None, progress=None):
+            results = [await transcribe_pcm_chunk(chunk) for chunk in self.CHUNKS]
+            for index, result in enumerate(results):
+                progress.chunk_done(index, result['text'], result['confidence'], result['words'])
+            return ''.join(result['text'] for result in results), []
+
+        def download_audio(url, info=None, output_dir=None):
+            os.makedirs(output_dir or self.work_dir, exist_ok=True)
+            path = os.path.join(output_dir or self.work_dir, 'dQw4w9WgXcQ.mp3')
+            open(path, 'wb').close()
+            return path
+
+        patchers = {
+            'app_context': patch('tasks.app_context'),
+            'user_model': patch('tasks.User'),
+            'db': patch('tasks.db'),
+            'settle_usage': patch('tasks.settle_usage', side_effect=lambda user_id, job_id, minutes: 10 - minutes),
+            'release': patch('tasks.release_reservation'),
+            'get_metadata': patch('tasks.get_video_metadata', return_value={'id': 'dQw4w9WgXcQ', 'duration': 150.0}),
+            'download_audio': patch('tasks.download_audio', side_effect=download_audio),
+            'read_pcm_chunks': patch('tasks.read_pcm_chunks', side_effect=lambda path, length: iter(self.CHUNKS)),
+            'transcribe_chunk': patch('tasks.transcribe_pcm_chunk', side_effect=transcribe_pcm_chunk),
+            'transcribe': patch('tasks.transcribe_audio', side_effect=transcribe_audio),
+            'analyze_text': patch('tasks.analyze_text', side_effect=self.fake_analysis),
+            'get_cache': patch('tasks.get_transcript_cache'),
+            'store_segments': patch('tasks.store_segments'),
+            'index_transcript': patch('tasks.index_transcript'),
+            'update_state': patch.object(download_and_process, 'update_state'),
+            'publish_event': patch('tasks.publish_task_event'),
+            'settings': patch('tasks.transcription_settings', return_value=self.SETTINGS),
+            'work_dir': patch('tasks.PIPELINE_WORK_DIR', self.work_dir),
+            'coalescer': patch('tasks.transcription_coalescer', TranscriptionCoalescer(redis_factory=lambda: self.redis)),
+            'progress': patch('tasks.SharedTranscriptProgress', partial(SharedTranscriptProgress, redis_factory=lambda: self.redis, min_interval=0)),
+        }
+        self.mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+
+        # Chords keep their state in the result backend; use an in-memory one whichever app is current
+        app = download_and_process.app
+        backend_patcher = patch.object(type(app), 'backend', new_callable=PropertyMock, return_value=CacheBackend(app=app, backend='memory'))
+        backend_patcher.start()
+        self.addCleanup(backend_patcher.stop)
+
+        self.mocks['get_cache'].return_value.get.return_value = None
+        self.mocks['db'].session.get.side_effect = lambda model, user_id: MagicMock(free_minutes=10)
+
+    def fake_analysis(self, transcript, prompt, progress=None):
+        """Streams its answer a word at a time, like the model does."""
+        analysis = f'{prompt}: {len(transcript)}'
+        for word in analysis.split(' '):
+            progress.add(word + ' ')
+        return analysis
+
+    def run_job(self, mode):
+        with patch('tasks.PIPELINE_MODE', mode):
+            return download_and_process.apply(args=[self.URL, 'summarize', 1], task_id='job-1').get()
+
+    def test_canvas_result_matches_single_task(self):
+        single = self.run_job('single')
+        self.redis.flushall()
+
+        canvas = self.run_job('canvas')
+
+        self.assertEqual(canvas, single)
+        self.assertEqual(canvas['result']['transcript'], 'first\nsecond\nthird\n')
+        self.assertEqual(canvas['result']['free_minutes_left'], 8)
+        # Both store the same segments, timed by chunk, with the backend's confidence and word times
+        single_segments, canvas_segments = self.mocks['store_segments'].call_args_list
+        self.assertEqual(canvas_segments, single_segments)
+        self.assertEqual(canvas_segments.args, ('dQw4w9WgXcQ', [
+            {'index': 0, 'start': 0, 'end': 30, 'text': 'first\n', 'confidence': 0.9, 'words': [{'word': 'first', 'start': 1.0, 'end': 1.5}]},
+            {'index': 1, 'start': 30, 'end': 60, 'text': 'second\n', 'confidence': 0.9, 'words': [{'word': 'second', 'start': 31.0, 'end': 31.5}]},
+            {'index': 2, 'start': 60, 'end': 90, 'text': 'third\n', 'confidence': 0.9, 'words': [{'word': 'third', 'start': 61.0, 'end': 61.5}]},
+        ]))
+        # and leave indexing them for search to another task
+        self.mocks['index_transcript'].delay.assert_called_with('dQw4w9WgXcQ')
+        self.assertEqual(self.mocks['index_transcript'].delay.call_count, 2)
+
+    def test_transcript_can_be_left_out_of_the_result(self):
+        with patch('tasks.TRANSCRIPT_IN_RESULT', False):
+            result = self.run_job('canvas')
+
+        self.assertNotIn('transcript', result['result'])
+        self.assertEqual(result['result']['analysis'], 'summarize: 19')
+
+    def test_canvas_reports_chunks_and_cleans_up(self):
+        self.run_job('canvas')
+
+        states = [call.kwargs for call in self.mocks['update_state'].call_args_list]
+        self.assertTrue(all(state['task_id'] == 'job-1' for state in states))
+        chunk_states = [state['meta'] for state in states if 'chunks_completed' in state['meta']]
+        self.assertEqual([meta['chunks_completed'] for meta in chunk_states], [1, 2, 3])
+        self.assertEqual(chunk_states[-1]['partial_transcript'], 'first\nsecond\nthird\n')
+        # The analysis streams through the same channel, ending with the whole answer
+        self.assertEqual(states[-1]['meta'], {'status': 'Analyzing transcript', 'partial_analysis': 'summarize: 19 '})
+        self.assertEqual(os.listdir(self.work_dir), [])
+        self.assertEqual(self.redis.keys('transcript-progress:*'), [])
+        # The transcription is shared with other jobs and the lock released
+        self.assertEqual(len(self.redis.keys('transcription-result:*')), 1)
+        self.assertEqual(self.redis.keys('transcription-lock:*'), [])
+
+    def test_stages_are_timed(self):
+        stages = ('download', 'segment', 'analyze', 'billing')
+        before = {stage: stage_seconds.value(stage=stage) for stage in stages}
+        chunk_jobs_before = job_chunks.value()
+
+        self.run_job('canvas')
+        self.redis.flushall()
+        self.run_job('single')
+
+        # The single task's segmenting happens inside the faked transcribe_audio
+        self.assertEqual({stage: stage_seconds.value(stage=stage) - before[stage] for stage in stages},
+                         {'download': 2, 'segment': 1, 'analyze': 2, 'billing': 2})
+        self.assertEqual(job_chunks.value() - chunk_jobs_before, 1)
+
+    def test_canvas_reuses_shared_transcription(self):
+        shared = {'transcript': 'Shared transcript\n', 'duration': 300.0, 'audio_seconds_saved': 0}
+        self.redis.set('transcription-result:' + make_cache_key('dQw4w9WgXcQ', self.SETTINGS), json.dumps(shared))
+
+        result = self.run_job('canvas')
+
+        self.mocks['download_audio'].assert_not_called()
+        self.assertEqual(result['result']['transcript'], 'Shared transcript\n')
+        self.assertEqual(result['result']['free_minutes_left'], 5)
+
+    def test_canvas_rechecks_for_a_result_shared_just_before_it_took_the_lock(self):
+        coalescer = self.mocks['coalescer']
+        shared = {'transcript': 'Shared transcript\n', 'duration': 300.0, 'audio_seconds_saved': 0}
+        key = make_cache_key('dQw4w9WgXcQ', self.SETTINGS)
+        try_acquire = coalescer.try_acquire
+
+        def owner_finishes_first(key, ttl=None):
+            # The owner shares its result and releases the lock between this job's check and its lock
+            self.redis.set('transcription-result:' + key, json.dumps(shared))
+            return try_acquire(key, ttl)
+
+        with patch.object(coalescer, 'try_acquire', side_effect=owner_finishes_first):
+            result = self.run_job('canvas')
+
+        self.mocks['download_audio'].assert_not_called()
+        self.assertEqual(result['result']['transcript'], 'Shared transcript\n')
+        self.assertFalse(self.redis.exists('transcription-lock:' + key))
+
+    def test_canvas_releases_lock_when_the_pipeline_cannot_be_started(self):
+        with patch('tasks.abort_pipeline') as abort, self.assertRaises(RuntimeError):
+            abort.s.side_effect = RuntimeError('broker down')
+            self.run_job('canvas')
+
+        self.assertEqual(self.redis.keys('transcription-lock:*'), [])
+        self.mocks['release'].assert_called_once()
+
+    def test_canvas_job_waits_while_another_job_transcribes(self):
+        self.redis.set('transcription-lock:' + make_cache_key('dQw4w9WgXcQ', self.SETTINGS), 'other-job')
+
+        with patch('tasks.PIPELINE_MODE', 'canvas'), \
+                patch.object(download_and_process, 'retry', side_effect=Retry()) as retry:
+            result = download_and_process.apply(args=[self.URL, 'summarize', 1], task_id='job-1')
+
+        self.assertEqual(result.state, 'RETRY')
+        retry.assert_called_once_with(countdown=TRANSCRIPTION_WAIT_INTERVAL)
+        self.mocks['download_audio'].assert_not_called()
+
+    def test_abort_releases_lock_and_fails_job(self):
+        key = make_cache_key('dQw4w9WgXcQ', self.SETTINGS)
+        token = self.mocks['coalescer'].try_acquire(key)
+        os.makedirs(os.path.join(self.work_dir, 'job-1'))
+
+        with patch('tasks.download_and_process') as job_task:
+            abort_pipeline(MagicMock(task='tasks.transcribe_chunk'), ValueError('boom'), None, 'job-1', {'key': key, 'token': token})
+
+        job_task.backend.mark_as_failure.assert_called_once()
+        self.assertEqual(job_task.backend.mark_as_failure.call_args[0][0], 'job-1')
+        self.assertEqual(self.redis.keys('transcription-lock:*'), [])
+        self.assertEqual(os.listdir(self.work_dir), [])
+        self.mocks['publish_event'].assert_called_with('job-1', 'FAILURE', ANY)
+
+class TestQueueWait(unittest.TestCase):
+
+    @patch('tasks.time')
+    def test_wait_is_measured_from_publishing(self, mock_time):
+        headers = {}
+        mock_time.time.return_value = 1000.0
+        stamp_published_at(headers=headers)
+        task = MagicMock()
+        task.name = 'tasks.transcribe_chunk'
+        task.request.get.return_value = headers['published_at']
+        task.request.eta = None
+        before = queue_wait_seconds.value(task='tasks.transcribe_chunk')
+
+        mock_time.time.return_value = 1002.5
+        record_queue_wait(task=task)
+
+        self.assertEqual(queue_wait_seconds.value(task='tasks.transcribe_chunk'), before + 1)
+        [sample] = [value for labels, value in queue_wait_seconds.samples() if labels == {'task': 'tasks.transcribe_chunk'}]
+        self.assertEqual(dict(sample['buckets'])[2.5], sample['count'])
+
+    @patch('tasks.time')
+    def test_wait_of_delayed_tasks_is_measured_from_their_eta(self, mock_time):
+        task = MagicMock()
+        task.name = 'tasks.download_and_process'
+        task.request.get.return_value = 1000.0
+        # Retried with a 30 second countdown, then started 0.5 seconds after it passed
+        task.request.eta = datetime.fromtimestamp(1030.0, timezone.utc).isoformat()
+        mock_time.time.return_value = 1030.5
+        before = {labels['task']: value['sum'] for labels, value in queue_wait_seconds.samples()}.get(task.name, 0)
+
+        record_queue_wait(task=task)
+
+        [sample] = [value for labels, value in queue_wait_seconds.samples() if labels == {'task': task.name}]
+        self.assertAlmostEqual(sample['sum'] - before, 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
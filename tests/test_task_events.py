@@ -0,0 +1,67 @@
+import json
+import unittest
+from unittest.mock import patch
+import fakeredis
+from services.task_events import TaskEventHub, publish_task_event, stream_task_events, task_status_response
+
+class TestTaskEvents(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.hub = TaskEventHub(redis_factory=lambda: self.redis, poll_timeout=0.05)
+        patcher = patch('services.task_events.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_events_reach_only_watchers_of_the_task(self):
+        events = self.hub.watch('task-1')
+        other = self.hub.watch('task-2')
+
+        publish_task_event('task-1', 'PROGRESS', {'status': 'Downloading video'})
+
+        self.assertEqual(events.get(timeout=2), {'state': 'PROGRESS', 'result': '', 'status': 'Downloading video'})
+        self.assertTrue(other.empty())
+
+    def test_one_subscription_serves_every_watcher(self):
+        watchers = [self.hub.watch(f'task-{i % 3}') for i in range(30)]
+
+        self.assertEqual(self.redis.execute_command('PUBSUB', 'NUMPAT'), 1)
+        self.assertEqual(self.hub.watcher_count(), 30)
+
+        for i, events in enumerate(watchers):
+            self.hub.unwatch(f'task-{i % 3}', events)
+        self.assertEqual(self.hub.watcher_count(), 0)
+
+    def test_stream_ends_at_terminal_state(self):
+        events = self.hub.watch('task-1')
+        snapshot = task_status_response('PENDING', None)
+        stream = stream_task_events('task-1', snapshot, events, self.hub, heartbeat_interval=0.05)
+
+        self.assertEqual(next(stream), f"data: {json.dumps(snapshot)}\n\n")
+        self.assertEqual(next(stream), ": keepalive\n\n")
+
+        publish_task_event('task-1', 'PROGRESS', {'status': 'Transcribing audio', 'partial_transcript': 'Hi\n',
+                                                  'chunks_completed': 1, 'chunks_total': 2})
+        publish_task_event('task-1', 'SUCCESS', {'status': 'Completed', 'result': {'transcript': 'Hi\n'}})
+
+        messages = [message for message in stream if not message.startswith(':')]
+        events_sent = [json.loads(message[len('data: '):]) for message in messages]
+        self.assertEqual([event['state'] for event in events_sent], ['PROGRESS', 'SUCCESS'])
+        self.assertEqual(events_sent[0]['partial_transcript'], 'Hi\n')
+        self.assertEqual(self.hub.watcher_count(), 0)
+
+    def test_stream_closes_immediately_for_finished_task(self):
+        events = self.hub.watch('task-1')
+        snapshot = task_status_response('FAILURE', Exception('boom'))
+
+        messages = list(stream_task_events('task-1', snapshot, events, self.hub))
+
+        self.assertEqual(messages, [f"data: {json.dumps({'state': 'FAILURE', 'status': 'boom'})}\n\n"])
+        self.assertEqual(self.hub.watcher_count(), 0)
+
+    def test_publish_errors_are_logged(self):
+        with patch('services.task_events.get_redis', side_effect=ConnectionError('redis down')):
+            publish_task_event('task-1', 'PROGRESS', {'status': 'Downloading video'})
+
+if __name__ == '__main__':
+    unittest.main()
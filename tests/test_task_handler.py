@@ -4,8 +4,9 @@ from tasks import task_success_handler, task_failure_handler
 
 class TestTaskHandler(unittest.TestCase):
 
+    @patch('tasks.publish_task_event')
     @patch('logging.error')
-    def test_task_success_handler(self, mock_logging_error):
+    def test_task_success_handler(self, mock_logging_error, mock_publish):
         result = {
             'result': {
                 'file_path': './test_audio/test.mp3',
@@ -19,9 +20,22 @@ class TestTaskHandler(unittest.TestCase):
         task_success_handler(sender=mock_sender, result=result)
 
         mock_logging_error.assert_not_called()
+        mock_publish.assert_called_once_with(mock_sender.request.id, 'SUCCESS', result)
 
+    @patch('tasks.publish_task_event')
+    @patch('tasks.logger')
+    def test_task_success_handler_does_not_log_the_result(self, mock_logger, mock_publish):
+        mock_sender = MagicMock()
+        mock_sender.name = 'download_and_process'
+
+        task_success_handler(sender=mock_sender, result={'result': {'transcript': 'Every word of the video'}})
+
+        logged = ' '.join(str(call) for call in mock_logger.mock_calls)
+        self.assertNotIn('Every word of the video', logged)
+
+    @patch('tasks.publish_task_event')
     @patch('logging.error')
-    def test_task_failure_handler(self, mock_logging_error):
+    def test_task_failure_handler(self, mock_logging_error, mock_publish):
         mock_sender = MagicMock()
         mock_sender.name = 'download_and_process'
         exception = Exception('Task failed due to some error')
@@ -32,6 +46,7 @@ class TestTaskHandler(unittest.TestCase):
         }
 
         task_failure_handler(sender=mock_sender, task_id='1234', exception=exception, kwargs=kwargs)
+        mock_publish.assert_called_once_with('1234', 'FAILURE', exception)
 
         # TODO: fix this test - low priority
         # mock_logging_error.assert_called_once_with(
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from services.transcript_cache import TranscriptCache, make_cache_key
+
+SETTINGS = {'language_code': 'en-US', 'chunk_length': 30, 'sample_rate_hertz': 16000}
+
+class TestTranscriptCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = TranscriptCache(path=os.path.join(self.tmp_dir, 'cache.db'), ttl=60, max_bytes=1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_miss_then_hit(self):
+        self.assertIsNone(self.cache.get('dQw4w9WgXcQ', SETTINGS))
+
+        self.cache.set('dQw4w9WgXcQ', SETTINGS, 'Test transcript\n', 212.0)
+        cached = self.cache.get('dQw4w9WgXcQ', SETTINGS)
+
+        self.assertEqual(cached, {'transcript': 'Test transcript\n', 'duration': 212.0})
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_key_includes_settings(self):
+        self.cache.set('dQw4w9WgXcQ', SETTINGS, 'Test transcript\n', 212.0)
+
+        other_settings = dict(SETTINGS, language_code='de-DE')
+        self.assertNotEqual(make_cache_key('dQw4w9WgXcQ', SETTINGS), make_cache_key('dQw4w9WgXcQ', other_settings))
+        self.assertIsNone(self.cache.get('dQw4w9WgXcQ', other_settings))
+
+    def test_expired_entry_is_a_miss(self):
+        with patch('services.transcript_cache.time.time', return_value=1000.0):
+            self.cache.set('dQw4w9WgXcQ', SETTINGS, 'Test transcript\n', 212.0)
+
+        with patch('services.transcript_cache.time.time', return_value=1061.0):
+            self.assertIsNone(self.cache.get('dQw4w9WgXcQ', SETTINGS))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 0)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_size_eviction_drops_least_recently_used(self):
+        with patch('services.transcript_cache.time.time', return_value=1000.0):
+            self.cache.set('video_old', SETTINGS, 'a' * 400, 10.0)
+        with patch('services.transcript_cache.time.time', return_value=1001.0):
+            self.cache.set('video_mid', SETTINGS, 'b' * 400, 10.0)
+        with patch('services.transcript_cache.time.time', return_value=1002.0):
+            self.cache.get('video_old', SETTINGS)
+        with patch('services.transcript_cache.time.time', return_value=1003.0):
+            self.cache.set('video_new', SETTINGS, 'c' * 400, 10.0)
+
+        with patch('services.transcript_cache.time.time', return_value=1004.0):
+            self.assertIsNotNone(self.cache.get('video_old', SETTINGS))
+            self.assertIsNone(self.cache.get('video_mid', SETTINGS))
+            self.assertIsNotNone(self.cache.get('video_new', SETTINGS))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch
+from flask import Flask
+from db.models import db, SearchDocument
+from services.transcript_store import make_segments, store_segments
+from services.transcript_search import index_transcript, search_transcripts
+
+class TestTranscriptSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        db.create_all()
+
+    def store_and_index(self, video_id, texts):
+        store_segments(video_id, make_segments([{'text': text} for text in texts], 30, 30 * len(texts)))
+        index_transcript(video_id)
+
+    def test_reindexing_replaces_the_video_documents(self):
+        self.store_and_index('video-1', ['the old transcript\n'])
+        self.store_and_index('video-1', ['the new transcript\n'])
+
+        self.assertEqual(search_transcripts('old'), [])
+        self.assertEqual([result['video_id'] for result in search_transcripts('new')], ['video-1'])
+        self.assertEqual(SearchDocument.query.count(), 1)
+
+    def test_best_matching_videos_come_first_with_their_best_snippets(self):
+        self.store_and_index('video-1', ['rockets once\n', 'nothing here\n'])
+        self.store_and_index('video-2', ['rockets and more rockets\n', 'rockets again\n', 'rockets\n', 'rockets\n'])
+
+        with patch('services.transcript_search.SEARCH_SNIPPETS_PER_VIDEO', 2):
+            results = search_transcripts('rocket', limit=2)
+
+        self.assertEqual([result['video_id'] for result in results], ['video-2', 'video-1'])
+        self.assertEqual(len(results[0]['snippets']), 2)
+        self.assertEqual(results[1]['snippets'], [{'index': 0, 'start': 0, 'end': 30, 'snippet': '[rockets] once\n'}])
+
+    def test_query_syntax_is_matched_as_words(self):
+        self.store_and_index('video-1', ['AND "quoted" NEAR(words)\n'])
+
+        self.assertEqual(len(search_transcripts('NEAR( "quoted')), 1)
+        self.assertEqual(search_transcripts('*'), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from flask import Flask
+from db.models import db
+from services.transcript_store import make_segments, store_segments, get_segments
+
+def chunks(*texts):
+    return [{'text': text, 'confidence': None, 'words': None} for text in texts]
+
+class TestMakeSegments(unittest.TestCase):
+
+    def test_fixed_length_chunks_are_timed_by_index(self):
+        segments = make_segments(chunks('first\n', 'second\n', 'third\n'), 30, 75.5)
+
+        self.assertEqual([(segment['start'], segment['end']) for segment in segments], [(0, 30), (30, 60), (60, 75.5)])
+
+    def test_vad_chunks_keep_their_times_and_silent_chunks_are_dropped(self):
+        segments = make_segments(chunks('hello\n', '', 'again\n'), 30, 200, [[(1.5, 29.25)], [(40, 52)], [(95.125, 100), (110, 120)]])
+
+        self.assertEqual(segments, [
+            {'index': 0, 'start': 1.5, 'end': 29.25, 'text': 'hello\n', 'confidence': None, 'words': None},
+            {'index': 2, 'start': 95.125, 'end': 120, 'text': 'again\n', 'confidence': None, 'words': None},
+        ])
+
+    def test_word_offsets_are_mapped_to_the_original_audio(self):
+        words = [{'word': 'hello', 'start': 0.5, 'end': 1.0}, {'word': 'again', 'start': 5.5, 'end': 6.0}]
+        chunk = {'text': 'hello again\n', 'confidence': 0.92, 'words': words}
+
+        fixed, = make_segments([{'text': ''}, chunk], 30, 60)
+        # VAD dropped 10 seconds of silence after the first 5 seconds of speech
+        vad, = make_segments([chunk], 30, 60, [[(40, 45), (55, 60)]])
+
+        self.assertEqual(fixed['confidence'], 0.92)
+        self.assertEqual(fixed['words'], [{'word': 'hello', 'start': 30.5, 'end': 31.0}, {'word': 'again', 'start': 35.5, 'end': 36.0}])
+        self.assertEqual(vad['words'], [{'word': 'hello', 'start': 40.5, 'end': 41.0}, {'word': 'again', 'start': 55.5, 'end': 56.0}])
+
+class TestTranscriptStore(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        self.addCleanup(self.context.pop)
+        db.create_all()
+
+    def test_storing_again_replaces_the_transcript(self):
+        store_segments('video-1', make_segments(chunks('old\n', 'old\n'), 30, 60))
+        store_segments('video-1', make_segments(chunks('new\n'), 30, 30))
+
+        segments, next_cursor = get_segments('video-1')
+
+        self.assertEqual([segment['text'] for segment in segments], ['new\n'])
+        self.assertIsNone(next_cursor)
+
+    def test_segments_overlapping_the_range_are_returned(self):
+        store_segments('video-1', make_segments(chunks(*[f'{index}\n' for index in range(6)]), 10, 60))
+        store_segments('video-2', make_segments(chunks('other\n'), 10, 10))
+
+        segments, _ = get_segments('video-1', start=15, end=30)
+
+        self.assertEqual([segment['index'] for segment in segments], [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,19 @@
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
 import asyncio
-from services.google_transcription_service import transcribe_audio_chunk, transcribe_audio_google
+import io
+from datetime import timedelta
+from services.speech_client_pool import speech_client_pool
+from services.google_transcription_service import transcribe_audio_chunk, transcribe_audio_google, recognize_audio_content
+from services.pipeline_metrics import stage_seconds
+from services.audio_service import read_pcm_chunks
 
 class TestAsyncTranscription(unittest.TestCase):
 
+    def setUp(self):
+        # Each test patches SpeechClient, so start from an empty client pool
+        speech_client_pool.reset()
+
     @patch('builtins.open', new_callable=mock_open, read_data=b'audio_content')
     @patch('google.cloud.speech.SpeechClient')
     @patch('asyncio.get_event_loop')
@@ -12,7 +21,19 @@ class TestAsyncTranscription(unittest.TestCase):
         # Mock the response from Google Cloud Speech-to-Text
         mock_response = MagicMock()
         mock_response.results = [
-            MagicMock(alternatives=[MagicMock(transcript='Test transcript')])
+            MagicMock(
+                alternatives=[MagicMock(transcript='Test transcript', confidence=0.9, words=[
+                    MagicMock(word='Test', start_time=timedelta(seconds=0.5), end_time=timedelta(seconds=0.9)),
+                    MagicMock(word='transcript', start_time=timedelta(seconds=1), end_time=timedelta(seconds=1.75)),
+                ])],
+                result_end_time=timedelta(seconds=2),
+            ),
+            MagicMock(
+                alternatives=[MagicMock(transcript='More', confidence=0.6, words=[
+                    MagicMock(word='More', start_time=timedelta(seconds=3), end_time=timedelta(seconds=3.5)),
+                ])],
+                result_end_time=timedelta(seconds=4),
+            ),
         ]
 
         # Mock the recognize method to return the mock response
@@ -28,10 +49,17 @@ class TestAsyncTranscription(unittest.TestCase):
         # Call the async function under test
         transcript = asyncio.run(transcribe_audio_chunk('file_chunk.wav'))
 
-        # Assert that the transcript is as expected
-        self.assertEqual(transcript, "Test transcript\n")
+        # Assert that the transcript is as expected, with its confidence weighted by the audio each result covers
+        self.assertEqual(transcript['text'], "Test transcript\nMore\n")
+        self.assertAlmostEqual(transcript['confidence'], 0.75)
+        self.assertEqual(transcript['words'], [
+            {'word': 'Test', 'start': 0.5, 'end': 0.9},
+            {'word': 'transcript', 'start': 1, 'end': 1.75},
+            {'word': 'More', 'start': 3, 'end': 3.5},
+        ])
 
         mock_speech_client.assert_called_once_with()
+        self.assertTrue(mock_speech_client.return_value.recognize.call_args.kwargs['config'].enable_word_time_offsets)
 
         # Ensure that the run_in_executor was called once with correct parameters
         mock_event_loop.return_value.run_in_executor.assert_called_once()
@@ -53,12 +81,15 @@ class TestAsyncTranscription(unittest.TestCase):
         # Ensure that the client was called, but an error occurred
         mock_speech_client.assert_called_once()
 
-    @patch('services.google_transcription_service.convert_mp3_to_wav', return_value='test.wav')
+    @patch('services.google_transcription_service.TRANSCRIPTION_MODE', 'files')
     @patch('services.google_transcription_service.split_audio_into_chunks', return_value=['chunk1.wav', 'chunk2.wav'])
     @patch('services.google_transcription_service.transcribe_audio_chunk')
-    def test_transcribe_audio_google_success(self, mock_transcribe_chunk, mock_split_audio, mock_convert_mp3):
+    def test_transcribe_audio_google_success(self, mock_transcribe_chunk, mock_split_audio):
         # Mock transcribe_audio_chunk to return a test transcript for each chunk
-        mock_transcribe_chunk.side_effect = ['Transcript 1\n', 'Transcript 2\n']
+        mock_transcribe_chunk.side_effect = [
+            {'text': 'Transcript 1\n', 'confidence': 0.8, 'words': None},
+            {'text': 'Transcript 2\n', 'confidence': 0.7, 'words': None},
+        ]
 
         # Call the async function under test
         transcript, chunks = asyncio.run(transcribe_audio_google('file.mp3'))
@@ -69,17 +100,16 @@ class TestAsyncTranscription(unittest.TestCase):
         # Ensure that the correct chunks are returned
         self.assertEqual(chunks, ['chunk1.wav', 'chunk2.wav'])
 
-        # Ensure that the conversion and splitting functions were called once
-        mock_convert_mp3.assert_called_once_with('file.mp3')
-        mock_split_audio.assert_called_once_with('test.wav', 30)
+        # Ensure that the downloaded file is split directly, without an intermediate WAV
+        mock_split_audio.assert_called_once_with('file.mp3', 30)
 
         # Ensure that transcribe_audio_chunk was called for each chunk
         self.assertEqual(mock_transcribe_chunk.call_count, 2)
 
-    @patch('services.google_transcription_service.convert_mp3_to_wav', return_value='test.wav')
+    @patch('services.google_transcription_service.TRANSCRIPTION_MODE', 'files')
     @patch('services.google_transcription_service.split_audio_into_chunks', return_value=['chunk1.wav', 'chunk2.wav'])
     @patch('services.google_transcription_service.transcribe_audio_chunk')
-    def test_transcribe_audio_google_failure(self, mock_transcribe_chunk, mock_split_audio, mock_convert_mp3):
+    def test_transcribe_audio_google_failure(self, mock_transcribe_chunk, mock_split_audio):
         # Simulate an exception being raised during one of the chunk transcriptions
         mock_transcribe_chunk.side_effect = Exception('Chunk transcription error')
 
@@ -87,9 +117,82 @@ class TestAsyncTranscription(unittest.TestCase):
         with self.assertRaises(Exception):
             asyncio.run(transcribe_audio_google('file.mp3'))
 
-        # Ensure that the conversion and splitting functions were called once
-        mock_convert_mp3.assert_called_once_with('file.mp3')
-        mock_split_audio.assert_called_once_with('test.wav', 30)
+        # Ensure that the downloaded file is split directly, without an intermediate WAV
+        mock_split_audio.assert_called_once_with('file.mp3', 30)
+
+    @patch('services.google_transcription_service.get_speech_client')
+    @patch('services.google_transcription_service.transcription_scheduler')
+    def test_recognize_stage_times_only_the_api_call(self, mock_scheduler, mock_get_client):
+        mock_get_client.return_value.recognize.return_value = MagicMock(results=[])
+
+        async def run_after_waiting_for_a_slot(start):
+            await asyncio.sleep(0.3)
+            return await start()
+        mock_scheduler.run.side_effect = run_after_waiting_for_a_slot
+
+        def recognize_seconds():
+            return sum(sample['sum'] for labels, sample in stage_seconds.samples() if labels == {'stage': 'recognize'})
+        before = recognize_seconds()
+        asyncio.run(recognize_audio_content(b'audio_content'))
+
+        self.assertLess(recognize_seconds() - before, 0.2)
+
+class TestStreamingTranscription(unittest.TestCase):
+
+    def mock_ffmpeg_process(self, mock_ffmpeg_input, pcm, returncode=0):
+        process = MagicMock()
+        process.stdout = io.BufferedReader(io.BytesIO(pcm))
+        process.wait.return_value = returncode
+        mock_ffmpeg_input.return_value.output.return_value.run_async.return_value = process
+        return process
+
+    @patch('ffmpeg.input')
+    def test_read_pcm_chunks_slices_buffer(self, mock_ffmpeg_input):
+        # 2.5 seconds of 16 kHz 16-bit mono audio split into 1 second chunks
+        pcm = bytes(range(256)) * 312 + bytes(128)
+        self.mock_ffmpeg_process(mock_ffmpeg_input, pcm)
+
+        chunks = list(read_pcm_chunks('file.mp3', chunk_length=1))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [32000, 32000, 16000])
+        self.assertEqual(b''.join(chunks), pcm)
+
+    @patch('ffmpeg.input')
+    def test_read_pcm_chunks_raises_on_decode_error(self, mock_ffmpeg_input):
+        self.mock_ffmpeg_process(mock_ffmpeg_input, b'', returncode=1)
+
+        with self.assertRaises(RuntimeError):
+            list(read_pcm_chunks('file.mp3'))
+
+    @patch('services.audio_service.VAD_ENABLED', False)
+    @patch('services.google_transcription_service.split_audio_into_chunks')
+    @patch('services.google_transcription_service.recognize_audio_content')
+    @patch('ffmpeg.input')
+    def test_stream_mode_bounds_chunks_in_flight(self, mock_ffmpeg_input, mock_recognize, mock_split_audio):
+        self.mock_ffmpeg_process(mock_ffmpeg_input, bytes(32000 * 5))
+        in_flight = []
+        peak = []
+
+        async def fake_recognize(audio_content):
+            in_flight.append(audio_content)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(audio_content)
+            return {'text': f'Transcript {len(audio_content)}\n', 'confidence': None, 'words': None}
+        mock_recognize.side_effect = fake_recognize
+
+        progress = MagicMock(total=None)
+
+        with patch('services.google_transcription_service.MAX_CHUNKS_IN_FLIGHT', 2):
+            transcript, chunks = asyncio.run(transcribe_audio_google('file.mp3', chunk_length=1, progress=progress))
+
+        self.assertEqual(transcript, 'Transcript 32000\n' * 5)
+        self.assertEqual(chunks, [])
+        self.assertEqual(mock_recognize.call_count, 5)
+        self.assertLessEqual(max(peak), 2)
+        mock_split_audio.assert_not_called()
+        progress.set_total.assert_called_once_with(5)
+        self.assertEqual(sorted(c[0][0] for c in progress.chunk_done.call_args_list), [0, 1, 2, 3, 4])
 
 if __name__ == '__main__':
     unittest.main()
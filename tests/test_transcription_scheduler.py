@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch, AsyncMock
+from google.api_core import exceptions as google_exceptions
+from services.transcription_scheduler import AdaptiveLimiter, TranscriptionScheduler, backoff_delay
+from utils.metrics import registry
+
+class TestAdaptiveLimiter(unittest.TestCase):
+
+    def test_limit_bounds_concurrency(self):
+        limiter = AdaptiveLimiter(initial=2, min_limit=1, max_limit=2)
+        running = []
+        peak = []
+
+        async def work():
+            await limiter.acquire()
+            try:
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+            finally:
+                limiter.release()
+
+        async def main():
+            await asyncio.gather(*(work() for _ in range(6)))
+
+        asyncio.run(main())
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(limiter.queue_depth, 0)
+
+    def test_limit_is_shared_across_event_loops(self):
+        limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1)
+        running = []
+        peak = []
+
+        async def work():
+            await limiter.acquire()
+            try:
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+            finally:
+                limiter.release()
+
+        async def main():
+            await asyncio.wait_for(asyncio.gather(work(), work()), timeout=5)
+
+        def run_loop():
+            asyncio.run(main())
+
+        threads = [threading.Thread(target=run_loop) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(peak), 6)
+        self.assertEqual(max(peak), 1)
+
+    def test_aimd_adjustment(self):
+        limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8, target_latency=1.0, cooldown=0)
+
+        # Additive increase of 1/limit per call: five fast calls take 4 to just over 5
+        for _ in range(5):
+            limiter.record(latency=0.1)
+        self.assertEqual(limiter.limit, 5)
+
+        limiter.record(throttled=True)
+        self.assertEqual(limiter.limit, 2)
+
+        limiter.record(latency=5.0)
+        self.assertEqual(limiter.limit, 1)
+
+        limiter.record(throttled=True)
+        self.assertEqual(limiter.limit, 1)
+
+    def test_decrease_respects_cooldown(self):
+        limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=8, cooldown=60)
+
+        for _ in range(5):
+            limiter.record(throttled=True)
+
+        self.assertEqual(limiter.limit, 4)
+
+    def test_gauges_follow_slots_handed_out_when_the_limit_grows(self):
+        limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=2)
+
+        async def main():
+            await limiter.acquire()
+            waiter = asyncio.ensure_future(limiter.acquire())
+            await asyncio.sleep(0)
+            self.assertEqual(registry.gauge('transcription_queue_depth').value(), 1)
+
+            # A fast call raises the limit to 2, which hands the waiter a slot
+            limiter.record(latency=0.1)
+            await waiter
+
+        asyncio.run(main())
+
+        self.assertEqual(registry.gauge('transcription_in_flight').value(), 2)
+        self.assertEqual(registry.gauge('transcription_queue_depth').value(), 0)
+
+class TestTranscriptionScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=4, cooldown=0)
+        self.scheduler = TranscriptionScheduler(limiter=self.limiter, max_retries=2)
+
+    @patch('services.transcription_scheduler.asyncio.sleep', new_callable=AsyncMock)
+    def test_retries_throttled_calls(self, mock_sleep):
+        call = AsyncMock(side_effect=[google_exceptions.ResourceExhausted('quota'), 'response'])
+        retries_before = registry.counter('transcription_retries_total').value()
+
+        result = asyncio.run(self.scheduler.run(call))
+
+        self.assertEqual(result, 'response')
+        self.assertEqual(call.call_count, 2)
+        mock_sleep.assert_called_once()
+        self.assertEqual(registry.counter('transcription_retries_total').value(), retries_before + 1)
+        self.assertEqual(self.limiter.in_flight, 0)
+
+    @patch('services.transcription_scheduler.asyncio.sleep', new_callable=AsyncMock)
+    def test_gives_up_after_max_retries(self, mock_sleep):
+        call = AsyncMock(side_effect=google_exceptions.ServiceUnavailable('unavailable'))
+
+        with self.assertRaises(google_exceptions.ServiceUnavailable):
+            asyncio.run(self.scheduler.run(call))
+
+        self.assertEqual(call.call_count, 3)
+        self.assertEqual(self.limiter.in_flight, 0)
+
+    def test_other_errors_are_not_retried(self):
+        call = AsyncMock(side_effect=ValueError('bad audio'))
+
+        with self.assertRaises(ValueError):
+            asyncio.run(self.scheduler.run(call))
+
+        call.assert_called_once()
+        self.assertEqual(self.limiter.in_flight, 0)
+
+    def test_backoff_delay_is_capped(self):
+        for attempt in range(10):
+            self.assertLessEqual(backoff_delay(attempt, base=0.5, cap=4), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from db.models import db, User, Usage
+from services.usage_service import RESERVATION_TTL, get_balance, minutes_for, reserve_minutes, settle_usage, release_reservation
+
+class TestUsageLedger(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'usage.db')}"
+        db.init_app(self.app)
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='listener', password='unused', free_minutes=1000)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+
+    def balance(self):
+        with self.app.app_context():
+            return get_balance(self.user_id)
+
+    def test_minutes_are_whole_minutes_of_duration(self):
+        self.assertEqual(minutes_for(212), 3)
+        self.assertEqual(minutes_for(59.9), 0)
+        self.assertEqual(minutes_for(None), 0)
+
+    def test_reservation_counts_until_settled_at_actual_minutes(self):
+        with self.app.app_context():
+            reserve_minutes(self.user_id, 'job-1', 5)
+            self.assertEqual(get_balance(self.user_id), 995)
+
+            self.assertEqual(settle_usage(self.user_id, 'job-1', 4), 996)
+            # Settling again, e.g. after a retry, does not charge twice
+            self.assertEqual(settle_usage(self.user_id, 'job-1', 4), 996)
+            self.assertEqual(Usage.query.filter_by(task_id='job-1').one().status, 'settled')
+
+    def test_failed_job_releases_its_reservation(self):
+        with self.app.app_context():
+            reserve_minutes(self.user_id, 'job-1', 5)
+            release_reservation('job-1')
+
+            self.assertEqual(get_balance(self.user_id), 1000)
+
+    def test_reservation_never_settled_stops_counting_after_ttl(self):
+        with self.app.app_context():
+            reserve_minutes(self.user_id, 'job-1', 5)
+            self.assertEqual(get_balance(self.user_id), 995)
+
+            # The job's worker was killed, so it neither settled nor released its minutes
+            usage = Usage.query.filter_by(task_id='job-1').one()
+            usage.created_at = datetime.utcnow() - timedelta(seconds=RESERVATION_TTL + 60)
+            db.session.commit()
+            self.assertEqual(get_balance(self.user_id), 1000)
+
+            # If it does complete after all, it is still charged
+            self.assertEqual(settle_usage(self.user_id, 'job-1', 4), 996)
+
+    def test_reservation_needs_enough_minutes_left(self):
+        with self.app.app_context():
+            self.assertTrue(reserve_minutes(self.user_id, 'job-1', 990))
+            self.assertFalse(reserve_minutes(self.user_id, 'job-2', 30))
+            self.assertIsNone(Usage.query.filter_by(task_id='job-2').first())
+            self.assertTrue(reserve_minutes(self.user_id, 'job-3', 10))
+            self.assertEqual(get_balance(self.user_id), 0)
+
+    def test_job_without_reservation_is_charged_when_settled(self):
+        with self.app.app_context():
+            self.assertEqual(settle_usage(self.user_id, 'job-1', 7), 993)
+
+    def test_minutes_left_never_below_zero(self):
+        with self.app.app_context():
+            self.assertEqual(settle_usage(self.user_id, 'job-1', 1500), 0)
+            self.assertEqual(get_balance(self.user_id), -500)
+
+    def test_parallel_jobs_for_one_user_lose_no_updates(self):
+        def run_job(index):
+            with self.app.app_context():
+                reserve_minutes(self.user_id, f'job-{index}', 5)
+                settle_usage(self.user_id, f'job-{index}', 3)
+
+        with ThreadPoolExecutor(max_workers=100) as executor:
+            list(executor.map(run_job, range(100)))
+
+        self.assertEqual(self.balance(), 1000 - 100 * 3)
+        with self.app.app_context():
+            self.assertEqual(Usage.query.filter_by(status='settled').count(), 100)
+
+    def test_concurrent_submissions_cannot_overdraw(self):
+        def submit(index):
+            with self.app.app_context():
+                return reserve_minutes(self.user_id, f'job-{index}', 30)
+
+        with ThreadPoolExecutor(max_workers=100) as executor:
+            reserved = list(executor.map(submit, range(100)))
+
+        # 1000 minutes hold 33 reservations of 30
+        self.assertEqual(sum(reserved), 33)
+        self.assertEqual(self.balance(), 10)
+
+if __name__ == '__main__':
+    unittest.main()
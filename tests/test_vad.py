@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from services.audio_service import read_speech_chunks, PcmCursor
+from services.vad import frame_energy_db, speech_mask, plan_chunks
+
+FRAME = 480
+
+def make_audio(pattern, seconds_per_symbol=1.0):
+    """Build 16 kHz PCM from a pattern like 'S..S' where S is a tone and . is near-silence."""
+    rng = np.random.default_rng(0)
+    pieces = []
+    for symbol in pattern:
+        n = int(16000 * seconds_per_symbol)
+        if symbol == 'S':
+            pieces.append(8000 * np.sin(np.arange(n) * 2 * np.pi * 220 / 16000))
+        else:
+            pieces.append(rng.standard_normal(n) * 5)
+    return np.concatenate(pieces).astype(np.int16)
+
+class TestVad(unittest.TestCase):
+
+    def test_frame_energy_db(self):
+        samples = np.concatenate([np.zeros(FRAME), np.full(FRAME, 16384), np.full(10, 16384)]).astype(np.int16)
+
+        energy = frame_energy_db(samples, FRAME)
+
+        self.assertEqual(len(energy), 3)
+        self.assertLess(energy[0], -90)
+        self.assertAlmostEqual(energy[1], -6.02, places=1)
+
+    def test_speech_mask_with_hangover(self):
+        energy = np.array([-80.0] * 10 + [-10.0] * 3 + [-80.0] * 10)
+
+        self.assertEqual(speech_mask(energy).sum(), 3)
+        mask = speech_mask(energy, hangover_frames=2)
+        self.assertEqual(mask.sum(), 7)
+        self.assertTrue(mask[8:15].all())
+
+    def test_plan_cuts_in_silent_gaps_and_drops_silence(self):
+        # Three 10-frame speech bursts separated by 20 silent frames, 25 frames per chunk
+        energy = np.array(([-10.0] * 10 + [-80.0] * 20) * 3)
+
+        chunks = plan_chunks(energy, chunk_frames=25)
+
+        self.assertEqual(chunks, [[(0, 10), (30, 40)], [(60, 70)]])
+
+    def test_plan_splits_long_speech_at_quietest_frame(self):
+        # Continuous speech with two softer frames that are still above the threshold
+        energy = np.full(100, -10.0)
+        energy[40] = -15.0
+        energy[80] = -15.0
+
+        chunks = plan_chunks(energy, chunk_frames=50)
+
+        self.assertEqual(chunks, [[(0, 41)], [(41, 81)], [(81, 100)]])
+
+    def test_long_speech_fills_the_current_chunk_before_it_is_cut(self):
+        # A short burst, a gap, then speech longer than a chunk with a softer frame at 44
+        energy = np.array([-10.0] * 5 + [-80.0] * 10 + [-10.0] * 80)
+        energy[44] = -15.0
+
+        chunks = plan_chunks(energy, chunk_frames=50)
+
+        # No short leading chunk: the burst shares a full chunk with the head of the long span
+        self.assertEqual(chunks, [[(0, 5), (15, 45)], [(45, 95)]])
+
+class TestReadSpeechChunks(unittest.TestCase):
+
+    def test_pcm_cursor_reads_increasing_ranges(self):
+        data = np.arange(100, dtype=np.int16)
+        blocks = (data[i:i + 10].tobytes() for i in range(0, 100, 10))
+        cursor = PcmCursor(blocks)
+
+        self.assertEqual(np.frombuffer(cursor.read(5, 15), np.int16).tolist(), list(range(5, 15)))
+        self.assertEqual(np.frombuffer(cursor.read(42, 47), np.int16).tolist(), list(range(42, 47)))
+        self.assertEqual(np.frombuffer(cursor.read(95, 120), np.int16).tolist(), list(range(95, 100)))
+        self.assertLessEqual(len(cursor.buffer), 20)
+
+    @patch('services.audio_service.read_pcm_chunks')
+    def test_silence_is_removed_and_reported(self, mock_read_pcm_chunks):
+        audio = make_audio('SS....SS..........', seconds_per_symbol=1.0)
+
+        def blocks(audio_file, block_length):
+            size = int(block_length * 16000)
+            return (audio[i:i + size].tobytes() for i in range(0, len(audio), size))
+        mock_read_pcm_chunks.side_effect = blocks
+
+        stats = {}
+        chunks = list(read_speech_chunks('file.mp3', chunk_length=30, stats=stats))
+
+        self.assertEqual(len(chunks), 1)
+        self.assertAlmostEqual(stats['audio_seconds'], 18.0)
+        # 4 seconds of tone plus up to 300 ms of hangover around each burst
+        self.assertGreater(stats['recognized_audio_seconds'], 4.0)
+        self.assertLess(stats['recognized_audio_seconds'], 5.5)
+        self.assertAlmostEqual(stats['audio_seconds_saved'], 18.0 - stats['recognized_audio_seconds'])
+        self.assertEqual(len(chunks[0]), int(stats['recognized_audio_seconds'] * 16000) * 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from services.vector_index import VectorIndex, IVFIndex, build_index
+
+class TestVectorIndex(unittest.TestCase):
+
+    def test_exact_search_ranks_by_cosine_similarity(self):
+        index = VectorIndex([[1, 0], [0, 1], [10, 1], [-1, 0]])
+
+        best, scores = index.search(np.array([1, 0.05]), 2)
+
+        self.assertEqual(best.tolist(), [2, 0])
+        self.assertGreater(scores[0], scores[1])
+        self.assertEqual(len(index.search(np.array([1, 0]), 10)[0]), 4)
+
+    def test_approximate_search_finds_nearly_all_exact_neighbours(self):
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(20, 32))
+        vectors = np.repeat(centers, 100, axis=0) + rng.normal(scale=0.3, size=(2000, 32))
+        queries = centers + rng.normal(scale=0.3, size=centers.shape)
+        exact, approximate = VectorIndex(vectors), IVFIndex(vectors, probes=4)
+
+        recall = np.mean([
+            len(set(exact.search(query, 10)[0]) & set(approximate.search(query, 10)[0])) / 10 for query in queries
+        ])
+
+        self.assertGreaterEqual(recall, 0.9)
+
+    def test_small_indexes_are_exact(self):
+        self.assertIs(type(build_index(np.ones((10, 4)))), VectorIndex)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import unittest
+from unittest.mock import patch
+import fakeredis
+import yt_dlp
+from services.video_metadata_service import get_video_metadata, extract_video_metadata, slim_info, VideoMetadataError, VIDEO_METADATA_TTL
+
+INFO = {
+    'id': 'dQw4w9WgXcQ',
+    'title': 'Test video',
+    'duration': 212,
+    'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'description': 'A long description' * 100,
+    'thumbnails': [{'url': 'https://i.ytimg.com/vi/dQw4w9WgXcQ/hq.jpg'}],
+    'formats': [
+        {'format_id': '140', 'acodec': 'mp4a.40.2', 'vcodec': 'none', 'url': 'https://example.com/audio'},
+        {'format_id': '137', 'acodec': 'none', 'vcodec': 'avc1', 'url': 'https://example.com/video'},
+        {'format_id': '18', 'acodec': 'mp4a.40.2', 'vcodec': 'avc1', 'url': 'https://example.com/both'},
+    ],
+}
+
+class TestVideoMetadataService(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        redis_patcher = patch('services.video_metadata_service.get_redis', return_value=self.redis)
+        redis_patcher.start()
+        self.addCleanup(redis_patcher.stop)
+
+        extract_patcher = patch('services.video_metadata_service.extract_video_metadata', side_effect=lambda url: slim_info(INFO))
+        self.mock_extract = extract_patcher.start()
+        self.addCleanup(extract_patcher.stop)
+
+    def test_slim_info_keeps_audio_formats_only(self):
+        info = slim_info(INFO)
+
+        self.assertEqual([fmt['format_id'] for fmt in info['formats']], ['140', '18'])
+        self.assertEqual(info['duration'], 212)
+        self.assertNotIn('thumbnails', info)
+        self.assertNotIn('description', info)
+        json.dumps(info)
+
+    def test_second_lookup_is_served_from_cache(self):
+        first = get_video_metadata('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+        second = get_video_metadata('https://youtu.be/dQw4w9WgXcQ')
+
+        self.mock_extract.assert_called_once()
+        self.assertEqual(first, second)
+        ttl = self.redis.ttl('video-metadata:dQw4w9WgXcQ')
+        self.assertTrue(0 < ttl <= VIDEO_METADATA_TTL)
+
+    def test_cache_errors_fall_back_to_extraction(self):
+        with patch('services.video_metadata_service.get_redis', side_effect=ConnectionError('redis down')):
+            metadata = get_video_metadata('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+        self.assertEqual(metadata['id'], 'dQw4w9WgXcQ')
+
+    def test_extraction_errors_propagate(self):
+        self.mock_extract.side_effect = VideoMetadataError('Video unavailable')
+
+        with self.assertRaises(VideoMetadataError):
+            get_video_metadata('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+    @patch('yt_dlp.YoutubeDL')
+    def test_download_errors_become_metadata_errors(self, mock_ydl):
+        mock_ydl.return_value.__enter__.return_value.extract_info.side_effect = yt_dlp.utils.DownloadError('Video unavailable')
+
+        with self.assertRaisesRegex(VideoMetadataError, 'Video unavailable'):
+            extract_video_metadata('https://www.youtube.com/watch?v=dQw4w9WgXcQ')
+
+if __name__ == '__main__':
+    unittest.main()
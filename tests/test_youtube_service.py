@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from services.youtube_service import download_audio, download_options, get_video_id
+
+INFO = {'id': 'dQw4w9WgXcQ', 'duration': 212, 'formats': []}
+
+class TestDownloadAudio(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+        ydl_patcher = patch('yt_dlp.YoutubeDL')
+        self.ydl_class = ydl_patcher.start()
+        self.addCleanup(ydl_patcher.stop)
+        self.ydl = self.ydl_class.return_value.__enter__.return_value
+        self.ydl.process_ie_result.side_effect = self.fake_download
+
+    def fake_download(self, info, download):
+        """Write an empty file where the options passed to YoutubeDL put it."""
+        path = self.ydl_class.call_args[0][0]['outtmpl'] % {'id': info['id'], 'ext': 'webm'}
+        open(path, 'wb').close()
+        return dict(info, ext='webm', requested_downloads=[{'filepath': path}])
+
+    def test_fast_mode_keeps_native_audio_and_downloads_fragments_concurrently(self):
+        options = download_options(self.directory, mode='fast')
+
+        self.assertNotIn('postprocessors', options)
+        self.assertGreater(options['concurrent_fragment_downloads'], 1)
+
+    def test_mp3_mode_re_encodes(self):
+        options = download_options(self.directory, mode='mp3')
+
+        self.assertEqual(options['postprocessors'][0]['preferredcodec'], 'mp3')
+        self.assertNotIn('concurrent_fragment_downloads', options)
+
+    def test_returns_native_file_written_by_yt_dlp(self):
+        audio_file = download_audio('https://youtu.be/dQw4w9WgXcQ', INFO, self.directory, mode='fast')
+
+        self.assertEqual(audio_file, os.path.join(self.directory, 'dQw4w9WgXcQ.webm'))
+        self.ydl.extract_info.assert_not_called()
+
+    def test_each_download_gets_its_own_directory_by_default(self):
+        with patch('services.youtube_service.DOWNLOAD_DIR', self.directory):
+            first = download_audio('https://youtu.be/dQw4w9WgXcQ', INFO)
+            second = download_audio('https://youtu.be/dQw4w9WgXcQ', INFO)
+
+        self.assertNotEqual(os.path.dirname(first), os.path.dirname(second))
+        for path in (first, second):
+            self.assertEqual(os.path.dirname(os.path.dirname(path)), self.directory)
+
+    def test_video_id_is_parsed_without_network(self):
+        self.assertEqual(get_video_id('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=1'), 'dQw4w9WgXcQ')
+        self.assertIsNone(get_video_id('https://example.com/video'))
+
+if __name__ == '__main__':
+    unittest.main()
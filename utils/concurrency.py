@@ -0,0 +1,55 @@
+import os
+import sys
+import threading
+
+# Real threads per API process for blocking calls that would stall the gevent hub, such as yt-dlp probes
+BLOCKING_THREADS = int(os.getenv('BLOCKING_THREADS', 64))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def gevent_active():
+    """True when gevent has monkey patched this process, as gunicorn's gevent worker does."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+def run_blocking(func, *args, **kwargs):
+    """Call func on a real thread when serving under gevent, so it cannot stall other requests; inline otherwise.
+
+    Only use this for self-contained calls: sockets opened on the pool's threads must not be
+    handed back to greenlets, so shared clients like get_redis() stay out of func.
+    """
+    if not gevent_active():
+        return func(*args, **kwargs)
+    return _get_pool().apply(func, args, kwargs)
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Threads do not survive a fork, so each worker process builds its own pool
+        if _pool is None or _pool_pid != os.getpid():
+            from gevent.threadpool import ThreadPool
+            _pool = ThreadPool(BLOCKING_THREADS)
+            _pool_pid = os.getpid()
+        return _pool
+
+def make_psycopg2_green():
+    """Make psycopg2 wait on Postgres through the gevent hub instead of blocking the whole process."""
+    import psycopg2
+    from psycopg2 import extensions
+    from gevent.socket import wait_read, wait_write
+
+    def wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                return
+            if state == extensions.POLL_READ:
+                wait_read(conn.fileno(), timeout=timeout)
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno(), timeout=timeout)
+            else:
+                raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+    extensions.set_wait_callback(wait_callback)
@@ -1,38 +1,153 @@
 import os
-from google.cloud import secretmanager
+import json
+import time
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SECRET_NAMES = (
+    'CELERY_BROKER_URL', 'CELERY_RESULT_BACKEND', 'SQLALCHEMY_DATABASE_URI',
+    'JWT_SECRET_KEY', 'OPEN_AI_API_KEY', 'FRONTEND_URL',
+)
+
+# 'gcp' reads Google Secret Manager, 'local' reads environment variables. Unset picks 'gcp'
+# when FLASK_ENV is production and 'local' otherwise
+SECRETS_BACKEND = os.getenv('SECRETS_BACKEND')
+# Seconds before secrets are fetched again, so rotated values are picked up without a restart; 0 never refreshes
+SECRETS_TTL = int(os.getenv('SECRETS_TTL', 3600))
+# Optional encrypted copy of remotely fetched secrets, so processes started within the TTL skip
+# the fetch. Needs SECRETS_CACHE_KEY, a Fernet key, and the cryptography package
+SECRETS_CACHE_PATH = os.getenv('SECRETS_CACHE_PATH')
+SECRETS_CACHE_KEY = os.getenv('SECRETS_CACHE_KEY')
+
+# Development defaults for the local backend, and environment variables named differently from the secret
+LOCAL_DEFAULTS = {
+    'CELERY_BROKER_URL': 'redis://localhost:6379/0',
+    'CELERY_RESULT_BACKEND': 'redis://localhost:6379/0',
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///users.db',
+    'FRONTEND_URL': 'http://localhost:3000',
+}
+LOCAL_ENV_NAMES = {'OPEN_AI_API_KEY': 'OPENAI_API_KEY'}
+
+_secrets_cache = {}
+_secrets_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def get_secret_client():
+    # The SDK takes a quarter of a second to import and only production reads Secret Manager
+    from google.cloud import secretmanager
+    return secretmanager.SecretManagerServiceClient()
 
 def get_secret(secret_name):
-    client = secretmanager.SecretManagerServiceClient()
+    client = get_secret_client()
     name = f"projects/{os.getenv('PROJECT_ID')}/secrets/{secret_name}/versions/latest"
     response = client.access_secret_version(request={"name": name})
     return response.payload.data.decode("UTF-8")
 
-def load_secrets():
-    if os.getenv('FLASK_ENV') == 'production':
-        CELERY_BROKER_URL = get_secret('CELERY_BROKER_URL')
-        CELERY_RESULT_BACKEND = get_secret('CELERY_RESULT_BACKEND')
-        SQLALCHEMY_DATABASE_URI = get_secret('SQLALCHEMY_DATABASE_URI')
-        JWT_SECRET_KEY = get_secret('JWT_SECRET_KEY')
-        SQLALCHEMY_TRACK_MODIFICATIONS=False
-        OPEN_AI_API_KEY = get_secret('OPEN_AI_API_KEY')
-        FRONTEND_URL = get_secret('FRONTEND_URL')
-        
-
-    else:
-        CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
-        CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
-        SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///users.db')
-        SQLALCHEMY_TRACK_MODIFICATIONS=False,
-        JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY')
-        OPEN_AI_API_KEY = os.getenv('OPENAI_API_KEY')
-        FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
-    
-    return {
-        "CELERY_BROKER_URL": CELERY_BROKER_URL,
-        "CELERY_RESULT_BACKEND": CELERY_RESULT_BACKEND,
-        "SQLALCHEMY_DATABASE_URI": SQLALCHEMY_DATABASE_URI,
-        "JWT_SECRET_KEY": JWT_SECRET_KEY,
-        "SQLALCHEMY_TRACK_MODIFICATIONS": SQLALCHEMY_TRACK_MODIFICATIONS,
-        "OPEN_AI_API_KEY": OPEN_AI_API_KEY,
-        "FRONTEND_URL": FRONTEND_URL
-    }
+def fetch_gcp_secrets(names):
+    """Fetch names from Secret Manager over one client; one round trip each, so all at once."""
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        return dict(zip(names, executor.map(get_secret, names)))
+
+def fetch_local_secrets(names):
+    """Read names from the environment, falling back to development defaults."""
+    return {name: os.getenv(LOCAL_ENV_NAMES.get(name, name), LOCAL_DEFAULTS.get(name)) for name in names}
+
+# Each backend takes secret names and returns {name: value}; remote ones are cached on disk
+SECRETS_BACKENDS = {
+    'gcp': fetch_gcp_secrets,
+    'local': fetch_local_secrets,
+}
+LOCAL_SECRETS_BACKENDS = {'local'}
+
+def secrets_backend_name(name=None):
+    """Return the backend selected by name, SECRETS_BACKEND or FLASK_ENV."""
+    name = name or SECRETS_BACKEND or ('gcp' if os.getenv('FLASK_ENV') == 'production' else 'local')
+    if name not in SECRETS_BACKENDS:
+        raise ValueError(f"Unknown secrets backend: {name}")
+    return name
+
+def get_cache_cipher():
+    """Return a Fernet for the disk cache, or None when it is not configured."""
+    if not (SECRETS_CACHE_PATH and SECRETS_CACHE_KEY):
+        return None
+    try:
+        from cryptography.fernet import Fernet
+    except ImportError:
+        logger.warning('SECRETS_CACHE_PATH is set but cryptography is not installed; secrets are not cached on disk')
+        return None
+    return Fernet(SECRETS_CACHE_KEY)
+
+def read_disk_cache(backend):
+    """Return (fetched_at, values) from the disk cache if it holds fresh secrets of backend."""
+    cipher = get_cache_cipher()
+    if cipher is None or not os.path.exists(SECRETS_CACHE_PATH):
+        return None
+    try:
+        with open(SECRETS_CACHE_PATH, 'rb') as f:
+            # Fernet rejects tokens older than the TTL, as well as tampered ones
+            payload = json.loads(cipher.decrypt(f.read(), ttl=SECRETS_TTL or None))
+    except Exception as e:
+        logger.info(f"Secrets cache not used: {type(e).__name__} {str(e)}")
+        return None
+    if payload['backend'] != backend or set(payload['values']) != set(SECRET_NAMES):
+        return None
+    return payload['fetched_at'], payload['values']
+
+def write_disk_cache(backend, fetched_at, values):
+    cipher = get_cache_cipher()
+    if cipher is None:
+        return
+    try:
+        token = cipher.encrypt(json.dumps({'backend': backend, 'fetched_at': fetched_at, 'values': values}).encode('utf-8'))
+        directory = os.path.dirname(SECRETS_CACHE_PATH)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # Write a private temporary file and rename it, so readers never see a partial cache
+        temporary_path = f"{SECRETS_CACHE_PATH}.{os.getpid()}.tmp"
+        fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(token)
+        os.replace(temporary_path, SECRETS_CACHE_PATH)
+    except Exception as e:
+        logger.error(f"Error writing secrets cache: {str(e)}")
+
+def fetch_secrets(backend):
+    """Return (fetched_at, values) from the disk cache when fresh, otherwise from the backend."""
+    remote = backend not in LOCAL_SECRETS_BACKENDS
+    cached = read_disk_cache(backend) if remote else None
+    if cached is not None:
+        return cached
+
+    fetched_at = time.time()
+    values = SECRETS_BACKENDS[backend](SECRET_NAMES)
+    if remote:
+        write_disk_cache(backend, fetched_at, values)
+    return fetched_at, values
+
+def load_secrets(backend=None):
+    """Return the app's settings from the secrets backend, cached in-process and refreshed after SECRETS_TTL."""
+    backend = secrets_backend_name(backend)
+    # One fetch at a time, so threads that start together share it
+    with _secrets_lock:
+        cached = _secrets_cache.get(backend)
+        if cached is None or (SECRETS_TTL and time.time() - cached[0] >= SECRETS_TTL):
+            try:
+                fetched_at, values = fetch_secrets(backend)
+                cached = (fetched_at, dict(values, SQLALCHEMY_TRACK_MODIFICATIONS=False))
+            except Exception as e:
+                if cached is None:
+                    raise
+                # Keep serving the previous values and try again after another TTL
+                logger.error(f"Error refreshing secrets, keeping previous values: {str(e)}")
+                cached = (time.time(), cached[1])
+            _secrets_cache[backend] = cached
+        return cached[1]
+
+def clear_secrets_cache():
+    """Forget in-process secrets, so the next load_secrets fetches them again."""
+    with _secrets_lock:
+        _secrets_cache.clear()
@@ -0,0 +1,168 @@
+import threading
+
+class Metric:
+    """A named value per label set, safe to update from any thread."""
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(dict(key), value) for key, value in self._values.items()]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+# Upper bounds in seconds, from a cache lookup to a long download or analysis
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count, per label set."""
+    kind = 'histogram'
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][index] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def value(self, **labels):
+        """Return the number of observations."""
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry['count'] if entry else 0
+
+    def samples(self):
+        with self._lock:
+            return [
+                (dict(key), {'buckets': list(zip(self.buckets, entry['buckets'])), 'sum': entry['sum'], 'count': entry['count']})
+                for key, entry in self._values.items()
+            ]
+
+class Registry:
+    """Process-wide collection of metrics, looked up by name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, metric_class, name, description):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, description)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, description=''):
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name, description=''):
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name, description='', buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, description, buckets)
+            elif not isinstance(metric, Histogram):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def snapshot(self):
+        """Return {name: [(labels, value), ...]} for every registered metric."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.samples() for metric in metrics}
+
+    def export(self):
+        """Return every metric with its kind and description, as JSON-safe dicts."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [
+            {'name': metric.name, 'kind': metric.kind, 'description': metric.description, 'samples': metric.samples()}
+            for metric in metrics
+        ]
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus(exports):
+    """Render [(process, export)] in the Prometheus text format, each sample labelled with its process.
+
+    Metrics of the same name from several processes are written as one family.
+    """
+    families = {}
+    for process, export in exports:
+        for metric in export:
+            family = families.setdefault(metric['name'], {'kind': metric['kind'], 'description': metric['description'], 'samples': []})
+            family['samples'].extend((dict(labels, process=process), value) for labels, value in metric['samples'])
+
+    lines = []
+    for name, family in sorted(families.items()):
+        lines.append(f"# HELP {name} {family['description']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for labels, value in family['samples']:
+            if family['kind'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for bound, count in value['buckets']:
+                lines.append(f"{name}_bucket{_format_labels(dict(labels, le=_format_value(float(bound))))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(dict(labels, le='+Inf'))} {value['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return '\n'.join(lines) + '\n'
+
+registry = Registry()
@@ -0,0 +1,69 @@
+import os
+import json
+import socket
+import logging
+import threading
+from utils.redis_client import get_redis
+from utils.metrics import registry, render_prometheus
+
+logger = logging.getLogger(__name__)
+
+# API and Celery worker processes each push their metrics to Redis, where /metrics on any API
+# process collects them, so one scrape covers every process
+METRICS_PREFIX = 'metrics:process:'
+# Seconds between pushes; 0 turns pushing off
+METRICS_PUSH_INTERVAL = float(os.getenv('METRICS_PUSH_INTERVAL', 15))
+# A process that stops pushing, because it exited, drops out of /metrics after this many seconds
+METRICS_PUSH_TTL = int(os.getenv('METRICS_PUSH_TTL', 60))
+
+_pusher_lock = threading.Lock()
+_pusher_pid = None
+
+def process_name(role):
+    return f"{role}@{socket.gethostname()}:{os.getpid()}"
+
+def push_metrics(role, redis_factory=get_redis):
+    """Store this process's metrics in Redis for METRICS_PUSH_TTL seconds."""
+    redis_factory().set(METRICS_PREFIX + process_name(role), json.dumps(registry.export()), ex=METRICS_PUSH_TTL)
+
+def start_metrics_pusher(role, interval=None):
+    """Push this process's metrics every interval seconds from a daemon thread; once per process."""
+    global _pusher_pid
+    interval = METRICS_PUSH_INTERVAL if interval is None else interval
+    with _pusher_lock:
+        # A forked child inherits the flag but not the thread
+        if not interval or _pusher_pid == os.getpid():
+            return
+        _pusher_pid = os.getpid()
+
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                push_metrics(role)
+            except Exception as e:
+                logger.error(f"Error pushing metrics: {str(e)}")
+
+    threading.Thread(target=run, name='metrics-pusher', daemon=True).start()
+    return stop
+
+def collect_metrics(role, redis_factory=get_redis):
+    """Return [(process, export)] for this process, live, and every process that pushed recently."""
+    own = process_name(role)
+    exports = [(own, registry.export())]
+    try:
+        client = redis_factory()
+        keys = sorted(key for key in client.scan_iter(match=METRICS_PREFIX + '*', count=500)
+                      if key.decode('utf-8') != METRICS_PREFIX + own)
+        for key, value in zip(keys, client.mget(keys) if keys else []):
+            # Expired between the scan and the read
+            if value is not None:
+                exports.append((key.decode('utf-8')[len(METRICS_PREFIX):], json.loads(value)))
+    except Exception as e:
+        logger.error(f"Error collecting pushed metrics: {str(e)}")
+    return exports
+
+def render_metrics(role, redis_factory=get_redis):
+    """Return every process's metrics in the Prometheus text format."""
+    return render_prometheus(collect_metrics(role, redis_factory))
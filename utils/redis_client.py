@@ -0,0 +1,22 @@
+import os
+import threading
+import redis
+from utils.get_env_variables import load_secrets
+
+# Redis used for task events, caches, locks and metrics; unset, the Celery broker from the secrets
+# backend, so the API and workers share one Redis wherever the broker URL is configured
+REDIS_URL = os.getenv('REDIS_URL')
+
+_client = None
+_client_lock = threading.Lock()
+
+def redis_url():
+    return REDIS_URL or load_secrets()['CELERY_BROKER_URL']
+
+def get_redis():
+    """Return the process-wide Redis client; its connection pool is rebuilt after a fork."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = redis.Redis.from_url(redis_url())
+        return _client
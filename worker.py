@@ -0,0 +1,11 @@
+"""Celery worker entry point: celery -A worker.celery worker
+
+Builds only what tasks use: the config, the database and Celery. The API's routes, JWT and CORS
+are never imported, and tables are created by `flask --app main init-db` rather than on startup.
+"""
+from app_factory import create_base_app
+from celery_config import make_celery
+import tasks  # Registers the job and pipeline stage tasks
+
+app = create_base_app(__name__)
+celery = make_celery(app)